@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+# То, что делает интерактивный main() до первого приглашения: импорт,
+# конструктор, подключение истории к readline и промпт
+SNIPPET = "import main; e = main.LinuxEmulator(); e.history.attach_readline(); e.get_prompt()"
+# Размер файла истории в HOME запуска: около порога сжатия, то есть
+# наихудший случай, который встречается в жизни
+HISTORY_BYTES = 1024 * 1024
+
+# Модули, которые не должны загружаться при старте: их импортируют
+# только команды, которым они нужны
+FORBIDDEN_MODULES = [
+    "psutil", "subprocess", "shutil", "datetime", "platform",
+    "zipfile", "tarfile", "hashlib", "pyfiglet",
+]
+
+
+def write_history(home):
+    line = b"grep -rn pattern src | sort | head -n 20\n"
+    with open(os.path.join(home, ".python_wsl_history"), "wb") as f:
+        f.write(line * (HISTORY_BYTES // len(line)))
+
+
+def run_python(code, extra_args=()):
+    cmd = [sys.executable, *extra_args, "-c", code]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} завершился с кодом {result.returncode}:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def measure(code, runs):
+    run_python(code)  # прогрев: байткод и файловый кэш
+    return [run_python(code)[0] for _ in range(runs)]
+
+
+def import_profile():
+    _, stderr = run_python(SNIPPET, ["-X", "importtime"])
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта Python WSL")
+    parser.add_argument("--runs", type=int, default=20, help="число запусков (по умолчанию 20)")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="абсолютный предел накладных расходов старта, мс")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="допустимый рост относительно базовой линии (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл базовой линии (JSON)")
+    parser.add_argument("--update-baseline", action="store_true", help="записать текущий результат как базовую линию")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    opts = parser.parse_args()
+
+    # Отдельный HOME с большой историей: старт не должен читать ее целиком
+    with tempfile.TemporaryDirectory(prefix="startup-home-") as home:
+        write_history(home)
+        os.environ["HOME"] = home
+        bare = measure("pass", opts.runs)
+        emulator = measure(SNIPPET, opts.runs)
+        modules = import_profile()
+
+    # Сравниваем накладные расходы сверх голого интерпретатора, чтобы
+    # результат не зависел от скорости машины так сильно, как общее время
+    overhead_ms = (statistics.median(emulator) - statistics.median(bare)) * 1000
+    report = {
+        "python": sys.version.split()[0],
+        "runs": opts.runs,
+        "bare_ms": round(statistics.median(bare) * 1000, 2),
+        "emulator_ms": round(statistics.median(emulator) * 1000, 2),
+        "overhead_ms": round(overhead_ms, 2),
+        "main_import_us": modules.get("main", (0, 0))[1],
+        "modules": len(modules),
+    }
+
+    failures = []
+    loaded = sorted(name for name in FORBIDDEN_MODULES if name in modules)
+    if loaded:
+        failures.append(f"при старте импортированы тяжелые модули: {', '.join(loaded)}")
+    if opts.budget_ms is not None and overhead_ms > opts.budget_ms:
+        failures.append(f"накладные расходы {overhead_ms:.1f} мс превышают бюджет {opts.budget_ms:.1f} мс")
+    if os.path.exists(opts.baseline) and not opts.update_baseline:
+        with open(opts.baseline) as f:
+            baseline = json.load(f)
+        # 2 мс абсолютного запаса гасят шум на очень быстрых машинах
+        limit = baseline["overhead_ms"] * (1 + opts.tolerance) + 2
+        report["baseline_overhead_ms"] = baseline["overhead_ms"]
+        if overhead_ms > limit:
+            failures.append(f"регрессия старта: {overhead_ms:.1f} мс против базовых "
+                            f"{baseline['overhead_ms']:.1f} мс (предел {limit:.1f} мс)")
+
+    if opts.json:
+        print(json.dumps(dict(report, failures=failures), ensure_ascii=False, indent=2))
+    else:
+        print(f"python {report['python']}, запусков: {opts.runs}")
+        print(f"  голый интерпретатор: {report['bare_ms']:8.2f} мс")
+        print(f"  эмулятор до промпта: {report['emulator_ms']:8.2f} мс")
+        print(f"  накладные расходы:   {report['overhead_ms']:8.2f} мс")
+        print("  самые дорогие импорты (собственное время):")
+        slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:10]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"    {self_us / 1000:7.2f} мс  {name}")
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+
+    if opts.update_baseline:
+        with open(opts.baseline, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
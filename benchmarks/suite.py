@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "commands_baseline.json")
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "swift-wsl-bench")
+
+# Меняется вместе с генератором: старые данные в рабочей директории
+# пересоздаются, а не сравниваются с новыми
+WORKLOAD_VERSION = 1
+
+WORDS = (
+    "alpha beta gamma delta epsilon zeta theta kappa lambda sigma omega "
+    "request response timeout connection cache index worker queue retry "
+    "user session token file block socket buffer commit rollback"
+).split()
+LEVELS = ["INFO"] * 14 + ["DEBUG"] * 4 + ["WARN"] * 2 + ["ERROR"]
+MODULES = ["http", "db", "auth", "storage", "scheduler", "api", "mailer"]
+
+
+def _text(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)[:size]
+
+
+def _write_file(path, rng, size):
+    with open(path, "w") as f:
+        f.write(_text(rng, size))
+
+
+def make_tree(root, rng, scale):
+    # Широкая директория (тысячи файлов в одной), глубокая цепочка и
+    # ветвистое дерево - разные режимы для обхода, stat и копирования
+    wide = os.path.join(root, "wide")
+    os.makedirs(wide)
+    for i in range(int(2000 * scale)):
+        _write_file(os.path.join(wide, f"file{i:05d}.txt"), rng, rng.randrange(0, 8192))
+
+    path = os.path.join(root, "deep")
+    for depth in range(64):
+        path = os.path.join(path, f"level{depth:02d}")
+        os.makedirs(path)
+        for i in range(4):
+            _write_file(os.path.join(path, f"f{i}.log"), rng, rng.randrange(0, 2048))
+
+    per_dir = max(1, int(8 * scale))
+
+    def bushy(path, depth):
+        os.makedirs(path)
+        if depth == 4:
+            for i in range(per_dir):
+                suffix = rng.choice((".txt", ".py", ".log", ".dat"))
+                _write_file(os.path.join(path, f"n{i:03d}{suffix}"), rng, rng.randrange(0, 16384))
+            return
+        for i in range(5):
+            bushy(os.path.join(path, f"d{i}"), depth + 1)
+
+    bushy(os.path.join(root, "bushy"), 0)
+
+
+def make_log(path, rng, size):
+    # Строки в формате типичного журнала приложения; пишется блоками,
+    # чтобы генерация многогигабайтного файла не упиралась в write()
+    start = 1700000000
+    written = 0
+    number = 0
+    with open(path, "w") as f:
+        while written < size:
+            lines = []
+            for _ in range(4096):
+                number += 1
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + number // 50))
+                level = rng.choice(LEVELS)
+                module = rng.choice(MODULES)
+                lines.append(f"{stamp} {level:<5} [{module}] id={number} {_text(rng, rng.randrange(20, 120))}\n")
+            block = "".join(lines)
+            f.write(block)
+            written += len(block)
+
+
+def make_sort_input(path, rng, count):
+    with open(path, "w") as f:
+        for _ in range(count):
+            f.write(f"{rng.choice(WORDS)} {rng.randrange(10 ** 6):06d} {rng.choice(WORDS)}\n")
+
+
+def prepare(workdir, scale, log_mb, seed):
+    # Данные генерируются детерминированно из seed и переиспользуются между
+    # запусками, пока совпадают параметры
+    manifest = {"version": WORKLOAD_VERSION, "scale": scale, "log_mb": log_mb, "seed": seed}
+    manifest_path = os.path.join(workdir, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return False
+    except (OSError, ValueError):
+        pass
+
+    if os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(os.path.join(workdir, "logs"))
+    os.makedirs(os.path.join(workdir, "out"))
+    rng = random.Random(seed)
+    make_tree(os.path.join(workdir, "tree"), rng, scale)
+    make_log(os.path.join(workdir, "logs", "app.log"), rng, int(log_mb * 1024 * 1024))
+    make_sort_input(os.path.join(workdir, "logs", "sort.txt"), rng, int(200000 * scale))
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return True
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.unlink(path)
+
+
+class Case:
+    def __init__(self, name, words, setup=None, env=None):
+        # words - одна и та же команда для эмулятора и для системы; setup
+        # выполняется перед каждым запуском и во время не входит
+        self.name = name
+        self.words = words
+        self.setup = setup
+        self.env = env
+
+
+def cases(workdir):
+    wide = os.path.join("tree", "wide")
+    hashed = [os.path.join("logs", "app.log")] + [os.path.join(wide, name) for name in sorted(os.listdir(os.path.join(workdir, wide)))]
+
+    def clean(*paths):
+        return lambda: [_remove(os.path.join(workdir, path)) for path in paths]
+
+    def victim():
+        _remove(os.path.join(workdir, "out", "victim"))
+        shutil.copytree(os.path.join(workdir, "tree"), os.path.join(workdir, "out", "victim"), symlinks=True)
+
+    return [
+        Case("ls -l", ["ls", "-l", wide]),
+        Case("find", ["find", "tree", "-name", "*.log"]),
+        Case("du", ["du", "-s", "tree"]),
+        Case("grep", ["grep", "ERROR", "logs/app.log"]),
+        Case("sort", ["sort", "logs/sort.txt"], env={"LC_ALL": "C"}),
+        Case("wc", ["wc", "logs/app.log"]),
+        Case("tail", ["tail", "-n", "1000", "logs/app.log"]),
+        Case("md5sum", ["md5sum", "--no-cache"] + hashed),
+        Case("tar", ["tar", "-czf", "out/tree.tar.gz", "tree"], setup=clean("out/tree.tar.gz")),
+        Case("zip", ["zip", "-q", "-r", "out/tree.zip", "tree"], setup=clean("out/tree.zip")),
+        Case("cp -r", ["cp", "-r", "tree", "out/copy"], setup=clean("out/copy")),
+        Case("rm -r", ["rm", "-r", "out/victim"], setup=victim),
+    ]
+
+
+def host_words(case):
+    # Ключи, которых нет у coreutils
+    return [word for word in case.words if word != "--no-cache"]
+
+
+# Вывод обеих сторон пишется в обычный файл: GNU grep, увидев /dev/null,
+# останавливается на первом совпадении, и сравнение теряет смысл
+def run_emulator(workdir, case, output):
+    import main
+    from commands.shell import join
+    emu = main.LinuxEmulator()
+    emu.current_dir = workdir
+    emu.interactive = False
+    line = join(case.words)
+    output.seek(0)
+    output.truncate()
+    start = time.perf_counter()
+    with emu.out.redirect(output):
+        status = emu.parse_command(line)
+    return time.perf_counter() - start, status
+
+
+def run_host(workdir, case, output):
+    env = dict(os.environ, **case.env) if case.env else None
+    output.seek(0)
+    output.truncate()
+    start = time.perf_counter()
+    result = subprocess.run(host_words(case), cwd=workdir, env=env,
+                            stdout=output, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, result.returncode
+
+
+def measure(run, case, runs):
+    # Первый запуск - прогрев файлового кэша, в статистику не входит
+    times = []
+    status = 0
+    for i in range(runs + 1):
+        if case.setup is not None:
+            case.setup()
+        elapsed, status = run()
+        if status:
+            break
+        if i:
+            times.append(elapsed)
+    if status:
+        return {"status": status}
+    return {
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(min(times), 6),
+        "runs_s": [round(t, 6) for t in times],
+    }
+
+
+def compare(report, baseline, tolerance):
+    # Сравнивается отношение к системной утилите, если оно есть: оно
+    # меньше зависит от машины, чем абсолютное время
+    failures = []
+    for name, result in report["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None:
+            continue
+        if "ratio" in result and "ratio" in old:
+            limit = old["ratio"] * (1 + tolerance)
+            if result["ratio"] > limit:
+                failures.append(f"{name}: отношение к системной {result['ratio']:.2f} против базового "
+                                f"{old['ratio']:.2f} (предел {limit:.2f})")
+        elif "median_s" in result["emulator"] and "median_s" in old["emulator"]:
+            # 5 мс абсолютного запаса гасят шум на коротких командах
+            limit = old["emulator"]["median_s"] * (1 + tolerance) + 0.005
+            if result["emulator"]["median_s"] > limit:
+                failures.append(f"{name}: {result['emulator']['median_s'] * 1000:.1f} мс против базовых "
+                                f"{old['emulator']['median_s'] * 1000:.1f} мс (предел {limit * 1000:.1f} мс)")
+    return failures
+
+
+def _row(name, result):
+    def cell(side):
+        if side is None:
+            return f"{'-':>10}"
+        if "status" in side:
+            return f"{'код ' + str(side['status']):>10}"
+        return f"{side['median_s'] * 1000:8.1f}мс"
+    ratio = f"x{result['ratio']:.2f}" if "ratio" in result else ""
+    return f"  {name:<8} эмулятор {cell(result['emulator'])}  система {cell(result.get('host'))}  {ratio}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк встроенных команд Python WSL против системных утилит")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR,
+                        help=f"директория с синтетическими данными (по умолчанию {DEFAULT_WORKDIR})")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель числа файлов и строк (по умолчанию 1)")
+    parser.add_argument("--log-mb", type=float, default=64, help="размер журнала, МиБ (по умолчанию 64)")
+    parser.add_argument("--seed", type=int, default=1, help="seed генератора данных")
+    parser.add_argument("--runs", type=int, default=5, help="число замеров на команду (по умолчанию 5)")
+    parser.add_argument("--only", action="append", default=[], help="только эти команды (можно повторять)")
+    parser.add_argument("--no-host", action="store_true", help="не запускать системные утилиты")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="допустимый рост относительно базовой линии (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл базовой линии (JSON)")
+    parser.add_argument("--update-baseline", action="store_true", help="записать текущий результат как базовую линию")
+    parser.add_argument("--output", help="сохранить результат в JSON-файл")
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    opts = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    workdir = os.path.abspath(opts.workdir)
+    start = time.perf_counter()
+    if prepare(workdir, opts.scale, opts.log_mb, opts.seed) and not opts.json:
+        print(f"данные созданы в {workdir} за {time.perf_counter() - start:.1f} с")
+
+    report = {
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "scale": opts.scale,
+        "log_mb": opts.log_mb,
+        "seed": opts.seed,
+        "runs": opts.runs,
+        "cases": {},
+    }
+    selected = [case for case in cases(workdir) if not opts.only or case.name in opts.only or case.words[0] in opts.only]
+    with open(os.path.join(workdir, "out", "stdout.txt"), "w") as output:
+        for case in selected:
+            result = {"command": " ".join(case.words)}
+            result["emulator"] = measure(lambda: run_emulator(workdir, case, output), case, opts.runs)
+            if not opts.no_host and shutil.which(case.words[0]):
+                result["host"] = measure(lambda: run_host(workdir, case, output), case, opts.runs)
+                if "median_s" in result["emulator"] and "median_s" in result["host"]:
+                    result["ratio"] = round(result["emulator"]["median_s"] / result["host"]["median_s"], 3)
+            report["cases"][case.name] = result
+            if not opts.json:
+                print(_row(case.name, result), flush=True)
+    for path in ("out/copy", "out/victim", "out/tree.tar.gz", "out/tree.zip", "out/stdout.txt"):
+        _remove(os.path.join(workdir, path))
+
+    failures = [f"{name}: код возврата {result['emulator']['status']}"
+                for name, result in report["cases"].items() if "status" in result["emulator"]]
+    if os.path.exists(opts.baseline) and not opts.update_baseline:
+        with open(opts.baseline) as f:
+            failures += compare(report, json.load(f), opts.tolerance)
+
+    if opts.json:
+        print(json.dumps(dict(report, failures=failures), ensure_ascii=False, indent=2))
+    else:
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+
+    for path in filter(None, (opts.output, opts.baseline if opts.update_baseline else None)):
+        with open(path, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import importlib
+
+
+class ExitStatus:
+    # Код возврата потоковой команды. Генератор не может вернуть его через
+    # return, поэтому стадия отмечает ошибки здесь, а конвейер читает код
+    # после того, как весь вывод стадии получен
+    def __init__(self):
+        self.value = 0
+
+    def fail(self, code=1):
+        # Более серьезная ошибка, записанная раньше, не затирается
+        self.value = max(self.value, code)
+
+    def code(self):
+        return self.value
+
+
+class UnterminatedLine(str):
+    # Последняя строка входа, после которой в файле не было '\n'. По
+    # конвейеру строки идут без перевода строки, и только эта пометка
+    # позволяет wc посчитать строки и байты так же, как по самому файлу
+    __slots__ = ()
+
+
+class Command:
+    def __init__(self, name, handler, stream=None, usage="", help="", mutates=False):
+        self.name = name
+        self.usage = usage or name
+        self.help = help
+        # Что команда меняет на диске: False - ничего, True - пути из своих
+        # аргументов, "all" - что угодно (кэш метаданных сбрасывается целиком)
+        self.mutates = mutates
+        # Обработчик может быть задан строкой "модуль:функция" - тогда модуль
+        # импортируется только при первом вызове команды
+        self._handler = handler
+        self._stream = stream
+
+    @staticmethod
+    def _resolve(target):
+        if isinstance(target, str):
+            module_name, _, attr = target.partition(":")
+            return getattr(importlib.import_module(module_name), attr)
+        return target
+
+    @property
+    def loaded(self):
+        return not isinstance(self._handler, str) and not isinstance(self._stream, str)
+
+    @property
+    def handler(self):
+        if isinstance(self._handler, str):
+            self._handler = self._resolve(self._handler)
+        return self._handler
+
+    @property
+    def stream(self):
+        if isinstance(self._stream, str):
+            self._stream = self._resolve(self._stream)
+        return self._stream
+
+    @property
+    def streaming(self):
+        return self._stream is not None
+
+    def run(self, emulator, args):
+        return self.handler(emulator, args)
+
+    def run_stream(self, emulator, args, stdin=None, status=None):
+        return self.stream(emulator, args, stdin, status)
+
+    def __repr__(self):
+        return f"Command({self.name!r}, loaded={self.loaded})"
+
+
+class CommandRegistry:
+    def __init__(self):
+        self._commands = {}
+
+    def register(self, name, handler=None, stream=None, usage="", help="", mutates=False):
+        if handler is None:
+            # Использование как декоратора: @registry.register("name", help=...)
+            def decorator(func):
+                self.register(name, func, stream=stream, usage=usage, help=help, mutates=mutates)
+                return func
+            return decorator
+
+        self._commands[name] = Command(name, handler, stream=stream, usage=usage, help=help, mutates=mutates)
+        return handler
+
+    def unregister(self, name):
+        self._commands.pop(name, None)
+
+    def get(self, name):
+        return self._commands.get(name)
+
+    def names(self):
+        return list(self._commands)
+
+    def __contains__(self, name):
+        return name in self._commands
+
+    def __iter__(self):
+        return iter(self._commands.values())
+
+    def __len__(self):
+        return len(self._commands)
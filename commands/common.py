@@ -0,0 +1,45 @@
+import errno
+import os
+from collections import deque
+
+# Сколько заданий на поток держит ordered_map в работе одновременно
+WINDOW_PER_WORKER = 4
+
+REASONS = (
+    (FileNotFoundError, "Нет такого файла или директории"),
+    (IsADirectoryError, "Это директория"),
+    (NotADirectoryError, "Не директория"),
+    (PermissionError, "Отказано в доступе"),
+)
+
+
+def default_workers():
+    # Число потоков для работы с файлами, как у ThreadPoolExecutor по
+    # умолчанию: потоки в основном ждут диск, а не процессор
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def ordered_map(func, items, workers=None):
+    # Как Executor.map, но лениво: items берутся по мере продвижения вывода,
+    # в работе не больше workers * WINDOW_PER_WORKER заданий, а результаты
+    # отдаются строго в порядке items
+    from concurrent.futures import ThreadPoolExecutor
+    workers = workers or default_workers()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for item in items:
+            window.append(pool.submit(func, item))
+            while len(window) > workers * WINDOW_PER_WORKER:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def reason(e):
+    # Причина ошибки ОС для сообщения команды, по-русски для частых случаев
+    for error_type, text in REASONS:
+        if isinstance(e, error_type):
+            return text
+    if getattr(e, "errno", None) == errno.ENOTEMPTY:
+        return "Директория не пуста"
+    return getattr(e, "strerror", None) or str(e)
@@ -0,0 +1,442 @@
+import errno
+import os
+import stat
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from commands.common import default_workers, reason
+from commands.walk import walk
+
+# Запасной путь копирования через read/write
+BUFFER_SIZE = 1024 * 1024
+# Сколько файлов на поток может ждать в очереди пула
+QUEUE_PER_WORKER = 64
+# ioctl FICLONE: файл-клон без копирования данных (btrfs, xfs, ...)
+FICLONE = 0x40049409
+# Ошибки, после которых пробуем следующий, более простой способ копирования
+FALLBACK_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                   errno.EBADF, errno.ETXTBSY, errno.EPERM}
+
+
+class CopyOptions:
+    def __init__(self):
+        self.recursive = False
+        self.preserve = False
+        self.dereference = None
+        self.update = False
+        self.no_clobber = False
+        self.force = False
+        self.verbose = False
+        self.stats = False
+        self.links = False
+        self.reflink = "auto"
+        self.sparse = "auto"
+        self.workers = default_workers()
+        self.paths = []
+
+
+FLAGS = {
+    "r": ("recursive",),
+    "R": ("recursive",),
+    "p": ("preserve",),
+    "u": ("update",),
+    "n": ("no_clobber",),
+    "f": ("force",),
+    "v": ("verbose",),
+    # -a = -dR --preserve=all
+    "a": ("recursive", "preserve", "links"),
+}
+LONG_FLAGS = {
+    "--recursive": ("recursive",),
+    "--archive": ("recursive", "preserve", "links"),
+    "--preserve": ("preserve",),
+    "--update": ("update",),
+    "--no-clobber": ("no_clobber",),
+    "--force": ("force",),
+    "--verbose": ("verbose",),
+    "--stats": ("stats",),
+}
+
+
+def parse_args(args):
+    opts = CopyOptions()
+    for arg in args:
+        if arg in LONG_FLAGS:
+            for name in LONG_FLAGS[arg]:
+                setattr(opts, name, True)
+        elif arg.startswith("--reflink"):
+            opts.reflink = arg.split("=", 1)[1] if "=" in arg else "always"
+            if opts.reflink not in ("auto", "always", "never"):
+                raise ValueError(f"неверный аргумент '{opts.reflink}' для '--reflink'")
+        elif arg.startswith("--sparse="):
+            opts.sparse = arg.split("=", 1)[1]
+            if opts.sparse not in ("auto", "always", "never"):
+                raise ValueError(f"неверный аргумент '{opts.sparse}' для '--sparse'")
+        elif arg.startswith("--jobs="):
+            value = arg.split("=", 1)[1]
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"неверное число потоков: '{value}'")
+            opts.workers = int(value)
+        elif arg == "--":
+            continue
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            for flag in arg[1:]:
+                if flag in ("L",):
+                    opts.dereference = True
+                elif flag in ("P", "d"):
+                    opts.dereference = False
+                    opts.links = opts.links or flag == "d"
+                elif flag in FLAGS:
+                    for name in FLAGS[flag]:
+                        setattr(opts, name, True)
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            opts.paths.append(arg)
+
+    if opts.dereference is None:
+        # Как в GNU cp: при рекурсивном копировании символические ссылки
+        # копируются как ссылки, иначе копируется файл, на который они указывают
+        opts.dereference = not opts.recursive
+    if len(opts.paths) < 2:
+        raise ValueError("требуется как минимум два операнда")
+    return opts
+
+
+def _copy_range(src_fd, dst_fd, offset, length):
+    # Копирование внутри ядра: copy_file_range, затем sendfile
+    end = offset + length
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(src_fd, dst_fd, end - offset, offset, offset)
+                if copied == 0:
+                    return offset
+                offset += copied
+            return offset
+        except OSError as e:
+            if e.errno not in FALLBACK_ERRORS:
+                raise
+    if hasattr(os, "sendfile"):
+        try:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            while offset < end:
+                sent = os.sendfile(dst_fd, src_fd, offset, end - offset)
+                if sent == 0:
+                    return offset
+                offset += sent
+            return offset
+        except OSError as e:
+            if e.errno not in FALLBACK_ERRORS:
+                raise
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while offset < end:
+        data = os.read(src_fd, min(BUFFER_SIZE, end - offset))
+        if not data:
+            break
+        view = memoryview(data)
+        while view:
+            written = os.write(dst_fd, view)
+            view = view[written:]
+        offset += len(data)
+    return offset
+
+
+def _data_segments(src_fd, size):
+    # Участки с данными разреженного файла; дыры между ними не копируются
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(src_fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                return
+            raise
+        end = os.lseek(src_fd, start, os.SEEK_HOLE)
+        yield start, end - start
+        offset = end
+
+
+def _reflink(src_fd, dst_fd):
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def copy_data(src_fd, dst_fd, st, opts):
+    if opts.reflink != "never":
+        if _reflink(src_fd, dst_fd):
+            return st.st_size
+        if opts.reflink == "always":
+            raise OSError(errno.EOPNOTSUPP, "клонирование не поддерживается")
+        # Файловая система не умеет клонировать: не пытаемся на каждом файле
+        opts.reflink = "never"
+
+    size = st.st_size
+    blocks = getattr(st, "st_blocks", None)
+    sparse = opts.sparse == "always" or (opts.sparse == "auto" and blocks is not None and blocks * 512 < size)
+    if sparse and hasattr(os, "SEEK_DATA"):
+        try:
+            segments = list(_data_segments(src_fd, size))
+        except OSError:
+            segments = None
+        if segments is not None:
+            for offset, length in segments:
+                _copy_range(src_fd, dst_fd, offset, length)
+            os.ftruncate(dst_fd, size)
+            return size
+    return _copy_range(src_fd, dst_fd, 0, size)
+
+
+def apply_metadata(path, st, follow_symlinks=True):
+    if hasattr(os, "chown"):
+        try:
+            os.chown(path, st.st_uid, st.st_gid, follow_symlinks=follow_symlinks)
+        except (PermissionError, NotImplementedError):
+            # Без прав суперпользователя владельца не сохранить, как и в GNU cp
+            pass
+    # У символической ссылки права не меняются
+    if follow_symlinks:
+        os.chmod(path, stat.S_IMODE(st.st_mode))
+    if follow_symlinks or os.utime in os.supports_follow_symlinks:
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns), follow_symlinks=follow_symlinks)
+
+
+def _skip(dst, st, opts):
+    if not (opts.no_clobber or opts.update):
+        return False
+    try:
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if opts.no_clobber:
+        return True
+    # -u: копируем только если источник новее
+    return dst_st.st_mtime_ns >= st.st_mtime_ns
+
+
+def copy_file(src, dst, st, opts):
+    # Возвращает число скопированных байтов или None, если файл пропущен
+    if _skip(dst, st, opts):
+        return None
+    binary = getattr(os, "O_BINARY", 0)
+    src_fd = os.open(src, os.O_RDONLY | binary)
+    try:
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | binary
+        try:
+            dst_fd = os.open(dst, flags, stat.S_IMODE(st.st_mode))
+        except PermissionError:
+            if not opts.force:
+                raise
+            os.unlink(dst)
+            dst_fd = os.open(dst, flags, stat.S_IMODE(st.st_mode))
+        try:
+            copied = copy_data(src_fd, dst_fd, st, opts)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    if opts.preserve:
+        apply_metadata(dst, st)
+    return copied
+
+
+def copy_symlink(src, dst, st, opts):
+    if _skip(dst, st, opts):
+        return None
+    target = os.readlink(src)
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    os.symlink(target, dst)
+    if opts.preserve:
+        apply_metadata(dst, st, follow_symlinks=False)
+    return 0
+
+
+class CopyJob:
+    def __init__(self, emu, opts):
+        self.emu = emu
+        self.opts = opts
+        self.exit_code = 0
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        # Директории для -p: их время восстанавливается после копирования содержимого
+        self.directories = []
+        # Жесткие ссылки для -a: (dev, ino) -> первый скопированный путь
+        self.inodes = {}
+        self.deferred_links = []
+        self.window = deque()
+        self.pool = None
+
+    def error(self, message):
+        print(f"cp: {message}")
+        self.exit_code = 1
+
+    def submit(self, func, src, dst, st, display):
+        if self.pool is None:
+            self.finish(self._run(func, src, dst, st), display)
+            return
+        self.window.append((self.pool.submit(self._run, func, src, dst, st), display))
+        while len(self.window) > self.opts.workers * QUEUE_PER_WORKER:
+            self.drain()
+
+    @staticmethod
+    def _run(func, src, dst, st):
+        try:
+            return func(src, dst, st), None
+        except OSError as e:
+            return None, e
+
+    def drain(self):
+        future, display = self.window.popleft()
+        self.finish(future.result(), display)
+
+    def finish(self, result, display):
+        copied, error = result
+        src, dst = display
+        if error is not None:
+            self.error(f"невозможно скопировать '{src}' в '{dst}': {reason(error)}")
+            return
+        if copied is None:
+            self.skipped += 1
+            return
+        self.files += 1
+        self.bytes += copied
+        if self.opts.verbose:
+            print(f"'{src}' -> '{dst}'")
+
+    def copy_entry(self, st, src_path, dst_path, src_label, dst_label):
+        if stat.S_ISLNK(st.st_mode):
+            self.submit(lambda s, d, t: copy_symlink(s, d, t, self.opts), src_path, dst_path, st,
+                        (src_label, dst_label))
+            return
+        if not stat.S_ISREG(st.st_mode):
+            self.error(f"пропущен специальный файл '{src_label}'")
+            return
+        if self.opts.links and st.st_nlink > 1:
+            key = (st.st_dev, st.st_ino)
+            if key in self.inodes:
+                self.deferred_links.append((self.inodes[key], dst_path, dst_label))
+                return
+            self.inodes[key] = dst_path
+        self.submit(lambda s, d, t: copy_file(s, d, t, self.opts), src_path, dst_path, st,
+                    (src_label, dst_label))
+
+    def copy_tree(self, src_path, dst_path, src_label, dst_label):
+        deref = self.opts.dereference
+        onerror = lambda e: self.error(f"невозможно прочитать директорию '{e.filename}': {reason(e)}")
+        for entry, depth in walk(src_path, follow_symlinks=deref, follow_top=deref, sort=True, onerror=onerror):
+            relative = entry.path[len(src_path):].lstrip(os.sep) if depth else ""
+            target = os.path.join(dst_path, relative) if relative else dst_path
+            source_label = os.path.join(src_label, relative) if relative else src_label
+            target_label = os.path.join(dst_label, relative) if relative else dst_label
+            try:
+                st = entry.stat(follow_symlinks=deref)
+            except OSError as e:
+                self.error(f"невозможно выполнить stat для '{source_label}': {reason(e)}")
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                self.copy_entry(st, entry.path, target, source_label, target_label)
+                continue
+            # Директории создаются в прямом порядке, до своего содержимого,
+            # поэтому файлы в пуле можно копировать в любом порядке
+            try:
+                os.makedirs(target, exist_ok=True)
+            except OSError as e:
+                self.error(f"невозможно создать директорию '{target_label}': {reason(e)}")
+                continue
+            if self.opts.verbose:
+                print(f"'{source_label}' -> '{target_label}'")
+            if self.opts.preserve:
+                self.directories.append((target, st))
+
+    def copy_source(self, src, dst_path, dst_label):
+        src_path = os.path.join(self.emu.current_dir, src) if not os.path.isabs(src) else src
+        try:
+            st = os.stat(src_path) if self.opts.dereference else os.lstat(src_path)
+        except (FileNotFoundError, PermissionError) as e:
+            self.error(f"невозможно выполнить stat для '{src}': {reason(e)}")
+            return
+
+        if stat.S_ISDIR(st.st_mode):
+            if not self.opts.recursive:
+                self.error(f"-r не указан; пропущена директория '{src}'")
+                return
+            real_src = os.path.realpath(src_path)
+            if (os.path.realpath(dst_path) + os.sep).startswith(real_src + os.sep):
+                self.error(f"невозможно скопировать директорию '{src}' в саму себя '{dst_label}'")
+                return
+            self.copy_tree(src_path, dst_path, src.rstrip(os.sep) or src, dst_label)
+            return
+
+        try:
+            dst_st = os.stat(dst_path)
+            if (dst_st.st_dev, dst_st.st_ino) == (st.st_dev, st.st_ino):
+                self.error(f"'{src}' и '{dst_label}' это один и тот же файл")
+                return
+        except OSError:
+            pass
+        self.copy_tree(src_path, dst_path, src, dst_label)
+
+    def run(self, sources, dest):
+        dest_path = os.path.join(self.emu.current_dir, dest) if not os.path.isabs(dest) else dest
+        dest_is_dir = os.path.isdir(dest_path)
+        if len(sources) > 1 and not dest_is_dir:
+            self.error(f"целевой объект '{dest}' не является директорией")
+            return self.exit_code
+
+        started = time.monotonic()
+        if self.opts.workers > 1:
+            self.pool = ThreadPoolExecutor(max_workers=self.opts.workers)
+        try:
+            for src in sources:
+                if dest_is_dir:
+                    name = os.path.basename(os.path.normpath(src))
+                    self.copy_source(src, os.path.join(dest_path, name), os.path.join(dest, name))
+                else:
+                    self.copy_source(src, dest_path, dest)
+            while self.window:
+                self.drain()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+        for existing, dst_path, dst_label in self.deferred_links:
+            try:
+                if os.path.lexists(dst_path):
+                    os.unlink(dst_path)
+                os.link(existing, dst_path)
+            except OSError as e:
+                self.error(f"невозможно создать жесткую ссылку '{dst_label}': {reason(e)}")
+        # Время директорий выставляется в последнюю очередь: запись файлов его меняет
+        for path, st in reversed(self.directories):
+            try:
+                apply_metadata(path, st)
+            except OSError as e:
+                self.error(f"не удалось сохранить атрибуты '{path}': {reason(e)}")
+
+        if self.opts.verbose or self.opts.stats:
+            elapsed = max(time.monotonic() - started, 1e-6)
+            line = (f"скопировано файлов: {self.files}, {self.emu._human_size(self.bytes)} за {elapsed:.2f} с "
+                    f"({self.emu._human_size(self.bytes / elapsed)}/с)")
+            if self.skipped:
+                line += f", пропущено: {self.skipped}"
+            print(line)
+        return self.exit_code
+
+
+def cp(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"cp: {e}")
+        return 1
+    return CopyJob(emu, opts).run(opts.paths[:-1], opts.paths[-1])
@@ -0,0 +1,526 @@
+import os
+import time
+
+from commands.common import reason
+from commands.walk import scan
+
+CHUNK_SIZE = 1024 * 1024
+# Файл считается двоичным, если в начале есть нулевой байт (как в GNU diff)
+BINARY_SNIFF = 8192
+HASH_ALGORITHM = "blake2b"
+
+
+class DiffOptions:
+    def __init__(self):
+        self.unified = None
+        self.brief = False
+        self.recursive = False
+        self.new_file = False
+        self.ignore_case = False
+        self.ignore_space_change = False
+        self.ignore_all_space = False
+        self.text = False
+        self.switches = []
+        self.paths = []
+
+
+FLAGS = {
+    "q": "brief",
+    "r": "recursive",
+    "N": "new_file",
+    "i": "ignore_case",
+    "b": "ignore_space_change",
+    "w": "ignore_all_space",
+    "a": "text",
+}
+LONG_FLAGS = {
+    "--brief": "brief",
+    "--recursive": "recursive",
+    "--new-file": "new_file",
+    "--ignore-case": "ignore_case",
+    "--ignore-space-change": "ignore_space_change",
+    "--ignore-all-space": "ignore_all_space",
+    "--text": "text",
+}
+
+
+def parse_args(args):
+    opts = DiffOptions()
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--":
+            opts.paths.extend(args[i + 1:])
+            break
+        if arg in LONG_FLAGS:
+            setattr(opts, LONG_FLAGS[arg], True)
+            opts.switches.append(arg)
+        elif arg == "--unified" or arg.startswith("--unified="):
+            opts.unified = _context(arg.split("=", 1)[1]) if "=" in arg else 3
+            opts.switches.append(arg)
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            opts.switches.append(arg)
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                if flag == "U":
+                    value = arg[j + 1:]
+                    if not value:
+                        i += 1
+                        if i >= len(args):
+                            raise ValueError("ключ требует аргумент -- 'U'")
+                        value = args[i]
+                        opts.switches.append(value)
+                    opts.unified = _context(value)
+                    break
+                if flag == "u":
+                    opts.unified = 3
+                elif flag in FLAGS:
+                    setattr(opts, FLAGS[flag], True)
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                j += 1
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            opts.paths.append(arg)
+        i += 1
+
+    if len(opts.paths) != 2:
+        raise ValueError("требуется два файла для сравнения")
+    return opts
+
+
+def _context(value):
+    if not value.isdigit():
+        raise ValueError(f"неверная длина контекста '{value}'")
+    return int(value)
+
+
+# Алгоритм Майерса в линейной памяти: ищем «среднюю змейку» кратчайшего
+# пути правок и рекурсивно сравниваем части до и после нее. Общие начало и
+# конец каждого диапазона отрезаются до запуска алгоритма, а строки заранее
+# заменены целыми номерами, так что сравнение элементов дешевое
+
+def _middle_snake(a, a0, a1, b, b0, b1):
+    n = a1 - a0
+    m = b1 - b0
+    delta = n - m
+    odd = delta & 1
+    limit = (n + m + 1) // 2 + 1
+    offset = limit + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+
+    for d in range(limit + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            back_k = delta - k
+            if odd and -(d - 1) <= back_k <= d - 1 and x + backward[offset + back_k] >= n:
+                return a0 + start_x, b0 + start_y, a0 + x, b0 + y
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[a1 - 1 - x] == b[b1 - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            forward_k = delta - k
+            if not odd and -d <= forward_k <= d and x + forward[offset + forward_k] >= n:
+                return a1 - x, b1 - y, a1 - start_x, b1 - start_y
+    raise AssertionError("не найдена средняя змейка")
+
+
+def _diff_range(a, a0, a1, b, b0, b1, changes):
+    while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+        a0 += 1
+        b0 += 1
+    while a0 < a1 and b0 < b1 and a[a1 - 1] == b[b1 - 1]:
+        a1 -= 1
+        b1 -= 1
+    if a0 == a1 or b0 == b1:
+        if a0 < a1 or b0 < b1:
+            changes.append([a0, a1, b0, b1])
+        return
+    x, y, u, v = _middle_snake(a, a0, a1, b, b0, b1)
+    _diff_range(a, a0, x, b, b0, y, changes)
+    _diff_range(a, u, a1, b, v, b1, changes)
+
+
+def _matches(a, b):
+    # Пары совпавших позиций (i, j) в порядке возрастания
+    changes = []
+    _diff_range(a, 0, len(a), b, 0, len(b), changes)
+    i = j = 0
+    for i1, i2, j1, j2 in changes:
+        while i < i1:
+            yield i, j
+            i += 1
+            j += 1
+        i, j = i2, j2
+    while i < len(a):
+        yield i, j
+        i += 1
+        j += 1
+
+
+def diff_sequences(a, b):
+    # Возвращает блоки изменений [i1, i2, j1, j2]: строки a[i1:i2]
+    # заменяются на b[j1:j2]. Строки, которых нет в другом файле, ни с чем
+    # не совпадут, поэтому в алгоритм идут только общие строки - на сильно
+    # различающихся файлах это сокращает путь правок на порядки
+    common = set(a).intersection(b)
+    keep_a = [i for i, x in enumerate(a) if x in common]
+    keep_b = [j for j, y in enumerate(b) if y in common]
+    filtered_a = [a[i] for i in keep_a]
+    filtered_b = [b[j] for j in keep_b]
+
+    changes = []
+    prev_i = prev_j = 0
+    for i, j in _matches(filtered_a, filtered_b):
+        i = keep_a[i]
+        j = keep_b[j]
+        if i > prev_i or j > prev_j:
+            changes.append([prev_i, i, prev_j, j])
+        prev_i, prev_j = i + 1, j + 1
+    if prev_i < len(a) or prev_j < len(b):
+        changes.append([prev_i, len(a), prev_j, len(b)])
+    return changes
+
+
+def _normalizer(opts):
+    if not (opts.ignore_case or opts.ignore_space_change or opts.ignore_all_space):
+        return None
+
+    def normalize(line):
+        line = line.rstrip(b"\n")
+        if opts.ignore_all_space:
+            line = b"".join(line.split())
+        elif opts.ignore_space_change:
+            line = b" ".join(line.split())
+        return line.lower() if opts.ignore_case else line
+    return normalize
+
+
+def intern_lines(lines_a, lines_b, normalize=None):
+    # Одинаковые строки получают один номер: дальше алгоритм сравнивает числа
+    table = {}
+    if normalize is None:
+        ids_a = [table.setdefault(line, len(table)) for line in lines_a]
+        ids_b = [table.setdefault(line, len(table)) for line in lines_b]
+    else:
+        ids_a = [table.setdefault(normalize(line), len(table)) for line in lines_a]
+        ids_b = [table.setdefault(normalize(line), len(table)) for line in lines_b]
+    return ids_a, ids_b
+
+
+def split_lines(data):
+    # Строки сохраняют перевод строки: последняя строка без него - другая строка
+    lines = data.split(b"\n")
+    last = lines.pop()
+    lines = [line + b"\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def _show(prefix, line):
+    text = prefix + line.rstrip(b"\n").decode("utf-8", "replace")
+    if not line.endswith(b"\n"):
+        return [text, "\\ Нет новой строки в конце файла"]
+    return [text]
+
+
+def _range(start, end):
+    # Номера строк для обычного формата: start - первая строка (с 1)
+    return str(start) if end <= start else f"{start},{end}"
+
+
+def normal_format(changes, lines_a, lines_b):
+    for i1, i2, j1, j2 in changes:
+        if i1 == i2:
+            yield f"{i1}a{_range(j1 + 1, j2)}"
+        elif j1 == j2:
+            yield f"{_range(i1 + 1, i2)}d{j1}"
+        else:
+            yield f"{_range(i1 + 1, i2)}c{_range(j1 + 1, j2)}"
+        for line in lines_a[i1:i2]:
+            yield from _show("< ", line)
+        if i1 != i2 and j1 != j2:
+            yield "---"
+        for line in lines_b[j1:j2]:
+            yield from _show("> ", line)
+
+
+def _unified_range(start, count):
+    if count == 1:
+        return str(start + 1)
+    return f"{start + 1 if count else start},{count}"
+
+
+def _timestamp(path):
+    # Отсутствующий файл (-N) показывается с нулевым временем
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns if path is not None else 0
+    except OSError:
+        mtime_ns = 0
+    seconds, nanos = divmod(mtime_ns, 10 ** 9)
+    local = time.localtime(seconds)
+    return time.strftime("%Y-%m-%d %H:%M:%S", local) + f".{nanos:09d} " + time.strftime("%z", local)
+
+
+def unified_format(changes, lines_a, lines_b, context, label_a, label_b, path_a, path_b):
+    yield f"--- {label_a}\t{_timestamp(path_a)}"
+    yield f"+++ {label_b}\t{_timestamp(path_b)}"
+    # Изменения, между которыми не больше 2*context общих строк, идут в один фрагмент
+    hunks = []
+    for change in changes:
+        if hunks and change[0] - hunks[-1][-1][1] <= 2 * context:
+            hunks[-1].append(change)
+        else:
+            hunks.append([change])
+
+    for hunk in hunks:
+        start_a = max(hunk[0][0] - context, 0)
+        start_b = max(hunk[0][2] - context, 0)
+        end_a = min(hunk[-1][1] + context, len(lines_a))
+        end_b = min(hunk[-1][3] + context, len(lines_b))
+        yield f"@@ -{_unified_range(start_a, end_a - start_a)} +{_unified_range(start_b, end_b - start_b)} @@"
+        pos = start_a
+        for i1, i2, j1, j2 in hunk:
+            for line in lines_a[pos:i1]:
+                yield from _show(" ", line)
+            for line in lines_a[i1:i2]:
+                yield from _show("-", line)
+            for line in lines_b[j1:j2]:
+                yield from _show("+", line)
+            pos = i2
+        for line in lines_a[pos:end_a]:
+            yield from _show(" ", line)
+
+
+def same_content(path_a, path_b):
+    with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+        while True:
+            chunk_a = fa.read(CHUNK_SIZE)
+            if chunk_a != fb.read(CHUNK_SIZE):
+                return False
+            if not chunk_a:
+                return True
+
+
+def _read(path):
+    if path is None:
+        return b""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class Differ:
+    def __init__(self, emu, opts):
+        self.emu = emu
+        self.opts = opts
+        self.normalize = _normalizer(opts)
+        self.exit_code = 0
+
+    def full_path(self, path):
+        return os.path.join(self.emu.current_dir, path) if not os.path.isabs(path) else path
+
+    def trouble(self, message):
+        print(f"diff: {message}")
+        self.exit_code = 2
+
+    def compare_files(self, label_a, label_b, path_a, path_b, known_different=False, header=False):
+        # path_a/path_b равен None для отсутствующего файла при -N
+        if not known_different and path_a is not None and path_b is not None and self.normalize is None:
+            st_a = os.stat(path_a)
+            st_b = os.stat(path_b)
+            if (st_a.st_dev, st_a.st_ino) == (st_b.st_dev, st_b.st_ino):
+                return
+            if st_a.st_size == st_b.st_size and same_content(path_a, path_b):
+                return
+            known_different = True
+
+        if self.opts.brief and self.normalize is None:
+            print(f"Файлы {label_a} и {label_b} различаются")
+            self.exit_code = max(self.exit_code, 1)
+            return
+
+        data_a = _read(path_a)
+        data_b = _read(path_b)
+        if not self.opts.text and (b"\0" in data_a[:BINARY_SNIFF] or b"\0" in data_b[:BINARY_SNIFF]):
+            if data_a != data_b:
+                print(f"Двоичные файлы {label_a} и {label_b} различаются")
+                self.exit_code = max(self.exit_code, 1)
+            return
+
+        lines_a = split_lines(data_a)
+        lines_b = split_lines(data_b)
+        ids_a, ids_b = intern_lines(lines_a, lines_b, self.normalize)
+        changes = diff_sequences(ids_a, ids_b)
+        if not changes:
+            return
+        self.exit_code = max(self.exit_code, 1)
+        if self.opts.brief:
+            print(f"Файлы {label_a} и {label_b} различаются")
+            return
+        if header:
+            print(" ".join(["diff"] + self.opts.switches + [label_a, label_b]))
+        if self.opts.unified is not None:
+            output = unified_format(changes, lines_a, lines_b, self.opts.unified, label_a, label_b, path_a, path_b)
+        else:
+            output = normal_format(changes, lines_a, lines_b)
+        self.emu.out.write_lines(output)
+
+    def collect(self, label_a, label_b, dir_a, dir_b, events):
+        # Сначала собираем все пары файлов обоих деревьев в порядке вывода,
+        # чтобы проверить одинаковые по размеру пары одним пакетом хэширования
+        try:
+            entries_a = {entry.name: entry for entry in scan(dir_a)} if dir_a is not None else {}
+            entries_b = {entry.name: entry for entry in scan(dir_b)} if dir_b is not None else {}
+        except OSError as e:
+            events.append(("error", f"{e.filename}: {reason(e)}"))
+            return
+
+        for name in sorted(set(entries_a) | set(entries_b)):
+            entry_a = entries_a.get(name)
+            entry_b = entries_b.get(name)
+            sub_a = os.path.join(label_a, name)
+            sub_b = os.path.join(label_b, name)
+            if entry_a is None or entry_b is None:
+                entry = entry_a or entry_b
+                if not self.opts.new_file:
+                    events.append(("only", f"Только в {label_a if entry_a else label_b}: {name}"))
+                elif entry.is_dir():
+                    if self.opts.recursive:
+                        self.collect(sub_a, sub_b, entry_a and entry_a.path, entry_b and entry_b.path, events)
+                else:
+                    events.append(("file", sub_a, sub_b, entry_a and entry_a.path, entry_b and entry_b.path))
+                continue
+
+            is_dir_a = entry_a.is_dir()
+            is_dir_b = entry_b.is_dir()
+            if is_dir_a and is_dir_b:
+                if self.opts.recursive:
+                    self.collect(sub_a, sub_b, entry_a.path, entry_b.path, events)
+                else:
+                    events.append(("only", f"Общие подкаталоги: {sub_a} и {sub_b}"))
+            elif is_dir_a or is_dir_b:
+                kinds = ("каталогом", "обычным файлом") if is_dir_a else ("обычным файлом", "каталогом")
+                events.append(("only", f"Файл {sub_a} является {kinds[0]}, а файл {sub_b} - {kinds[1]}"))
+            else:
+                events.append(("file", sub_a, sub_b, entry_a.path, entry_b.path))
+
+    def quick_check(self, events):
+        # Для пар одного размера содержимое сверяется по хэшам; хэши берутся из
+        # постоянного кэша, если размер и mtime файла не менялись с прошлого раза
+        from commands.hashing import CACHE_FILE, ChecksumCache, hash_files
+
+        candidates = []
+        verdicts = {}
+        for i, event in enumerate(events):
+            if event[0] != "file" or event[3] is None or event[4] is None:
+                continue
+            try:
+                st_a = os.stat(event[3])
+                st_b = os.stat(event[4])
+            except OSError:
+                continue
+            if (st_a.st_dev, st_a.st_ino) == (st_b.st_dev, st_b.st_ino):
+                verdicts[i] = True
+            elif st_a.st_size != st_b.st_size:
+                verdicts[i] = False
+            else:
+                candidates.append(i)
+
+        if candidates:
+            paths = []
+            for i in candidates:
+                paths.extend((events[i][3], events[i][4]))
+            cache = ChecksumCache(os.path.join(self.emu.home_dir, CACHE_FILE))
+            try:
+                digests = hash_files(paths, HASH_ALGORITHM, cache=cache)
+            finally:
+                cache.close()
+            for n, i in enumerate(candidates):
+                digest_a, digest_b = digests[2 * n], digests[2 * n + 1]
+                if not isinstance(digest_a, OSError) and not isinstance(digest_b, OSError):
+                    verdicts[i] = digest_a == digest_b
+        return verdicts
+
+    def compare_dirs(self, label_a, label_b, dir_a, dir_b):
+        events = []
+        self.collect(label_a, label_b, dir_a, dir_b, events)
+        # С игнорированием регистра или пробелов одинаковость решает только построчное сравнение
+        verdicts = self.quick_check(events) if self.normalize is None else {}
+        for i, event in enumerate(events):
+            kind = event[0]
+            if kind == "error":
+                self.trouble(event[1])
+            elif kind == "only":
+                print(event[1])
+                self.exit_code = max(self.exit_code, 1)
+            else:
+                _, sub_a, sub_b, path_a, path_b = event
+                same = verdicts.get(i)
+                if same:
+                    continue
+                try:
+                    self.compare_files(sub_a, sub_b, path_a, path_b, known_different=same is False, header=True)
+                except OSError as e:
+                    self.trouble(f"{e.filename}: {reason(e)}")
+
+    def run(self):
+        label_a, label_b = self.opts.paths
+        path_a = self.full_path(label_a)
+        path_b = self.full_path(label_b)
+        for label, path in ((label_a, path_a), (label_b, path_b)):
+            if not os.path.exists(path):
+                self.trouble(f"{label}: Нет такого файла или директории")
+        if self.exit_code:
+            return self.exit_code
+
+        is_dir_a = os.path.isdir(path_a)
+        is_dir_b = os.path.isdir(path_b)
+        if is_dir_a and is_dir_b:
+            self.compare_dirs(label_a, label_b, path_a, path_b)
+            return self.exit_code
+        # Файл и директория: сравниваем с одноименным файлом внутри директории
+        if is_dir_a:
+            label_a = os.path.join(label_a, os.path.basename(label_b))
+            path_a = os.path.join(path_a, os.path.basename(path_b))
+        elif is_dir_b:
+            label_b = os.path.join(label_b, os.path.basename(label_a))
+            path_b = os.path.join(path_b, os.path.basename(path_a))
+        try:
+            self.compare_files(label_a, label_b, path_a, path_b)
+        except FileNotFoundError as e:
+            self.trouble(f"{e.filename}: {reason(e)}")
+        except IsADirectoryError:
+            self.trouble("один из аргументов является директорией")
+        except PermissionError:
+            self.trouble("невозможно открыть файл для чтения: Отказано в доступе")
+        return self.exit_code
+
+
+def diff(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"diff: {e}")
+        return 2
+    return Differ(emu, opts).run()
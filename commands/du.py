@@ -0,0 +1,294 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from commands.common import default_workers, reason
+from commands.walk import PathEntry, scan, walk
+
+
+class DuOptions:
+    def __init__(self):
+        self.summarize = False
+        self.all = False
+        self.human_readable = False
+        self.apparent_size = False
+        self.bytes = False
+        self.block_size = 1024
+        self.total = False
+        self.count_links = False
+        self.max_depth = None
+        self.paths = []
+
+
+def parse_args(args):
+    opts = DuOptions()
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--summarize":
+            opts.summarize = True
+        elif arg == "--all":
+            opts.all = True
+        elif arg == "--human-readable":
+            opts.human_readable = True
+        elif arg == "--apparent-size":
+            opts.apparent_size = True
+        elif arg == "--bytes":
+            opts.bytes = opts.apparent_size = True
+        elif arg == "--total":
+            opts.total = True
+        elif arg == "--count-links":
+            opts.count_links = True
+        elif arg.startswith("--max-depth="):
+            opts.max_depth = _depth(arg.split("=", 1)[1])
+        elif arg == "-d" or arg == "--max-depth":
+            i += 1
+            if i >= len(args):
+                raise ValueError(f"ключ требует аргумент -- '{arg}'")
+            opts.max_depth = _depth(args[i])
+        elif arg.startswith("-") and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag == "s":
+                    opts.summarize = True
+                elif flag == "a":
+                    opts.all = True
+                elif flag == "h":
+                    opts.human_readable = True
+                elif flag == "b":
+                    opts.bytes = opts.apparent_size = True
+                elif flag == "k":
+                    opts.block_size = 1024
+                elif flag == "m":
+                    opts.block_size = 1024 * 1024
+                elif flag == "c":
+                    opts.total = True
+                elif flag == "l":
+                    opts.count_links = True
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+        else:
+            opts.paths.append(arg)
+        i += 1
+
+    if opts.summarize:
+        if opts.max_depth not in (None, 0):
+            raise ValueError("нельзя одновременно суммировать и выводить все записи")
+        opts.max_depth = 0
+    if not opts.paths:
+        opts.paths = ["."]
+    return opts
+
+
+def _depth(value):
+    if not value.isdigit():
+        raise ValueError(f"неверная максимальная глубина '{value}'")
+    return int(value)
+
+
+class HardlinkFilter:
+    # Файл с несколькими жесткими ссылками учитывается один раз - там, где
+    # встретился первым. Каждое поддерево фильтрует повторы внутри себя, а
+    # повторы между поддеревьями снимает measure при слиянии в порядке
+    # листинга, поэтому итоги не зависят от того, какой поток успел раньше
+    def __init__(self):
+        self._seen = set()
+
+    def first_time(self, st):
+        return self.first_key((st.st_dev, st.st_ino))
+
+    def first_key(self, key):
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        return True
+
+
+def _entry_size(st, opts, links):
+    # None - повторная жесткая ссылка: ее не считают и не выводят
+    if links is not None and st.st_nlink > 1 and not stat.S_ISDIR(st.st_mode):
+        if not links.first_time(st):
+            return None
+    if opts.apparent_size:
+        return st.st_size
+    # Занятое на диске место; на Windows st_blocks нет - берем видимый размер
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def _visible(opts, depth):
+    return opts.max_depth is None or depth <= opts.max_depth
+
+
+def size_tree(top, opts, links, offset=0, onerror=None, cache=None, shared=None):
+    # Обходит дерево в прямом порядке и собирает размеры снизу вверх: открытые
+    # директории лежат на стеке и закрываются, как только обход уходит из них.
+    # Возвращает общий размер и строки для вывода в порядке du (содержимое
+    # раньше директории). В shared попадают учтенные файлы с жесткими
+    # ссылками: (inode, размер, путь, директории над ним)
+    lines = []
+    stack = []
+    total = 0
+
+    def close():
+        nonlocal total
+        depth, path, size = stack.pop()
+        if stack:
+            stack[-1][2] += size
+        else:
+            total += size
+        if _visible(opts, depth):
+            lines.append((depth, size, path))
+
+    for entry, depth in walk(top, onerror=onerror):
+        depth += offset
+        while stack and stack[-1][0] >= depth:
+            close()
+        try:
+            st = cache.entry_stat(entry) if cache is not None else entry.stat(follow_symlinks=False)
+            size = _entry_size(st, opts, links)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+        if size is None:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            stack.append([depth, entry.path, size])
+            continue
+        if shared is not None and st.st_nlink > 1:
+            shared.append(((st.st_dev, st.st_ino), size, entry.path, [item[1] for item in stack]))
+        if stack:
+            stack[-1][2] += size
+        else:
+            total += size
+        if (opts.all or depth == offset) and _visible(opts, depth):
+            lines.append((depth, size, entry.path))
+
+    while stack:
+        close()
+    return total, lines
+
+
+def measure(full_path, opts, links, pool, onerror=None, cache=None):
+    root = PathEntry(full_path)
+    root_stat = root.stat(follow_symlinks=False)
+    if not stat.S_ISDIR(root_stat.st_mode):
+        return size_tree(full_path, opts, links, onerror=onerror, cache=cache)
+
+    # Поддеревья первого уровня считаются параллельно, затем их итоги
+    # сливаются в корень в исходном порядке листинга; там же снимаются
+    # жесткие ссылки, уже учтенные в предыдущих поддеревьях
+    try:
+        children = scan(full_path)
+    except OSError as e:
+        if onerror is not None:
+            onerror(e)
+        children = []
+    jobs = []
+    for child in children:
+        if child.is_dir(follow_symlinks=False):
+            if links is None:
+                shared = None
+                future = pool.submit(size_tree, child.path, opts, None, 1, onerror, cache)
+            else:
+                shared = []
+                future = pool.submit(size_tree, child.path, opts, HardlinkFilter(), 1, onerror, cache, shared)
+            jobs.append((child, future, shared))
+        else:
+            jobs.append((child, None, None))
+
+    total = _entry_size(root_stat, opts, links)
+    lines = []
+    for child, future, shared in jobs:
+        if future is not None:
+            child_total, child_lines = future.result()
+            if shared:
+                child_total, child_lines = _drop_repeats(child_total, child_lines, shared, links)
+            lines.extend(child_lines)
+            total += child_total
+            continue
+        try:
+            st = cache.entry_stat(child) if cache is not None else child.stat(follow_symlinks=False)
+            size = _entry_size(st, opts, links)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+        if size is None:
+            continue
+        total += size
+        if opts.all and _visible(opts, 1):
+            lines.append((1, size, child.path))
+    lines.append((0, total, full_path))
+    return total, lines
+
+
+def _drop_repeats(total, lines, shared, links):
+    # Размер повторной ссылки снимается с итога поддерева и со всех директорий
+    # над ней, а ее собственная строка (-a) убирается
+    index = None
+    for key, size, path, parents in shared:
+        if links.first_key(key):
+            continue
+        if index is None:
+            index = {item_path: i for i, (_, _, item_path) in enumerate(lines)}
+        total -= size
+        for parent in parents:
+            i = index.get(parent)
+            if i is not None:
+                depth, parent_size, _ = lines[i]
+                lines[i] = (depth, parent_size - size, parent)
+        i = index.get(path)
+        if i is not None:
+            lines[i] = None
+    if index is not None:
+        lines = [line for line in lines if line is not None]
+    return total, lines
+
+
+def _format(emu, size, opts):
+    if opts.human_readable:
+        return emu._human_size(size)
+    if opts.bytes:
+        return str(size)
+    return str(-(-size // opts.block_size))
+
+
+def du(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"du: {e}")
+        return 1
+
+    exit_code = 0
+
+    def report(error):
+        nonlocal exit_code
+        exit_code = 1
+        print(f"du: невозможно прочитать директорию '{error.filename}': {reason(error)}")
+
+    links = None if opts.count_links else HardlinkFilter()
+    grand_total = 0
+    workers = default_workers()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path in opts.paths:
+            full_path = os.path.join(emu.current_dir, path) if not os.path.isabs(path) else path
+            try:
+                total, lines = measure(full_path, opts, links, pool, onerror=report, cache=emu.stat_cache)
+            except FileNotFoundError:
+                print(f"du: невозможно получить доступ к '{path}': Нет такого файла или директории")
+                exit_code = 1
+                continue
+            except PermissionError:
+                print(f"du: невозможно прочитать директорию '{path}': Отказано в доступе")
+                exit_code = 1
+                continue
+            grand_total += total
+            for depth, size, item_path in lines:
+                display = path if depth == 0 else os.path.join(path, os.path.relpath(item_path, full_path))
+                print(f"{_format(emu, size, opts)}\t{display}")
+
+    if opts.total:
+        print(f"{_format(emu, grand_total, opts)}\tитого")
+    return exit_code
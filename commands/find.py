@@ -0,0 +1,439 @@
+import fnmatch
+import os
+import re
+import stat
+import sys
+import time
+
+from commands.common import reason
+from commands.walk import walk
+
+# Стоимость проверки: все, что можно решить по имени и типу из DirEntry,
+# дешевле всего, stat - дороже, запуск процесса - дороже всего
+COST_NAME = 1
+COST_STAT = 10
+COST_EXEC = 100
+
+# Ограничение суммарной длины аргументов для -exec ... {} +
+EXEC_BATCH_CHARS = 128 * 1024
+
+
+class FindError(Exception):
+    pass
+
+
+class Test:
+    pure = True
+
+    def __init__(self, func, cost):
+        self.func = func
+        self.cost = cost
+
+    def evaluate(self, entry, path, depth):
+        return self.func(entry, path, depth)
+
+
+class Action:
+    pure = False
+    cost = COST_EXEC
+
+    def __init__(self, func, finish=None):
+        self.func = func
+        self.finish = finish
+
+    def evaluate(self, entry, path, depth):
+        return self.func(entry, path, depth)
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+        self.pure = child.pure
+        self.cost = child.cost
+
+    def evaluate(self, entry, path, depth):
+        return not self.child.evaluate(entry, path, depth)
+
+
+class And:
+    def __init__(self, children):
+        self.children = _reorder(children)
+        self.pure = all(child.pure for child in children)
+        self.cost = sum(child.cost for child in children)
+
+    def evaluate(self, entry, path, depth):
+        for child in self.children:
+            if not child.evaluate(entry, path, depth):
+                return False
+        return True
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+        self.pure = all(child.pure for child in children)
+        self.cost = sum(child.cost for child in children)
+
+    def evaluate(self, entry, path, depth):
+        for child in self.children:
+            if child.evaluate(entry, path, depth):
+                return True
+        return False
+
+
+def _reorder(children):
+    # Внутри -a чистые проверки можно переставлять: сначала дешевые (имя,
+    # тип), потом требующие stat. Через действия (-print, -exec, -prune)
+    # не переставляем, чтобы не изменить их побочные эффекты
+    result = []
+    run = []
+    for child in children:
+        if child.pure:
+            run.append(child)
+        else:
+            result.extend(sorted(run, key=lambda node: node.cost))
+            run = []
+            result.append(child)
+    result.extend(sorted(run, key=lambda node: node.cost))
+    return result
+
+
+def _compare(value, spec):
+    if spec.startswith("+"):
+        return lambda actual: actual > value
+    if spec.startswith("-"):
+        return lambda actual: actual < value
+    return lambda actual: actual == value
+
+
+def _number(option, spec):
+    try:
+        return int(spec.lstrip("+-"))
+    except ValueError:
+        raise FindError(f"неверный аргумент '{spec}' для '{option}'")
+
+
+SIZE_UNITS = {"c": 1, "w": 2, "b": 512, "k": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def _size_test(spec, lstat):
+    unit = "b"
+    number = spec
+    if spec and spec[-1] in SIZE_UNITS:
+        unit = spec[-1]
+        number = spec[:-1]
+    value = _number("-size", number)
+    check = _compare(value, number)
+    block = SIZE_UNITS[unit]
+    # Как в GNU find: размер округляется вверх до целого числа единиц
+    return Test(lambda entry, path, depth: check(-(-lstat(entry).st_size // block)), COST_STAT)
+
+
+def _time_test(option, spec, now, seconds, lstat):
+    value = _number(option, spec)
+    check = _compare(value, spec)
+    return Test(lambda entry, path, depth: check(int((now - lstat(entry).st_mtime) // seconds)), COST_STAT)
+
+
+def _type_test(kind, lstat):
+    if kind == "f":
+        return Test(lambda entry, path, depth: entry.is_file(follow_symlinks=False), COST_NAME)
+    if kind == "d":
+        return Test(lambda entry, path, depth: entry.is_dir(follow_symlinks=False), COST_NAME)
+    if kind == "l":
+        return Test(lambda entry, path, depth: entry.is_symlink(), COST_NAME)
+    checks = {"b": stat.S_ISBLK, "c": stat.S_ISCHR, "p": stat.S_ISFIFO, "s": stat.S_ISSOCK}
+    if kind not in checks:
+        raise FindError(f"неизвестный аргумент для -type: '{kind}'")
+    check = checks[kind]
+    return Test(lambda entry, path, depth: check(lstat(entry).st_mode), COST_STAT)
+
+
+def _empty_test(lstat):
+    def check(entry, path, depth):
+        if entry.is_dir(follow_symlinks=False):
+            with os.scandir(entry.path) as it:
+                return next(it, None) is None
+        return entry.is_file(follow_symlinks=False) and lstat(entry).st_size == 0
+    return Test(check, COST_STAT)
+
+
+class FindCommand:
+    def __init__(self, emu, args):
+        self.emu = emu
+        # stat записей идет через общий кэш сессии эмулятора
+        self.lstat = emu.stat_cache.entry_stat
+        self.max_depth = None
+        self.min_depth = 0
+        self.pruned = None
+        self.has_action = False
+        self.actions = []
+        self.now = time.time()
+        self.exit_code = 0
+
+        self.paths = []
+        i = 0
+        while i < len(args) and not (args[i].startswith("-") or args[i] in ("!", "(")):
+            self.paths.append(args[i])
+            i += 1
+        if not self.paths:
+            self.paths = ["."]
+
+        self.tokens = args[i:]
+        self.pos = 0
+        if self.tokens:
+            expr = self.parse_or()
+            if self.pos < len(self.tokens):
+                raise FindError(f"неожиданный аргумент '{self.tokens[self.pos]}'")
+        else:
+            expr = None
+
+        if not self.has_action:
+            # Без явного действия find печатает все, что прошло выражение
+            print_node = self.make_print("\n")
+            expr = print_node if expr is None else And([expr, print_node])
+        self.expr = expr
+
+    # Разбор выражения: or := and (-o and)*; and := unary ([-a] unary)*;
+    # unary := ! unary | ( or ) | первичное выражение
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, option):
+        if self.pos >= len(self.tokens):
+            raise FindError(f"отсутствует аргумент для '{option}'")
+        value = self.tokens[self.pos]
+        self.pos += 1
+        return value
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() in ("-o", "-or"):
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while self.peek() is not None and self.peek() not in ("-o", "-or", ")"):
+            if self.peek() in ("-a", "-and"):
+                self.pos += 1
+            children.append(self.parse_unary())
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self):
+        token = self.peek()
+        if token is None:
+            raise FindError("ожидается выражение")
+        if token in ("!", "-not"):
+            self.pos += 1
+            return Not(self.parse_unary())
+        if token == "(":
+            self.pos += 1
+            expr = self.parse_or()
+            if self.peek() != ")":
+                raise FindError("отсутствует ')'")
+            self.pos += 1
+            return expr
+        self.pos += 1
+        return self.parse_primary(token)
+
+    def parse_primary(self, token):
+        if token in ("-name", "-iname"):
+            pattern = self.take(token)
+            flags = re.IGNORECASE if token == "-iname" else 0
+            regex = re.compile(fnmatch.translate(pattern), flags)
+            return Test(lambda entry, path, depth: regex.match(entry.name if depth else os.path.basename(os.path.normpath(path))) is not None, COST_NAME)
+        if token in ("-path", "-ipath", "-wholename"):
+            pattern = self.take(token)
+            flags = re.IGNORECASE if token == "-ipath" else 0
+            regex = re.compile(fnmatch.translate(pattern), flags)
+            return Test(lambda entry, path, depth: regex.match(path) is not None, COST_NAME)
+        if token in ("-regex", "-iregex"):
+            pattern = self.take(token)
+            try:
+                regex = re.compile(pattern, re.IGNORECASE if token == "-iregex" else 0)
+            except re.error as e:
+                raise FindError(f"неверное регулярное выражение '{pattern}': {e}")
+            return Test(lambda entry, path, depth: regex.fullmatch(path) is not None, COST_NAME)
+        if token == "-type":
+            return _type_test(self.take(token), self.lstat)
+        if token == "-size":
+            return _size_test(self.take(token), self.lstat)
+        if token == "-mtime":
+            return _time_test(token, self.take(token), self.now, 86400, self.lstat)
+        if token == "-mmin":
+            return _time_test(token, self.take(token), self.now, 60, self.lstat)
+        if token == "-newer":
+            reference = self.take(token)
+            full_path = os.path.join(self.emu.current_dir, reference) if not os.path.isabs(reference) else reference
+            try:
+                reference_mtime = os.stat(full_path).st_mtime_ns
+            except OSError:
+                raise FindError(f"'{reference}': Нет такого файла или директории")
+            return Test(lambda entry, path, depth: self.lstat(entry).st_mtime_ns > reference_mtime, COST_STAT)
+        if token == "-empty":
+            return _empty_test(self.lstat)
+        if token in ("-maxdepth", "-mindepth"):
+            value = self.take(token)
+            if not value.isdigit():
+                raise FindError(f"неверный аргумент '{value}' для '{token}'")
+            if token == "-maxdepth":
+                self.max_depth = int(value)
+            else:
+                self.min_depth = int(value)
+            return Test(lambda entry, path, depth: True, 0)
+        if token in ("-true", "-false"):
+            result = token == "-true"
+            return Test(lambda entry, path, depth: result, 0)
+        if token == "-prune":
+            return Action(self.prune)
+        if token == "-print":
+            self.has_action = True
+            return self.make_print("\n")
+        if token == "-print0":
+            self.has_action = True
+            return self.make_print("\0")
+        if token in ("-exec", "-execdir", "-ok", "-okdir"):
+            self.has_action = True
+            return self.parse_exec(token)
+        raise FindError(f"неизвестный предикат '{token}'")
+
+    def make_print(self, end):
+        def action(entry, path, depth):
+            sys.stdout.write(path + end)
+            return True
+        return Action(action)
+
+    def prune(self, entry, path, depth):
+        self.pruned = entry.path
+        return True
+
+    def parse_exec(self, token):
+        command = []
+        while True:
+            word = self.take(token)
+            if word in (";", "\\;"):
+                batch = False
+                break
+            if word == "+" and command and command[-1] == "{}":
+                batch = True
+                command.pop()
+                break
+            command.append(word)
+        if not command:
+            raise FindError(f"отсутствует команда для '{token}'")
+        # -execdir/-okdir: команда запускается в директории файла и получает
+        # ./имя, а не путь от точки старта; -ok/-okdir спрашивают перед запуском
+        in_dir = token.endswith("dir")
+        ask = token.startswith("-ok")
+        if ask and batch:
+            raise FindError(f"'{token}' не поддерживает '{{}} +'")
+
+        def target(entry, path):
+            if not in_dir:
+                return None, path
+            full = os.path.normpath(entry.path)
+            return os.path.dirname(full), "./" + os.path.basename(full)
+
+        if not batch:
+            def action(entry, path, depth):
+                cwd, name = target(entry, path)
+                argv = [name if word == "{}" else word.replace("{}", name) for word in command]
+                if ask and not self.confirm(argv):
+                    return False
+                return self.run(argv, cwd) == 0
+            return Action(action)
+
+        # -exec ... {} + копит пути и запускает команду пачками; у -execdir
+        # пачка не пересекает границу директории
+        pending = []
+        pending_chars = [0]
+        pending_dir = [None]
+
+        def flush():
+            if pending:
+                if self.run(command + pending, pending_dir[0]) != 0:
+                    self.exit_code = 1
+                pending.clear()
+                pending_chars[0] = 0
+
+        def action(entry, path, depth):
+            cwd, name = target(entry, path)
+            if cwd != pending_dir[0]:
+                flush()
+                pending_dir[0] = cwd
+            pending.append(name)
+            pending_chars[0] += len(name) + 1
+            if pending_chars[0] >= EXEC_BATCH_CHARS:
+                flush()
+            return True
+
+        self.actions.append(flush)
+        return Action(action)
+
+    def confirm(self, argv):
+        # Как у GNU find: вопрос с командой целиком, ответ из stdin эмулятора
+        try:
+            answer = input(f"< {' '.join(argv)} > ? ")
+        except EOFError:
+            return False
+        return answer.strip().lower() in ("y", "yes", "д", "да")
+
+    def run(self, argv, cwd=None):
+        spec = self.emu.registry.get(argv[0])
+        if spec is not None:
+            # Встроенные команды эмулятора выполняются без запуска процесса;
+            # для -execdir текущая директория подменяется на время вызова
+            saved = self.emu.current_dir
+            if cwd is not None:
+                self.emu.current_dir = cwd
+            try:
+                status = spec.run(self.emu, argv[1:])
+            finally:
+                self.emu.current_dir = saved
+            return 0 if status is None else int(status)
+        import subprocess
+        sys.stdout.flush()
+        try:
+            return subprocess.run(argv, cwd=cwd or self.emu.current_dir).returncode
+        except OSError as e:
+            print(f"find: '{argv[0]}': {reason(e)}")
+            return 127
+
+    def execute(self):
+        def report(error):
+            self.exit_code = 1
+            print(f"find: '{error.filename}': {reason(error)}")
+
+        for start in self.paths:
+            full_path = os.path.join(self.emu.current_dir, start) if not os.path.isabs(start) else start
+            try:
+                for entry, depth in walk(full_path, max_depth=self.max_depth, min_depth=self.min_depth,
+                                         follow_top=False, onerror=report,
+                                         prune=lambda entry, depth: self.pruned == entry.path):
+                    path = start if depth == 0 else os.path.join(start, os.path.relpath(entry.path, full_path))
+                    try:
+                        self.expr.evaluate(entry, path, depth)
+                    except OSError as e:
+                        report(e)
+            except FileNotFoundError:
+                self.exit_code = 1
+                print(f"find: '{start}': Нет такого файла или директории")
+            except PermissionError:
+                self.exit_code = 1
+                print(f"find: '{start}': Отказано в доступе")
+
+        for flush in self.actions:
+            flush()
+        return self.exit_code
+
+
+def find(emu, args):
+    try:
+        command = FindCommand(emu, args)
+    except FindError as e:
+        print(f"find: {e}")
+        return 1
+    return command.execute()
@@ -0,0 +1,358 @@
+import os
+import re
+
+from commands import ExitStatus
+from commands.common import ordered_map, reason
+from commands.walk import iter_files
+
+CHUNK_SIZE = 1024 * 1024
+# Файл считается двоичным, если в начале есть нулевой байт (как в GNU grep)
+BINARY_SNIFF = 8192
+# Конструкции регулярного выражения, смысл которых зависит от того, что
+# считается символом: точка, \w \W \b \B \s \S \d \D и [^...]
+CHARACTER_SYNTAX = re.compile(r"(?<!\\)\.|\\[wWbBsSdD]|\[\^")
+
+SHORT_FLAGS = {
+    "i": "ignore_case",
+    "y": "ignore_case",
+    "v": "invert",
+    "c": "count",
+    "l": "files_with_matches",
+    "n": "line_numbers",
+    "r": "recursive",
+    "R": "recursive",
+    "w": "word",
+    "x": "line",
+    "F": "fixed",
+    "E": "extended",
+    "H": "with_filename",
+    "h": "no_filename",
+    "a": "text",
+    "s": "no_messages",
+    "q": "quiet",
+}
+
+LONG_FLAGS = {
+    "--ignore-case": "ignore_case",
+    "--invert-match": "invert",
+    "--count": "count",
+    "--files-with-matches": "files_with_matches",
+    "--line-number": "line_numbers",
+    "--recursive": "recursive",
+    "--word-regexp": "word",
+    "--line-regexp": "line",
+    "--fixed-strings": "fixed",
+    "--extended-regexp": "extended",
+    "--with-filename": "with_filename",
+    "--no-filename": "no_filename",
+    "--text": "text",
+    "--no-messages": "no_messages",
+    "--quiet": "quiet",
+}
+
+
+class GrepOptions:
+    def __init__(self):
+        for name in set(SHORT_FLAGS.values()):
+            setattr(self, name, False)
+        self.patterns = []
+        self.max_count = None
+        self.files = []
+
+
+def parse_args(args):
+    opts = GrepOptions()
+    operands = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--":
+            operands.extend(args[i + 1:])
+            break
+        if arg in LONG_FLAGS:
+            setattr(opts, LONG_FLAGS[arg], True)
+        elif arg.startswith("--max-count="):
+            opts.max_count = int(arg.split("=", 1)[1])
+        elif arg.startswith("--regexp="):
+            opts.patterns.append(arg.split("=", 1)[1])
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            # Ключи можно объединять: -inv, -rl, -ce ШАБЛОН, -m5
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                if flag in ("e", "m"):
+                    value = arg[j + 1:]
+                    if not value:
+                        i += 1
+                        if i >= len(args):
+                            raise ValueError(f"ключ требует аргумент -- '{flag}'")
+                        value = args[i]
+                    if flag == "e":
+                        opts.patterns.append(value)
+                    else:
+                        opts.max_count = int(value)
+                    break
+                if flag not in SHORT_FLAGS:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                setattr(opts, SHORT_FLAGS[flag], True)
+                j += 1
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            operands.append(arg)
+        i += 1
+
+    if not opts.patterns:
+        if not operands:
+            raise ValueError("требуется шаблон")
+        opts.patterns.append(operands.pop(0))
+    opts.files = operands
+    return opts
+
+
+def compile_pattern(opts, text):
+    if opts.fixed:
+        parts = [re.escape(p) for p in opts.patterns]
+    else:
+        parts = opts.patterns
+    pattern = "|".join(f"(?:{p})" for p in parts) if len(parts) > 1 else parts[0]
+    if opts.line:
+        pattern = f"^(?:{pattern})$"
+    elif opts.word:
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+
+    flags = re.MULTILINE
+    if opts.ignore_case:
+        flags |= re.IGNORECASE
+    if text:
+        return re.compile(pattern, flags)
+    return re.compile(pattern.encode("utf-8", "surrogateescape"), flags)
+
+
+def needs_text_mode(opts):
+    # В байтовом выражении '.', классы символов, регистр и границы слов
+    # работают с отдельными байтами и знают только ASCII: -w foo нашел бы
+    # foo в "приветfoo", а 'a.b' не нашел бы "aпb". Такие шаблоны ищутся по
+    # декодированному тексту; быстрый байтовый путь остается для ASCII
+    # шаблонов, которым все равно, из каких символов состоит строка
+    if opts.word or opts.ignore_case or not all(p.isascii() for p in opts.patterns):
+        return True
+    return not opts.fixed and any(CHARACTER_SYNTAX.search(p) for p in opts.patterns)
+
+
+def _scan_buffer(buf, regex, invert, nl, lineno):
+    if invert:
+        lines = buf.split(nl)
+        if lines and not lines[-1]:
+            lines.pop()
+        for i, line in enumerate(lines):
+            if not regex.search(line):
+                yield lineno + i, line
+        return
+
+    # Ищем сразу по всему буферу и только для совпадений восстанавливаем
+    # границы строки: на редких совпадениях это в разы быстрее построчного поиска
+    pos = 0
+    counted = 0
+    size = len(buf)
+    while pos < size:
+        m = regex.search(buf, pos)
+        if not m:
+            return
+        start = buf.rfind(nl, 0, m.start()) + 1
+        end = buf.find(nl, start)
+        if end == -1:
+            end = size
+        lineno += buf.count(nl, counted, start)
+        counted = start
+        line = buf[start:end]
+        if m.end() <= end or regex.search(line):
+            yield lineno, line
+        pos = end + 1
+
+
+def scan_file(f, regex, invert, text, first_chunk=b""):
+    lineno = 1
+    tail = b""
+    data = first_chunk or f.read(CHUNK_SIZE)
+    while True:
+        if not data:
+            if not tail:
+                return
+            buf, tail = tail, b""
+        else:
+            buf = tail + data
+            cut = buf.rfind(b"\n") + 1
+            if cut == 0:
+                tail = buf
+                data = f.read(CHUNK_SIZE)
+                continue
+            buf, tail = buf[:cut], buf[cut:]
+
+        if text:
+            buf = buf.decode("utf-8", "surrogateescape")
+            nl = "\n"
+        else:
+            nl = b"\n"
+        yield from _scan_buffer(buf, regex, invert, nl, lineno)
+        lineno += buf.count(nl)
+
+        if not data:
+            return
+        data = f.read(CHUNK_SIZE)
+
+
+def _decode(line):
+    if isinstance(line, bytes):
+        return line.decode("utf-8", "replace").rstrip("\r")
+    return line.encode("utf-8", "surrogateescape").decode("utf-8", "replace").rstrip("\r")
+
+
+class GrepStatus(ExitStatus):
+    # Код возврата как у GNU grep: 0 - было совпадение, 1 - не было,
+    # 2 - ошибка (кроме -q с найденным совпадением)
+    def __init__(self):
+        super().__init__()
+        self.matched = False
+        self.error = False
+        self.quiet = False
+
+    def code(self):
+        if self.error and not (self.quiet and self.matched):
+            return 2
+        return 0 if self.matched else 1
+
+
+def _format_matches(matches, display, opts, show_name, status):
+    prefix = f"{display}:" if show_name else ""
+    count = 0
+    for lineno, line in matches:
+        count += 1
+        status.matched = True
+        if opts.quiet:
+            return
+        if opts.files_with_matches:
+            yield display
+            return
+        if not opts.count:
+            yield f"{prefix}{lineno}:{_decode(line)}" if opts.line_numbers else f"{prefix}{_decode(line)}"
+        if opts.max_count is not None and count >= opts.max_count:
+            break
+    if opts.count and not opts.quiet:
+        yield f"{prefix}{count}"
+
+
+def grep_file(path, display, regex, opts, text, show_name, status):
+    with open(path, "rb") as f:
+        first_chunk = f.read(CHUNK_SIZE)
+        if opts.max_count == 0:
+            return
+        matches = scan_file(f, regex, opts.invert, text, first_chunk)
+        if (not opts.text and b"\0" in first_chunk[:BINARY_SNIFF]
+                and not (opts.count or opts.files_with_matches or opts.quiet)):
+            # Как GNU grep: строки двоичного файла не выводятся, только
+            # сообщение о том, что совпадение есть; -c, -l и -q работают как обычно
+            if next(matches, None) is not None:
+                status.matched = True
+                yield f"Двоичный файл {display} совпадает"
+            return
+        yield from _format_matches(matches, display, opts, show_name, status)
+
+
+def _error(opts, display, e):
+    if opts.no_messages:
+        return None
+    return f"grep: {display}: {reason(e)}"
+
+
+def _collect(path, display, error, regex, opts, text, show_name, status):
+    try:
+        if error is not None:
+            raise error
+        return list(grep_file(path, display, regex, opts, text, show_name, status)), None
+    except OSError as e:
+        status.error = True
+        return [], _error(opts, display, e)
+
+
+def _targets(emu, opts):
+    for filename in opts.files:
+        full_path = os.path.join(emu.current_dir, filename) if not os.path.isabs(filename) else filename
+        if os.path.isdir(full_path):
+            if not opts.recursive:
+                yield full_path, filename, IsADirectoryError(full_path)
+                continue
+            for entry in iter_files(full_path, sort=True, workers=4):
+                yield entry.path, os.path.join(filename, os.path.relpath(entry.path, full_path)), None
+        else:
+            yield full_path, filename, None
+
+
+def grep_stream(emu, args, stdin=None, status=None):
+    # В конвейере приходит общий ExitStatus: код grep переносится в него,
+    # когда стадия дочитана (или закрыта раньше, как под head)
+    state = status if isinstance(status, GrepStatus) else GrepStatus()
+    try:
+        yield from _search(emu, args, stdin, state)
+    finally:
+        if state is not status and status is not None:
+            status.fail(state.code())
+
+
+def _search(emu, args, stdin, status):
+    try:
+        opts = parse_args(args)
+        text = needs_text_mode(opts)
+        regex = compile_pattern(opts, text)
+    except (ValueError, re.error) as e:
+        print(f"grep: {e}")
+        status.error = True
+        return
+    status.quiet = opts.quiet
+
+    if opts.recursive and not opts.files:
+        opts.files = ["."]
+
+    if not opts.files:
+        if stdin is None:
+            print("grep: требуется файл или ввод через конвейер")
+            status.error = True
+            return
+        regex = compile_pattern(opts, True)
+        matches = ((i, line) for i, line in enumerate(stdin, 1) if bool(regex.search(line)) != opts.invert)
+        yield from _format_matches(matches, "(стандартный ввод)", opts, opts.with_filename, status)
+        return
+
+    show_name = (len(opts.files) > 1 or opts.recursive or opts.with_filename) and not opts.no_filename
+    targets = _targets(emu, opts)
+
+    if len(opts.files) == 1 and not opts.recursive:
+        # Один файл читается лениво, чтобы `grep ... | head` не сканировал его целиком
+        for path, display, error in targets:
+            if error is not None:
+                status.error = True
+                message = _error(opts, display, error)
+                if message:
+                    print(message)
+                return
+            try:
+                yield from grep_file(path, display, regex, opts, text, show_name, status)
+            except OSError as e:
+                status.error = True
+                message = _error(opts, display, e)
+                if message:
+                    print(message)
+        return
+
+    # Несколько файлов читаются параллельно, но выводятся строго в порядке аргументов
+    collect = lambda target: _collect(*target, regex, opts, text, show_name, status)
+    for lines, message in ordered_map(collect, targets):
+        if message:
+            print(message)
+        yield from lines
+
+
+def grep(emu, args):
+    status = GrepStatus()
+    emu.out.write_lines(grep_stream(emu, args, status=status))
+    return status.code()
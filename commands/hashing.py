@@ -0,0 +1,209 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from commands.common import default_workers, reason
+from commands.walk import iter_files
+
+ALGORITHMS = {
+    "md5sum": "md5",
+    "sha1sum": "sha1",
+    "sha256sum": "sha256",
+    "b2sum": "blake2b",
+}
+
+READ_BUFFER = 1024 * 1024
+# Файлы крупнее этого порога хэшируются через mmap без копирования в буфер
+MMAP_THRESHOLD = 16 * 1024 * 1024
+CACHE_FILE = ".python_wsl_checksums.db"
+
+
+def hash_file(path, algorithm):
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # hashlib отпускает GIL на время update, поэтому
+                    # потоки пула хэшируют разные файлы параллельно
+                    h.update(mm)
+                return h.hexdigest()
+            except (OSError, ValueError):
+                f.seek(0)
+                h = hashlib.new(algorithm)
+
+        buffer = bytearray(READ_BUFFER)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+class ChecksumCache:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pending = []
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=10)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS checksums ("
+                "dev INTEGER, ino INTEGER, algorithm TEXT, size INTEGER, mtime_ns INTEGER, "
+                "digest TEXT, PRIMARY KEY (dev, ino, algorithm))"
+            )
+        return self._conn
+
+    @staticmethod
+    def key(st):
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def get(self, st, algorithm):
+        dev, ino, size, mtime_ns = self.key(st)
+        row = self._connect().execute(
+            "SELECT digest FROM checksums WHERE dev=? AND ino=? AND algorithm=? AND size=? AND mtime_ns=?",
+            (dev, ino, algorithm, size, mtime_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, st, algorithm, digest):
+        dev, ino, size, mtime_ns = self.key(st)
+        self._pending.append((dev, ino, algorithm, size, mtime_ns, digest))
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            if self._pending:
+                with self._conn:
+                    self._conn.executemany("INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?)", self._pending)
+                self._pending = []
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+def _hash_cached(path, st, algorithm):
+    digest = hash_file(path, algorithm)
+    # Файл могли изменить во время чтения - такой результат не кэшируем
+    if ChecksumCache.key(os.stat(path)) != ChecksumCache.key(st):
+        return digest, None
+    return digest, st
+
+
+def hash_files(paths, algorithm, cache=None, workers=None):
+    results = [None] * len(paths)
+    jobs = []
+
+    for i, path in enumerate(paths):
+        try:
+            st = os.stat(path)
+            if stat.S_ISDIR(st.st_mode):
+                raise IsADirectoryError(path)
+        except OSError as e:
+            results[i] = e
+            continue
+        digest = cache.get(st, algorithm) if cache is not None else None
+        if digest is not None:
+            results[i] = digest
+        else:
+            jobs.append((i, path, st))
+
+    if jobs:
+        if workers is None:
+            workers = default_workers()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+            futures = [(i, pool.submit(_hash_cached, path, st, algorithm)) for i, path, st in jobs]
+            for i, future in futures:
+                try:
+                    digest, st = future.result()
+                except OSError as e:
+                    results[i] = e
+                    continue
+                results[i] = digest
+                if cache is not None and st is not None:
+                    cache.put(st, algorithm, digest)
+
+    return results
+
+
+def _expand(emu, args, recursive):
+    names = []
+    for filename in args:
+        full_path = os.path.join(emu.current_dir, filename) if not os.path.isabs(filename) else filename
+        if recursive and os.path.isdir(full_path):
+            for entry in iter_files(full_path, sort=True):
+                names.append(os.path.join(filename, os.path.relpath(entry.path, full_path)))
+        else:
+            names.append(filename)
+    return names
+
+
+def checksum(emu, args, command):
+    recursive = False
+    use_cache = True
+    workers = None
+    files = []
+
+    for arg in args:
+        if arg in ("-r", "--recursive"):
+            recursive = True
+        elif arg == "--no-cache":
+            use_cache = False
+        elif arg.startswith("--jobs="):
+            try:
+                workers = int(arg.split("=", 1)[1])
+            except ValueError:
+                print(f"{command}: неверное число потоков: '{arg}'")
+                return 1
+        else:
+            files.append(arg)
+
+    if not files:
+        print(f"{command}: требуется файл(ы)")
+        return 1
+
+    files = _expand(emu, files, recursive)
+    paths = [os.path.join(emu.current_dir, f) if not os.path.isabs(f) else f for f in files]
+
+    cache = ChecksumCache(os.path.join(emu.home_dir, CACHE_FILE)) if use_cache else None
+    try:
+        results = hash_files(paths, ALGORITHMS[command], cache=cache, workers=workers)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    # Как coreutils: 1, если хотя бы один файл не удалось прочитать
+    status = 0
+    for filename, result in zip(files, results):
+        if isinstance(result, OSError):
+            status = 1
+        if isinstance(result, OSError):
+            print(f"{command}: {filename}: {reason(result)}")
+        else:
+            print(f"{result}  {filename}")
+    return status
+
+
+def md5sum(emu, args):
+    return checksum(emu, args, "md5sum")
+
+
+def sha1sum(emu, args):
+    return checksum(emu, args, "sha1sum")
+
+
+def sha256sum(emu, args):
+    return checksum(emu, args, "sha256sum")
+
+
+def b2sum(emu, args):
+    return checksum(emu, args, "b2sum")
@@ -0,0 +1,245 @@
+import bisect
+import os
+from collections import deque
+
+# Сколько команд держится в памяти
+HISTORY_SIZE = 1000
+# Сколько последних команд остается в файле после сжатия
+HISTFILE_SIZE = 10000
+# Файл сжимается, когда вырастает больше этого размера
+COMPACT_BYTES = 1024 * 1024
+# Блоками такого размера хвост файла читается с конца
+TAIL_BLOCK = 64 * 1024
+
+
+def _lock(fd):
+    # fcntl есть только в Unix; на Windows запись одним write в режиме
+    # O_APPEND остается без блокировки
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+# История команд. Каждая команда сразу дописывается в файл (O_APPEND под
+# flock), поэтому параллельные сессии не затирают друг друга, а падение
+# не теряет сессию. В памяти - кольцо последних HISTORY_SIZE команд и
+# индекс для поиска по префиксу: текст -> номер последнего вхождения плюс
+# отсортированный список текстов для bisect.
+class History:
+    def __init__(self, path, size=HISTORY_SIZE, file_size=HISTFILE_SIZE):
+        self.path = path
+        self.size = size
+        self.file_size = file_size
+        # Файл читается только когда история действительно нужна
+        self._entries = None
+        self._first = 1
+        self._latest = {}
+        self._sorted = []
+        self._readline = None
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = deque(maxlen=self.size)
+        total = 0
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if line:
+                        entries.append(line)
+                        total += 1
+        except FileNotFoundError:
+            pass
+        self._entries = deque(maxlen=self.size)
+        self._first = total - len(entries) + 1
+        self._latest = {}
+        self._sorted = []
+        for text in entries:
+            self._remember(text)
+
+    def _remember(self, text):
+        entries = self._entries
+        if len(entries) == entries.maxlen:
+            # Самая старая запись уходит из кольца - и из индекса, если это
+            # было последнее вхождение ее текста
+            oldest = entries.popleft()
+            if self._latest.get(oldest) == self._first:
+                del self._latest[oldest]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._first += 1
+        number = self._first + len(entries)
+        entries.append(text)
+        if text not in self._latest:
+            bisect.insort(self._sorted, text)
+        self._latest[text] = number
+
+    def append(self, text):
+        if not text.strip():
+            return
+        self._write(text)
+        if self._entries is not None:
+            self._remember(text)
+        if self._readline is not None:
+            readline = self._readline
+            while readline.get_current_history_length() > self.size:
+                readline.remove_history_item(0)
+
+    def _write(self, text):
+        data = (text + "\n").encode("utf-8", "surrogateescape")
+        while True:
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            except OSError:
+                return
+            try:
+                _lock(fd)
+                # Пока ждали блокировку, другая сессия могла сжать файл и
+                # подменить его: тогда пишем уже в новый
+                try:
+                    same = os.fstat(fd).st_ino == os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    same = False
+                if not same:
+                    continue
+                os.write(fd, data)
+                if os.fstat(fd).st_size > COMPACT_BYTES:
+                    self._compact()
+                return
+            except OSError:
+                return
+            finally:
+                os.close(fd)
+
+    def _compact(self):
+        # Вызывается под блокировкой: оставить последние file_size строк, но
+        # не больше половины порога (иначе сжатие шло бы на каждой команде),
+        # и атомарно заменить файл
+        with open(self.path, "r", encoding="utf-8", errors="surrogateescape") as f:
+            tail = deque(f, maxlen=self.file_size)
+        size = sum(len(line) for line in tail)
+        while tail and size > COMPACT_BYTES // 2:
+            size -= len(tail.popleft())
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8", errors="surrogateescape") as f:
+            f.writelines(tail)
+        os.replace(temp_path, self.path)
+
+    def entries(self, last=None):
+        # Пары (номер, команда), от старых к новым
+        self._load()
+        start = 0 if last is None else max(0, len(self._entries) - last)
+        for i in range(start, len(self._entries)):
+            yield self._first + i, self._entries[i]
+
+    def get(self, number):
+        self._load()
+        if number < 0:
+            number = self._first + len(self._entries) + number
+        index = number - self._first
+        if 0 <= index < len(self._entries):
+            return self._entries[index]
+        return None
+
+    def find_prefix(self, prefix):
+        # Последняя команда, начинающаяся с prefix (для !prefix)
+        self._load()
+        best = None
+        i = bisect.bisect_left(self._sorted, prefix)
+        while i < len(self._sorted) and self._sorted[i].startswith(prefix):
+            number = self._latest[self._sorted[i]]
+            if best is None or number > best:
+                best = number
+            i += 1
+        return None if best is None else self.get(best)
+
+    def expand(self, cmd):
+        # Подстановка в стиле bash: !!, !N, !-N, !prefix в начале команды.
+        # Возвращает развернутую команду или бросает ValueError
+        if not cmd.startswith("!") or cmd == "!":
+            return cmd
+        event, _, rest = cmd[1:].partition(" ")
+        if event == "!":
+            found = self.get(-1)
+        elif event.lstrip("-").isdigit():
+            found = self.get(int(event))
+        else:
+            found = self.find_prefix(event)
+        if found is None:
+            raise ValueError(f"!{event}: событие не найдено")
+        return f"{found} {rest}" if rest else found
+
+    def clear(self):
+        # Как history -c: только память сессии, файл не трогается
+        self._load()
+        self._first += len(self._entries)
+        self._entries.clear()
+        self._latest.clear()
+        self._sorted.clear()
+        if self._readline is not None:
+            self._readline.clear_history()
+
+    def _read_tail(self):
+        # Последние size команд без чтения всего файла: блоки читаются с
+        # конца, пока в них не наберется больше size переводов строки
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            pos = f.seek(0, os.SEEK_END)
+            blocks = deque()
+            newlines = 0
+            while pos > 0 and newlines <= self.size:
+                step = min(TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                block = f.read(step)
+                newlines += block.count(b"\n")
+                blocks.appendleft(block)
+        lines = b"".join(blocks).split(b"\n")
+        if pos > 0:
+            # Первая строка прочитана не с начала
+            lines = lines[1:]
+        texts = [line.decode("utf-8", "surrogateescape") for line in lines if line]
+        return texts[-self.size:]
+
+    def attach_readline(self):
+        # Стрелки и Ctrl-R: readline получает то же кольцо команд, а дальше
+        # input() сам добавляет в него введенные строки. Вызывается до первого
+        # приглашения, поэтому весь файл (до COMPACT_BYTES) не читается:
+        # readline нужен только хвост, нумерация остается за _load
+        try:
+            import readline
+        except ImportError:
+            return
+        entries = self._entries if self._entries is not None else self._read_tail()
+        readline.clear_history()
+        for text in entries:
+            readline.add_history(text)
+        self._readline = readline
+
+    def __len__(self):
+        self._load()
+        return len(self._entries)
+
+
+def history_stream(emu, args, stdin=None, status=None):
+    last = None
+    for arg in args:
+        if arg == "-c":
+            emu.history.clear()
+            return
+        if not arg.isdigit():
+            print(f"history: {arg}: требуется числовой аргумент")
+            return
+        last = int(arg)
+    for number, text in emu.history.entries(last):
+        yield f"{number:>5}  {text}"
+
+
+def history(emu, args):
+    emu.out.write_lines(history_stream(emu, args))
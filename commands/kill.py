@@ -0,0 +1,442 @@
+import os
+import re
+import signal
+import time
+
+
+def _signals():
+    return sorted(signal.Signals, key=lambda sig: sig.value)
+
+
+def parse_signal(spec):
+    # 9, KILL, SIGKILL, kill - все одно и то же
+    if spec.isdigit():
+        number = int(spec)
+        if number == 0 or number in {sig.value for sig in signal.Signals}:
+            return number
+    else:
+        name = spec.upper()
+        name = name if name.startswith("SIG") else "SIG" + name
+        sig = getattr(signal.Signals, name, None)
+        if isinstance(sig, signal.Signals):
+            return sig.value
+    raise ValueError(f"{spec}: неверная спецификация сигнала")
+
+
+def signal_name(number):
+    try:
+        return signal.Signals(number).name[3:]
+    except ValueError:
+        return str(number)
+
+
+def _is_signal(spec):
+    # Первый ключ pkill/killall может быть сигналом: -9, -HUP, -SIGTERM.
+    # Строчные буквы - обычные ключи (-f, -x, ...), не сигналы
+    if not spec or not (spec.isdigit() or spec.isupper()):
+        return False
+    try:
+        parse_signal(spec)
+    except ValueError:
+        return False
+    return True
+
+
+def list_signals(args):
+    if not args:
+        print(" ".join(signal_name(sig.value) for sig in _signals()))
+        return 0
+    status = 0
+    for arg in args:
+        # kill -l 9 -> KILL, kill -l KILL -> 9; 128+N - код возврата
+        # команды, убитой сигналом N
+        number = int(arg) if arg.isdigit() else None
+        if number is not None and number > 128:
+            number -= 128
+        try:
+            number = parse_signal(str(number) if number is not None else arg)
+        except ValueError as e:
+            print(f"kill: {e}")
+            status = 1
+            continue
+        print(signal_name(number) if arg.isdigit() else number)
+    return status
+
+
+def kill(emu, args):
+    if not args:
+        print("kill: использование: kill [-s сигнал | -сигнал] PID... или kill -l [сигнал]")
+        return 2
+    first = args[0]
+    if first in ("-l", "-L", "--list"):
+        return list_signals(args[1:])
+    sig = signal.SIGTERM
+    i = 0
+    try:
+        if first in ("-s", "-n"):
+            if len(args) < 2:
+                print(f"kill: {first}: требуется аргумент")
+                return 2
+            sig = parse_signal(args[1])
+            i = 2
+        elif first.startswith("-") and len(first) > 1 and first != "--":
+            # kill -9 PID, kill -KILL PID, kill -SIGKILL PID
+            sig = parse_signal(first[1:])
+            i = 1
+    except ValueError as e:
+        print(f"kill: {e}")
+        return 1
+    if i < len(args) and args[i] == "--":
+        i += 1
+
+    targets = args[i:]
+    if not targets:
+        print("kill: не указан PID")
+        return 2
+    status = 0
+    for target in targets:
+        # Отрицательный PID - группа процессов, как у kill(2)
+        if not target.lstrip("-").isdigit():
+            print(f"kill: {target}: аргументы должны быть PID процессов или заданий")
+            status = 1
+            continue
+        pid = int(target)
+        if pid == os.getpid():
+            print("kill: невозможно убить процесс эмулятора")
+            status = 1
+            continue
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            print(f"kill: ({pid}) - Нет такого процесса")
+            status = 1
+        except PermissionError:
+            print(f"kill: ({pid}) - Операция не разрешена")
+            status = 1
+        except OSError as e:
+            print(f"kill: ({pid}) - {e.strerror or e}")
+            status = 1
+    return status
+
+
+class MatchOptions:
+    def __init__(self):
+        self.patterns = []
+        self.full = False
+        self.exact = False
+        self.ignore_case = False
+        self.invert = False
+        self.users = set()
+        self.parents = set()
+        self.newest = False
+        self.oldest = False
+        self.signal = signal.SIGTERM
+        self.list_name = False
+        self.list_full = False
+        self.count = False
+        self.delimiter = "\n"
+        self.echo = False
+        self.quiet = False
+        self.wait = False
+        self.timeout = None
+
+
+FLAGS = {
+    "f": "full", "x": "exact", "i": "ignore_case", "I": "ignore_case", "v": "invert",
+    "n": "newest", "o": "oldest", "l": "list_name", "a": "list_full",
+    "c": "count", "e": "echo", "q": "quiet", "w": "wait",
+}
+
+
+def parse_args(command, args):
+    opts = MatchOptions()
+    killall = command == "killall"
+    # killall сравнивает имя целиком и буквально, если не задан -r
+    literal = killall
+    allowed = {
+        "pgrep": "fxivnolacduP",
+        "pkill": "fxivnoecwuPs",
+        "killall": "Ivqwrus",
+    }[command]
+
+    def value(flag, rest, i):
+        if rest:
+            return rest, i
+        if i + 1 >= len(args):
+            raise ValueError(f"ключ требует аргумент -- '{flag}'")
+        return args[i + 1], i + 1
+
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if command != "pgrep" and i == 0 and arg.startswith("-") and _is_signal(arg[1:]):
+            opts.signal = parse_signal(arg[1:])
+        elif arg.startswith("--"):
+            name, _, rest = arg[2:].partition("=")
+            if name in ("signal", "timeout", "euid", "parent", "delimiter") and not rest:
+                if i + 1 >= len(args):
+                    raise ValueError(f"ключ требует аргумент -- '{name}'")
+                i += 1
+                rest = args[i]
+            if name == "signal" and command != "pgrep":
+                opts.signal = parse_signal(rest)
+            elif name == "timeout" and command != "pgrep":
+                try:
+                    opts.timeout = float(rest)
+                except ValueError:
+                    raise ValueError(f"неверный тайм-аут: '{rest}'")
+            elif name == "euid":
+                opts.users.update(item for item in rest.split(",") if item)
+            elif name == "parent":
+                _parents(opts, rest)
+            elif name == "delimiter" and command == "pgrep":
+                opts.delimiter = rest
+            elif name == "full":
+                opts.full = True
+            elif name == "exact":
+                opts.exact = True
+            elif name == "ignore-case":
+                opts.ignore_case = True
+            elif name == "newest":
+                opts.newest = True
+            elif name == "oldest":
+                opts.oldest = True
+            elif name == "count":
+                opts.count = True
+            elif name == "echo" and command == "pkill":
+                opts.echo = True
+            elif name == "wait" and command != "pgrep":
+                opts.wait = True
+            else:
+                raise ValueError(f"нераспознанный ключ '{arg}'")
+        elif arg.startswith("-") and len(arg) > 1:
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                if flag not in allowed:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                if flag in "uPds":
+                    text, i = value(flag, arg[j + 1:], i)
+                    if flag == "u":
+                        opts.users.update(item for item in text.split(",") if item)
+                    elif flag == "P":
+                        _parents(opts, text)
+                    elif flag == "d":
+                        opts.delimiter = text
+                    else:
+                        opts.signal = parse_signal(text)
+                    break
+                if flag == "r":
+                    literal = False
+                elif flag == "v" and killall:
+                    opts.echo = True
+                else:
+                    setattr(opts, FLAGS[flag], True)
+                j += 1
+        else:
+            opts.patterns.append(arg)
+        i += 1
+
+    if literal:
+        opts.patterns = [re.escape(pattern) for pattern in opts.patterns]
+        opts.exact = True
+    if opts.newest and opts.oldest:
+        raise ValueError("-n и -o нельзя использовать вместе")
+    if not opts.patterns and not opts.users and not opts.parents:
+        raise ValueError("не задан ни шаблон, ни условие выбора")
+    if len(opts.patterns) > 1 and command != "killall":
+        raise ValueError("допускается только один шаблон")
+    return opts
+
+
+def _parents(opts, text):
+    for item in text.split(","):
+        if not item.isdigit():
+            raise ValueError(f"неверный PID родителя: '{item}'")
+        opts.parents.add(int(item))
+
+
+class Matcher:
+    def __init__(self, opts):
+        self.opts = opts
+        flags = re.IGNORECASE if opts.ignore_case else 0
+        try:
+            self.regexes = [re.compile(pattern, flags) for pattern in opts.patterns]
+        except re.error as e:
+            raise ValueError(f"неверное регулярное выражение: {e}")
+        self.uids = {int(u) for u in opts.users if u.isdigit()}
+        self.names = {u for u in opts.users if not u.isdigit()}
+
+    def attrs(self):
+        opts = self.opts
+        attrs = {"pid", "name"}
+        if opts.full or opts.list_full:
+            attrs.add("cmdline")
+        if opts.users:
+            attrs.update(("username", "uids"))
+        if opts.parents:
+            attrs.add("ppid")
+        if opts.newest or opts.oldest:
+            attrs.add("create_time")
+        return attrs
+
+    def text(self, info):
+        if self.opts.full:
+            cmdline = info.get("cmdline")
+            if cmdline:
+                return " ".join(cmdline)
+        return info.get("name") or ""
+
+    def __call__(self, info):
+        opts = self.opts
+        if opts.users:
+            name = (info.get("username") or "").rsplit("\\", 1)[-1]
+            uids = info.get("uids")
+            if name not in self.names and not (uids is not None and uids.effective in self.uids):
+                return False
+        if opts.parents and info.get("ppid") not in opts.parents:
+            return False
+        if self.regexes:
+            text = self.text(info)
+            if opts.exact:
+                hit = any(regex.fullmatch(text) for regex in self.regexes)
+            else:
+                hit = any(regex.search(text) for regex in self.regexes)
+            if hit == opts.invert:
+                return False
+        return True
+
+
+def find(opts):
+    # Один проход по таблице процессов: process_iter читает только нужные
+    # атрибуты, и каждый процесс - в одном oneshot()
+    import psutil
+    matcher = Matcher(opts)
+    attrs = [attr for attr in matcher.attrs() if hasattr(psutil.Process, attr)]
+    me = os.getpid()
+    found = []
+    for proc in psutil.process_iter(attrs=attrs, ad_value=None):
+        info = proc.info
+        if info["pid"] != me and matcher(info):
+            found.append((proc, info))
+    if opts.newest or opts.oldest:
+        if not found:
+            return found
+        pick = max if opts.newest else min
+        return [pick(found, key=lambda item: item[1].get("create_time") or 0.0)]
+    return found
+
+
+def terminate(procs, sig, wait=False, timeout=None):
+    # Сигнал всем сразу, затем одно ожидание на всю пачку через wait_procs.
+    # С тайм-аутом выжившие получают SIGKILL - как "kill, подождать, kill -9"
+    # для сотен воркеров без цикла по каждому
+    import psutil
+    sent, failed = [], []
+    for proc in procs:
+        try:
+            proc.send_signal(sig)
+            sent.append(proc)
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.AccessDenied:
+            failed.append(proc)
+    survivors = []
+    if timeout is not None:
+        _, alive = psutil.wait_procs(sent, timeout=timeout)
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+            except psutil.AccessDenied:
+                failed.append(proc)
+        _, survivors = psutil.wait_procs(alive, timeout=timeout)
+    elif wait:
+        psutil.wait_procs(sent)
+    return sent, failed, survivors
+
+
+def _usage(command):
+    if command == "pgrep":
+        return "pgrep [-flacvxinod] [-u пользователь] [-P PPID] шаблон"
+    if command == "pkill":
+        return "pkill [-сигнал] [-fvxinoecw] [-s сигнал] [-u пользователь] [-P PPID] [--timeout=сек] шаблон"
+    return "killall [-сигнал] [-Ivqwr] [-s сигнал] [-u пользователь] [--timeout=сек] имя..."
+
+
+def _matching(command, args):
+    # -> (opts, найденные процессы) или код возврата при ошибке
+    try:
+        opts = parse_args(command, args)
+    except ValueError as e:
+        print(f"{command}: {e}")
+        print(f"использование: {_usage(command)}")
+        return None, 2
+    try:
+        import psutil  # noqa: F401
+    except ImportError:
+        print(f"{command}: требуется модуль psutil")
+        return None, 3
+    try:
+        return opts, find(opts)
+    except ValueError as e:
+        print(f"{command}: {e}")
+        return None, 2
+
+
+def pgrep(emu, args):
+    opts, found = _matching("pgrep", args)
+    if opts is None:
+        return found
+    if opts.count:
+        print(len(found))
+    else:
+        lines = []
+        for _, info in found:
+            if opts.list_full:
+                cmdline = info.get("cmdline")
+                lines.append(f"{info['pid']} {' '.join(cmdline) if cmdline else info.get('name')}")
+            elif opts.list_name:
+                lines.append(f"{info['pid']} {info.get('name')}")
+            else:
+                lines.append(str(info["pid"]))
+        if lines:
+            if opts.delimiter == "\n":
+                emu.out.write_lines(lines)
+            else:
+                print(opts.delimiter.join(lines))
+    return 0 if found else 1
+
+
+def pkill(emu, args, command="pkill"):
+    opts, found = _matching(command, args)
+    if opts is None:
+        return found
+    if not found:
+        if command == "killall" and not opts.quiet:
+            for pattern in opts.patterns:
+                print(f"{pattern}: процесс не найден")
+        return 1
+    started = time.monotonic()
+    sent, failed, survivors = terminate([proc for proc, _ in found], opts.signal, opts.wait, opts.timeout)
+    names = {proc.pid: info.get("name") for proc, info in found}
+    if opts.echo:
+        for proc in sent:
+            if command == "killall":
+                print(f"Убит {names[proc.pid]}({proc.pid}) сигналом {signal_name(opts.signal)}")
+            else:
+                print(f"{names[proc.pid]} killed (pid {proc.pid})")
+    if not opts.quiet:
+        for proc in failed:
+            print(f"{command}: не удалось послать сигнал {proc.pid}: Операция не разрешена")
+        for proc in survivors:
+            print(f"{command}: процесс {proc.pid} ({names[proc.pid]}) не завершился за "
+                  f"{time.monotonic() - started:.1f} с даже после SIGKILL")
+    if opts.count:
+        print(len(sent))
+    return 0 if sent and not survivors else 1
+
+
+def killall(emu, args):
+    return pkill(emu, args, command="killall")
@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+
+# Границы корзин гистограммы задержек, секунды (как у клиентов Prometheus)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Сколько строк pstats выводится после команды в режиме --profile
+PROFILE_LINES = 15
+
+
+def _proc_io():
+    # Счетчики ввода-вывода процесса: rchar/wchar - все read()/write(),
+    # read_bytes/write_bytes - то, что дошло до диска. Завершенные дочерние
+    # процессы ядро добавляет к родителю при wait()
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(":") for line in f)}
+    except (OSError, ValueError):
+        return None
+
+
+def _reset_peak_rss():
+    # Linux 4.0+: запись "5" в clear_refs сбрасывает VmHWM, и после команды
+    # виден ее собственный пик, а не пик всего сеанса
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb(children=False):
+    try:
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # macOS отдает байты, Linux - килобайты
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _vm_hwm_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return _peak_rss_kb()
+
+
+class Usage:
+    # Ресурсы, потраченные между start() и stop(): время, CPU процесса и
+    # дочерних процессов, пиковая память и ввод-вывод
+    def start(self):
+        self._reset = _reset_peak_rss()
+        self._io = _proc_io()
+        self._times = os.times()
+        self._wall = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.real = time.perf_counter() - self._wall
+        end = os.times()
+        begin = self._times
+        self.user = (end.user - begin.user) + (end.children_user - begin.children_user)
+        self.sys = (end.system - begin.system) + (end.children_system - begin.children_system)
+        self.children = end.children_user + end.children_system > begin.children_user + begin.children_system
+        # ru_maxrss дочерних процессов - максимум за все время, поэтому он
+        # учитывается только если внешние команды действительно запускались
+        own = _vm_hwm_kb() if self._reset else None
+        child = _peak_rss_kb(children=True) if self.children else None
+        self.max_rss_kb = max(filter(None, (own, child)), default=None)
+        io = _proc_io()
+        if io is not None and self._io is not None:
+            self.read_bytes = io.get("rchar", 0) - self._io.get("rchar", 0)
+            self.write_bytes = io.get("wchar", 0) - self._io.get("wchar", 0)
+            self.disk_read_bytes = io.get("read_bytes", 0) - self._io.get("read_bytes", 0)
+            self.disk_write_bytes = io.get("write_bytes", 0) - self._io.get("write_bytes", 0)
+        else:
+            self.read_bytes = self.write_bytes = None
+        return self
+
+
+def _clock(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}m{seconds:.3f}s"
+
+
+def format_usage(usage):
+    lines = [
+        "",
+        f"real\t{_clock(usage.real)}",
+        f"user\t{_clock(usage.user)}",
+        f"sys\t{_clock(usage.sys)}",
+    ]
+    if usage.max_rss_kb is not None:
+        lines.append(f"maxrss\t{usage.max_rss_kb} КБ")
+    if usage.read_bytes is not None:
+        lines.append(f"read\t{usage.read_bytes} байт (с диска {usage.disk_read_bytes})")
+        lines.append(f"write\t{usage.write_bytes} байт (на диск {usage.disk_write_bytes})")
+    return lines
+
+
+def time_pipeline(emu, pipeline):
+    # time - как ключевое слово bash: измеряет весь конвейер после себя
+    from commands.shell import Pipeline, join
+    stages = [pipeline.stages[0][1:]] + pipeline.stages[1:]
+    usage = Usage().start()
+    status = 0
+    if stages[0]:
+        text = pipeline.text.split(None, 1)[1] if pipeline.text.startswith("time ") else " | ".join(join(words) for words in stages)
+        status = emu._execute(Pipeline(text, stages, pipeline.operator))
+    usage.stop()
+    # Собственный вывод команды должен уйти раньше отчета
+    emu.out.flush()
+    print("\n".join(format_usage(usage)), file=sys.stderr)
+    return status
+
+
+def time_command(emu, args):
+    from commands.shell import Pipeline, join
+    return time_pipeline(emu, Pipeline(join(["time"] + args), [["time"] + args]))
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Счетчики и гистограммы задержек по командам. Пишется в текстовом формате
+# Prometheus: файл можно отдать node_exporter (textfile collector) или
+# просто сравнить между прогонами
+class Metrics:
+    PREFIX = "swiftwsl"
+
+    def __init__(self, path=None):
+        self.path = path
+        self.calls = {}
+        self.failures = {}
+        self.cpu = {}
+        self.latency = {}
+
+    def record(self, command, seconds, cpu_seconds, status):
+        self.calls[command] = self.calls.get(command, 0) + 1
+        if status:
+            self.failures[command] = self.failures.get(command, 0) + 1
+        self.cpu[command] = round(self.cpu.get(command, 0.0) + cpu_seconds, 6)
+        histogram = self.latency.get(command)
+        if histogram is None:
+            histogram = self.latency[command] = Histogram()
+        histogram.observe(seconds)
+
+    def lines(self):
+        prefix = self.PREFIX
+        for name, kind, help_text, values in (
+            ("commands_total", "counter", "Число выполненных команд", self.calls),
+            ("command_failures_total", "counter", "Команды с ненулевым кодом возврата", self.failures),
+            ("command_cpu_seconds_total", "counter", "Процессорное время команд, с", self.cpu),
+        ):
+            yield f"# HELP {prefix}_{name} {help_text}"
+            yield f"# TYPE {prefix}_{name} {kind}"
+            for command in sorted(values):
+                yield f'{prefix}_{name}{{command="{_label(command)}"}} {_number(values[command])}'
+
+        name = f"{prefix}_command_duration_seconds"
+        yield f"# HELP {name} Время выполнения команд, с"
+        yield f"# TYPE {name} histogram"
+        for command in sorted(self.latency):
+            histogram = self.latency[command]
+            label = _label(command)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                yield f'{name}_bucket{{command="{label}",le="{bound}"}} {cumulative}'
+            yield f'{name}_bucket{{command="{label}",le="+Inf"}} {histogram.count}'
+            yield f'{name}_sum{{command="{label}"}} {_number(histogram.sum)}'
+            yield f'{name}_count{{command="{label}"}} {histogram.count}'
+
+    def write(self, path=None):
+        # Атомарная замена: сборщик никогда не видит наполовину записанный файл
+        path = path or self.path
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for line in self.lines():
+                f.write(line + "\n")
+        os.replace(temp_path, path)
+
+
+class Profiler:
+    # cProfile вокруг каждой команды: статистика сохраняется в DIR/N-имя.prof
+    # (смотреть через python -m pstats или snakeviz), сводка - в stderr
+    def __init__(self, directory):
+        self.directory = directory
+        self.sequence = 0
+
+    def run(self, command, func, *args):
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            # Вывод команды (он еще в буфере эмулятора) - раньше сводки
+            sys.stdout.flush()
+            self.sequence += 1
+            safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in command)
+            path = os.path.join(self.directory, f"{self.sequence:04d}-{safe}.prof")
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                profile.dump_stats(path)
+            except OSError as e:
+                print(f"profile: {path}: {e.strerror}", file=sys.stderr)
+            else:
+                stats = pstats.Stats(profile, stream=sys.stderr)
+                print(f"profile: {path}", file=sys.stderr)
+                stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+
+
+def instrumented(emu, pipeline):
+    # Выполнение команды под включенными --metrics и/или --profile
+    command = pipeline.stages[0][0]
+    begin = os.times()
+    start = time.perf_counter()
+    status = 1
+    try:
+        if emu.profiler is not None:
+            status = emu.profiler.run(command, emu._execute, pipeline)
+        else:
+            status = emu._execute(pipeline)
+        return status
+    finally:
+        if emu.metrics is not None:
+            end = os.times()
+            cpu = sum(end[:4]) - sum(begin[:4])
+            emu.metrics.record(command, time.perf_counter() - start, cpu, status)
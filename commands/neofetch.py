@@ -0,0 +1,54 @@
+import os
+import platform
+import sys
+
+import psutil
+
+
+def neofetch(emu, args):
+    try:
+
+        neofetch_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "neofetch.txt")
+
+        if os.path.exists(neofetch_file):
+
+            with open(neofetch_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+
+                content = content.replace("{host}", platform.node())
+                content = content.replace("{kernel}", platform.release())
+                content = content.replace("{shell_version}", f"{sys.version_info.major}.{sys.version_info.minor}")
+                content = content.replace("{cpu}", platform.processor())
+                content = content.replace("{memory}", str(psutil.virtual_memory().total // (1024**3)))
+
+                from pystyle import Colorate, Colors
+                print(Colorate.Horizontal(Colors.red_to_white, content))
+        else:
+
+            _default_neofetch(emu)
+    except Exception as e:
+        print(f"neofetch error: {str(e)}")
+        _default_neofetch(emu)
+
+
+def _default_neofetch(emu):
+
+    from pyfiglet import Figlet
+    from pystyle import Colors, Colorate
+
+    f = Figlet(font='slant')
+    ascii_art = f.renderText('Python WSL')
+
+    info = f"""
+{Colorate.Horizontal(Colors.red_to_white, ascii_art)}
+{Colorate.Horizontal(Colors.red_to_white, "══════════════════════════════════════════════════")}
+
+{Colorate.Horizontal(Colors.red_to_white, f"OS: Python WSL Emulator")}
+{Colorate.Horizontal(Colors.red_to_white, f"Host: {platform.node()}")}
+{Colorate.Horizontal(Colors.red_to_white, f"Kernel: {platform.release()}")}
+{Colorate.Horizontal(Colors.red_to_white, f"Shell: Python WSL {sys.version_info.major}.{sys.version_info.minor}")}
+{Colorate.Horizontal(Colors.red_to_white, f"CPU: {platform.processor()}")}
+{Colorate.Horizontal(Colors.red_to_white, f"Memory: {psutil.virtual_memory().total // (1024**3)}GB")}
+"""
+    print(info)
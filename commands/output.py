@@ -0,0 +1,187 @@
+import sys
+
+# Порог, после которого накопленный вывод сбрасывается в поток
+BUFFER_SIZE = 64 * 1024
+# Сколько строк склеивается в одну запись при выводе потока строк
+LINES_PER_WRITE = 4096
+
+
+# Центральный буфер вывода эмулятора. На время команды он подменяет
+# sys.stdout, поэтому print() в любой команде пишет в память, а в настоящий
+# поток данные уходят крупными кусками: при переполнении буфера, по концу
+# строки, если вывод идет в терминал, и перед приглашением.
+class OutputSink:
+    def __init__(self, target=None, threshold=BUFFER_SIZE):
+        # target=None - писать в тот sys.stdout, что был до активации
+        self.target = target
+        self.threshold = threshold
+        self._parts = []
+        self._size = 0
+        self._outer = None
+        self._depth = 0
+        self._redirects = []
+        self._tty = None
+        # Строки write_lines, еще не склеенные в одну запись
+        self._batch = None
+
+    @property
+    def stream(self):
+        if self._redirects:
+            return self._redirects[-1]
+        if self.target is not None:
+            return self.target
+        if self._outer is not None:
+            return self._outer
+        return sys.stdout if sys.stdout is not self else sys.__stdout__
+
+    def _switched(self):
+        self._tty = None
+
+    def isatty(self):
+        if self._tty is None:
+            try:
+                self._tty = self.stream.isatty()
+            except (AttributeError, ValueError):
+                self._tty = False
+        return self._tty
+
+    def write(self, text):
+        # Накопленные строки write_lines идут раньше: print() с ошибкой из
+        # того же генератора не должен обогнать вывод, полученный до него
+        if self._batch:
+            self._take_batch()
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.threshold or ("\n" in text and self.isatty()):
+            self.flush()
+        return len(text)
+
+    def write_lines(self, lines):
+        # Строки без '\n'; в терминал каждая строка уходит сразу (вывод
+        # может быть бесконечным, как у tail -f), иначе пачками
+        if self.isatty():
+            for line in lines:
+                self.write(line + "\n")
+            return
+        if self._batch:
+            self._take_batch()
+        outer = self._batch
+        batch = self._batch = []
+        try:
+            for line in lines:
+                batch.append(line)
+                if len(batch) >= LINES_PER_WRITE:
+                    self._take_batch()
+                    if self._size >= self.threshold:
+                        self.flush()
+        finally:
+            self._take_batch()
+            self._batch = outer
+
+    def _take_batch(self):
+        # Пачка строк переходит в общий буфер одной склейкой; список тот же,
+        # write_lines продолжает наполнять его
+        batch = self._batch
+        if batch:
+            batch.append("")
+            text = "\n".join(batch)
+            batch.clear()
+            self._parts.append(text)
+            self._size += len(text)
+
+    def flush(self):
+        if self._batch:
+            self._take_batch()
+        stream = self.stream
+        if self._parts:
+            data = "".join(self._parts)
+            self._parts.clear()
+            self._size = 0
+            try:
+                stream.write(data)
+            except UnicodeEncodeError:
+                # Недекодируемые байты, сохраненные через surrogateescape
+                # (sort), выводятся исходными байтами, а не ошибкой
+                buffer = getattr(stream, "buffer", None)
+                if buffer is None:
+                    raise
+                stream.flush()
+                buffer.write(data.encode(getattr(stream, "encoding", None) or "utf-8", "surrogateescape"))
+        stream.flush()
+
+    # Совместимость с файловым объектом для кода, который ждет sys.stdout
+    @property
+    def buffer(self):
+        self.flush()
+        return self.stream.buffer
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, "encoding", "utf-8")
+
+    @property
+    def errors(self):
+        return getattr(self.stream, "errors", "strict")
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def writable(self):
+        return True
+
+    def active(self):
+        return _Active(self)
+
+    def redirect(self, target):
+        # Временно направить вывод в файл, канал или объект в памяти
+        return _Redirect(self, target)
+
+    def capture(self):
+        import io
+        return self.redirect(io.StringIO())
+
+
+class _Active:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        sink = self.sink
+        if sink._depth == 0:
+            sink._outer = sys.stdout
+            sink._switched()
+            sys.stdout = sink
+        sink._depth += 1
+        return sink
+
+    def __exit__(self, *exc):
+        sink = self.sink
+        sink._depth -= 1
+        if sink._depth == 0:
+            try:
+                sink.flush()
+            finally:
+                sys.stdout = sink._outer
+                sink._outer = None
+                sink._switched()
+        return False
+
+
+class _Redirect:
+    def __init__(self, sink, target):
+        self.sink = sink
+        self.target = target
+
+    def __enter__(self):
+        self.sink.flush()
+        self.sink._redirects.append(self.target)
+        self.sink._switched()
+        return self.target
+
+    def __exit__(self, *exc):
+        try:
+            self.sink.flush()
+        finally:
+            self.sink._redirects.pop()
+            self.sink._switched()
+        return False
@@ -0,0 +1,499 @@
+import os
+import sys
+import time
+
+STATUS_CODES = {
+    "running": "R", "sleeping": "S", "disk-sleep": "D", "stopped": "T",
+    "tracing-stop": "t", "zombie": "Z", "dead": "X", "wake-kill": "K",
+    "waking": "W", "parked": "P", "idle": "I", "locked": "L", "waiting": "W",
+}
+
+
+def _clock(seconds):
+    # [ДД-]ЧЧ:ММ:СС, как колонка TIME у ps
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    text = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{days}-{text}" if days else text
+
+
+def _start(created, now):
+    if created is None:
+        return "?"
+    local = time.localtime(created)
+    if now - created < 86400:
+        return time.strftime("%H:%M", local)
+    if local.tm_year == time.localtime(now).tm_year:
+        return time.strftime("%b%d", local)
+    return time.strftime("%Y", local)
+
+
+def _cpu_seconds(info):
+    times = info.get("cpu_times")
+    return times.user + times.system if times is not None else 0.0
+
+
+def _lifetime_cpu(info, now):
+    # %CPU у ps - среднее за всю жизнь процесса, поэтому замер не нужен
+    created = info.get("create_time")
+    if not created or now <= created:
+        return 0.0
+    return 100.0 * _cpu_seconds(info) / (now - created)
+
+
+def _tty(info):
+    terminal = info.get("terminal")
+    return terminal[5:] if terminal and terminal.startswith("/dev/") else terminal or "?"
+
+
+def _user(info):
+    name = info.get("username")
+    # Windows: DOMAIN\\user
+    return name.rsplit("\\", 1)[-1] if name else "?"
+
+
+def _args(info):
+    cmdline = info.get("cmdline")
+    if cmdline:
+        text = " ".join(cmdline)
+        # Как procps: управляющие символы (переводы строк в аргументах)
+        # заменяются на '?', чтобы один процесс оставался одной строкой
+        return text if text.isprintable() else "".join(c if c.isprintable() else "?" for c in text)
+    return f"[{info.get('name') or '?'}]"
+
+
+def _memory(info, field):
+    memory = info.get("memory_info")
+    return getattr(memory, field) // 1024 if memory is not None else 0
+
+
+class Column:
+    def __init__(self, header, attrs, value, text=str, left=False):
+        # value(info, now) - сырое значение (по нему же идет --sort),
+        # text - его вид в таблице
+        self.header = header
+        self.attrs = attrs
+        self.value = value
+        self.text = text
+        self.left = left
+
+
+COLUMNS = {
+    "pid": Column("PID", ("pid",), lambda p, now: p["pid"]),
+    "ppid": Column("PPID", ("ppid",), lambda p, now: p.get("ppid") or 0),
+    "user": Column("USER", ("username",), lambda p, now: _user(p), left=True),
+    "uid": Column("UID", ("uids",), lambda p, now: p["uids"].effective if p.get("uids") else -1),
+    "%cpu": Column("%CPU", ("cpu_times", "create_time"), _lifetime_cpu, lambda v: f"{v:.1f}"),
+    "c": Column("C", ("cpu_times", "create_time"), _lifetime_cpu, lambda v: str(int(v))),
+    "%mem": Column("%MEM", ("memory_percent",), lambda p, now: p.get("memory_percent") or 0.0, lambda v: f"{v:.1f}"),
+    "vsz": Column("VSZ", ("memory_info",), lambda p, now: _memory(p, "vms")),
+    "rss": Column("RSS", ("memory_info",), lambda p, now: _memory(p, "rss")),
+    "tty": Column("TTY", ("terminal",), lambda p, now: _tty(p), left=True),
+    "stat": Column("STAT", ("status",), lambda p, now: STATUS_CODES.get(p.get("status"), "?"), left=True),
+    "start": Column("START", ("create_time",), lambda p, now: p.get("create_time") or 0.0,
+                    lambda v: _start(v or None, time.time()), left=True),
+    "time": Column("TIME", ("cpu_times",), lambda p, now: _cpu_seconds(p), _clock),
+    "etime": Column("ELAPSED", ("create_time",), lambda p, now: now - (p.get("create_time") or now), _clock),
+    "nlwp": Column("NLWP", ("num_threads",), lambda p, now: p.get("num_threads") or 0),
+    "ni": Column("NI", ("nice",), lambda p, now: p.get("nice") if p.get("nice") is not None else 0),
+    "comm": Column("COMMAND", ("name",), lambda p, now: p.get("name") or "?", left=True),
+    "args": Column("COMMAND", ("cmdline", "name"), lambda p, now: _args(p), left=True),
+}
+ALIASES = {
+    "pcpu": "%cpu", "pmem": "%mem", "cmd": "args", "command": "args", "ucomm": "comm",
+    "cputime": "time", "stime": "start", "start_time": "start", "vsize": "vsz",
+    "rssize": "rss", "tname": "tty", "tt": "tty", "state": "stat", "s": "stat",
+    "thcount": "nlwp", "nice": "ni", "euser": "user", "euid": "uid",
+}
+
+# Стандартные форматы: без ключей, BSD "u" (ps aux) и SysV "-f" (ps -ef)
+DEFAULT_FORMAT = [("pid", None), ("tty", None), ("time", None), ("comm", "CMD")]
+USER_FORMAT = [(name, None) for name in ("user", "pid", "%cpu", "%mem", "vsz", "rss", "tty", "stat", "start", "time", "args")]
+FULL_FORMAT = [("user", "UID"), ("pid", None), ("ppid", None), ("c", None), ("start", "STIME"),
+               ("tty", None), ("time", None), ("args", "CMD")]
+
+
+def column(name):
+    key = ALIASES.get(name.lower(), name.lower())
+    if key not in COLUMNS:
+        raise ValueError(f"неизвестная колонка '{name}'")
+    return key
+
+
+def _split(value):
+    return [item for part in value.split(",") for item in part.split() if item]
+
+
+class PsOptions:
+    def __init__(self):
+        self.all = False
+        self.bsd_all = False
+        self.bsd_detached = False
+        self.format = None
+        self.columns = []
+        self.sort = []
+        self.pids = []
+        self.users = []
+        self.names = []
+        self.headers = True
+
+
+def parse_args(args):
+    opts = PsOptions()
+    i = 0
+
+    def value(flag):
+        nonlocal i
+        i += 1
+        if i >= len(args):
+            raise ValueError(f"ключ требует аргумент -- '{flag}'")
+        return args[i]
+
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("--sort"):
+            spec = arg.split("=", 1)[1] if "=" in arg else value("sort")
+            for key in _split(spec):
+                descending = key.startswith("-")
+                opts.sort.append((column(key.lstrip("+-")), descending))
+        elif arg in ("--no-headers", "--no-heading"):
+            opts.headers = False
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        elif arg.startswith("-") and len(arg) > 1:
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                rest = arg[j + 1:]
+                if flag in "eA":
+                    opts.all = True
+                elif flag == "f":
+                    opts.format = "full"
+                elif flag in "opuC":
+                    # Значение - остаток ключа или следующий аргумент: -o pid или -opid
+                    items = _split(rest or value(flag))
+                    if flag == "o":
+                        for item in items:
+                            # "pid=" - пустой заголовок, "pid" - заголовок по умолчанию
+                            name, sep, header = item.partition("=")
+                            opts.columns.append((column(name), header if sep else None))
+                    elif flag == "p":
+                        for item in items:
+                            if not item.isdigit():
+                                raise ValueError(f"неверный PID: '{item}'")
+                            opts.pids.append(int(item))
+                    elif flag == "u":
+                        opts.users.extend(items)
+                    else:
+                        opts.names.extend(items)
+                    break
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                j += 1
+        else:
+            # BSD-синтаксис без дефиса: ps aux, ps ax
+            for flag in arg:
+                if flag == "a":
+                    opts.bsd_all = True
+                elif flag == "x":
+                    opts.bsd_detached = True
+                elif flag == "u":
+                    opts.format = "user"
+                elif flag in "wf":
+                    pass
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+        i += 1
+    return opts
+
+
+def format_columns(opts):
+    if opts.columns:
+        return opts.columns
+    return {"user": USER_FORMAT, "full": FULL_FORMAT}.get(opts.format, DEFAULT_FORMAT)
+
+
+def _available(attrs):
+    # Атрибуты, которых нет на этой платформе (terminal на Windows, uids), пропускаются
+    import psutil
+    return [attr for attr in attrs if hasattr(psutil.Process, attr)]
+
+
+class Selector:
+    attrs = ("pid", "username", "uids", "terminal", "name")
+
+    def __init__(self, opts):
+        import psutil
+        self.opts = opts
+        me = psutil.Process()
+        self.my_user = _user(me.as_dict(["username"], ad_value=None))
+        self.my_tty = me.as_dict(_available(["terminal"]), ad_value=None).get("terminal")
+        self.pids = set(opts.pids)
+        self.uids = {int(u) for u in opts.users if u.isdigit()}
+        self.users = {u for u in opts.users if not u.isdigit()}
+        self.names = set(opts.names)
+        self.filtered = bool(self.pids or self.uids or self.users or self.names)
+
+    def __call__(self, info):
+        opts = self.opts
+        if opts.all or (opts.bsd_all and opts.bsd_detached):
+            return True
+        if self.filtered:
+            # Как у procps: условия выбора объединяются через ИЛИ
+            uids = info.get("uids")
+            return (info["pid"] in self.pids
+                    or _user(info) in self.users
+                    or (uids is not None and uids.effective in self.uids)
+                    or info.get("name") in self.names)
+        if opts.bsd_all:
+            return info.get("terminal") is not None
+        if opts.bsd_detached:
+            return _user(info) == self.my_user
+        return _user(info) == self.my_user and info.get("terminal") == self.my_tty
+
+
+def collect(attrs, select=None):
+    # process_iter(attrs) читает каждый процесс одним проходом внутри
+    # oneshot(): на Linux это один разбор /proc/PID/stat и status вместо
+    # отдельного чтения на каждый атрибут
+    import psutil
+    for proc in psutil.process_iter(attrs=_available(attrs), ad_value=None):
+        info = proc.info
+        if select is None or select(info):
+            yield info
+
+
+def render(rows, columns, headers, width=None):
+    # rows - списки строк по колонкам; последняя колонка не выравнивается
+    widths = [len(header) for header, _ in columns]
+    for row in rows:
+        for i, cell in enumerate(row[:-1]):
+            widths[i] = max(widths[i], len(cell))
+    lines = []
+    table = ([[header for header, _ in columns]] if headers else []) + rows
+    for row in table:
+        cells = []
+        for i, cell in enumerate(row):
+            left = columns[i][1]
+            if i == len(row) - 1:
+                cells.append(cell if left else cell.rjust(widths[i]))
+            else:
+                cells.append(cell.ljust(widths[i]) if left else cell.rjust(widths[i]))
+        line = " ".join(cells)
+        lines.append(line[:width] if width else line)
+    return lines
+
+
+def _width(emu):
+    if not emu.out.isatty():
+        return None
+    import shutil
+    return shutil.get_terminal_size().columns
+
+
+def ps(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"ps: {e}")
+        return 1
+    try:
+        import psutil  # noqa: F401
+    except ImportError:
+        print("ps: требуется модуль psutil")
+        return 1
+
+    selected = format_columns(opts)
+    select = Selector(opts)
+    attrs = set(Selector.attrs)
+    for name, _ in selected:
+        attrs.update(COLUMNS[name].attrs)
+    for name, _ in opts.sort:
+        attrs.update(COLUMNS[name].attrs)
+
+    now = time.time()
+    infos = list(collect(sorted(attrs), select))
+    # Устойчивая сортировка: ключи применяются с последнего
+    for name, descending in reversed(opts.sort or [("pid", False)]):
+        infos.sort(key=lambda info: COLUMNS[name].value(info, now), reverse=descending)
+
+    columns = [(COLUMNS[name].header if header is None else header, COLUMNS[name].left) for name, header in selected]
+    rows = [[COLUMNS[name].text(COLUMNS[name].value(info, now)) for name, _ in selected] for info in infos]
+    # Как у procps: строки заголовка нет, если все заголовки пустые (-o pid=)
+    headers = opts.headers and any(header for header, _ in columns)
+    emu.out.write_lines(render(rows, columns, headers, _width(emu)))
+    # Как у procps: 1, если под условия выбора не попал ни один процесс
+    return 1 if select.filtered and not infos else 0
+
+
+def _top_time(seconds):
+    # TIME+ у top: минуты:секунды.сотые
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:05.2f}"
+
+
+TOP_ATTRS = ("pid", "username", "nice", "memory_info", "status", "memory_percent", "cpu_times", "name")
+TOP_COLUMNS = [
+    ("PID", False, lambda p: str(p["pid"])),
+    ("USER", True, lambda p: _user(p)[:8]),
+    ("PR", False, lambda p: str(20 + p["nice"]) if isinstance(p.get("nice"), int) else "?"),
+    ("NI", False, lambda p: str(p["nice"]) if p.get("nice") is not None else "?"),
+    ("VIRT", False, lambda p: str(_memory(p, "vms"))),
+    ("RES", False, lambda p: str(_memory(p, "rss"))),
+    ("S", True, lambda p: STATUS_CODES.get(p.get("status"), "?")),
+    ("%CPU", False, lambda p: f"{p['cpu_percent']:.1f}"),
+    ("%MEM", False, lambda p: f"{p.get('memory_percent') or 0.0:.1f}"),
+    ("TIME+", False, lambda p: _top_time(_cpu_seconds(p))),
+    ("COMMAND", True, lambda p: p.get("name") or "?"),
+]
+TOP_SORT = {
+    "%cpu": lambda p: p["cpu_percent"], "%mem": lambda p: p.get("memory_percent") or 0.0,
+    "pid": lambda p: p["pid"], "time": _cpu_seconds, "res": lambda p: _memory(p, "rss"),
+}
+
+
+class TopOptions:
+    def __init__(self):
+        self.delay = 3.0
+        self.iterations = None
+        self.batch = False
+        self.sort = "%cpu"
+        self.pids = set()
+        self.user = None
+
+
+def parse_top_args(args):
+    opts = TopOptions()
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("-d", "-n", "-o", "-p", "-u"):
+            i += 1
+            if i >= len(args):
+                raise ValueError(f"ключ требует аргумент -- '{arg[1]}'")
+            value = args[i]
+            try:
+                if arg == "-d":
+                    opts.delay = float(value)
+                elif arg == "-n":
+                    opts.iterations = int(value)
+                elif arg == "-p":
+                    opts.pids.update(int(pid) for pid in _split(value))
+            except ValueError:
+                raise ValueError(f"неверное значение для {arg}: '{value}'")
+            if arg == "-o":
+                if value.lower() not in TOP_SORT:
+                    raise ValueError(f"неизвестное поле сортировки '{value}'")
+                opts.sort = value.lower()
+            elif arg == "-u":
+                opts.user = value
+        elif arg == "-b":
+            opts.batch = True
+        else:
+            raise ValueError(f"неверный ключ -- '{arg.lstrip('-')}'")
+        i += 1
+    return opts
+
+
+class TopView:
+    # Объекты Process живут между кадрами: cpu_percent(None) считает загрузку
+    # по разнице с прошлым кадром без паузы внутри, а неизменные данные
+    # процесса не перечитываются заново. Каждый кадр - один проход по
+    # psutil.pids() и одно чтение на процесс в oneshot()
+    def __init__(self, opts):
+        self.opts = opts
+        self.procs = {}
+        self.attrs = _available(TOP_ATTRS)
+
+    def sample(self):
+        import psutil
+        alive = set(psutil.pids())
+        if self.opts.pids:
+            alive &= self.opts.pids
+        for pid in list(self.procs):
+            if pid not in alive:
+                del self.procs[pid]
+        infos = []
+        for pid in alive:
+            proc = self.procs.get(pid)
+            try:
+                if proc is None:
+                    proc = self.procs[pid] = psutil.Process(pid)
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(None)
+                    info = proc.as_dict(self.attrs, ad_value=None)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self.procs.pop(pid, None)
+                continue
+            except psutil.AccessDenied:
+                continue
+            info["cpu_percent"] = cpu
+            if self.opts.user is None or _user(info) == self.opts.user:
+                infos.append(info)
+        return infos
+
+    def frame(self, infos, height=None, width=None):
+        import psutil
+        now = time.time()
+        up = int(now - psutil.boot_time())
+        load = ", ".join(f"{value:.2f}" for value in os.getloadavg()) if hasattr(os, "getloadavg") else "-"
+        counts = {}
+        for info in infos:
+            counts[info.get("status")] = counts.get(info.get("status"), 0) + 1
+        memory = psutil.virtual_memory()
+        lines = [
+            f"top - {time.strftime('%H:%M:%S')} up {up // 86400} дн, {up // 3600 % 24:2d}:{up // 60 % 60:02d}, load average: {load}",
+            f"Tasks: {len(infos)} total, {counts.get('running', 0)} running, {counts.get('sleeping', 0) + counts.get('idle', 0)} sleeping, "
+            f"{counts.get('stopped', 0)} stopped, {counts.get('zombie', 0)} zombie",
+            f"%Cpu(s): {psutil.cpu_percent(None):5.1f}",
+            f"MiB Mem: {memory.total / 1048576:9.1f} total, {memory.available / 1048576:9.1f} avail, {memory.used / 1048576:9.1f} used",
+            "",
+        ]
+        infos.sort(key=TOP_SORT[self.opts.sort], reverse=self.opts.sort != "pid")
+        if height is not None:
+            infos = infos[:max(0, height - len(lines) - 1)]
+        rows = [[text(info) for _, _, text in TOP_COLUMNS] for info in infos]
+        lines.extend(render(rows, [(header, left) for header, left, _ in TOP_COLUMNS], True, width))
+        return lines
+
+
+def top(emu, args):
+    try:
+        opts = parse_top_args(args)
+    except ValueError as e:
+        print(f"top: {e}")
+        return 1
+    try:
+        import psutil
+    except ImportError:
+        print("top: требуется модуль psutil")
+        return 1
+
+    view = TopView(opts)
+    # Первый замер только запоминает счетчики CPU
+    view.sample()
+    psutil.cpu_percent(None)
+    interactive = not opts.batch and emu.out.isatty()
+    delay = min(opts.delay, 0.5)
+    shown = 0
+    try:
+        while opts.iterations is None or shown < opts.iterations:
+            time.sleep(delay)
+            delay = opts.delay
+            infos = view.sample()
+            if interactive:
+                import shutil
+                size = shutil.get_terminal_size()
+                lines = view.frame(infos, size.lines, size.columns)
+                # Курсор в начало и очистка экрана - один write на кадр
+                sys.stdout.write("\x1b[H\x1b[2J" + "\n".join(lines))
+            else:
+                lines = view.frame(infos)
+                sys.stdout.write("\n".join(lines) + "\n\n")
+            sys.stdout.flush()
+            shown += 1
+    except KeyboardInterrupt:
+        pass
+    if interactive:
+        print()
+    return 0
@@ -0,0 +1,390 @@
+import os
+import stat
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from commands.common import default_workers, reason
+
+# Обход через дескрипторы директорий: каждое имя разрешается относительно
+# уже открытой директории, а не заново от корня по полному пути
+DIR_FD = ({os.open, os.unlink, os.rmdir} <= os.supports_dir_fd and os.scandir in os.supports_fd)
+DIR_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0)
+
+
+class RemoveOptions:
+    def __init__(self):
+        self.recursive = False
+        self.force = False
+        self.interactive = False
+        self.interactive_once = False
+        self.verbose = False
+        self.dirs = False
+        self.stats = False
+        self.workers = default_workers()
+        self.paths = []
+
+
+FLAGS = {
+    "r": "recursive",
+    "R": "recursive",
+    "f": "force",
+    "i": "interactive",
+    "I": "interactive_once",
+    "v": "verbose",
+    "d": "dirs",
+}
+LONG_FLAGS = {
+    "--recursive": "recursive",
+    "--force": "force",
+    "--verbose": "verbose",
+    "--dir": "dirs",
+    "--stats": "stats",
+}
+
+
+def parse_args(args):
+    opts = RemoveOptions()
+    only_paths = False
+    for arg in args:
+        if only_paths or not arg.startswith("-") or arg == "-":
+            opts.paths.append(arg)
+        elif arg == "--":
+            only_paths = True
+        elif arg in LONG_FLAGS:
+            setattr(opts, LONG_FLAGS[arg], True)
+        elif arg.startswith("--jobs="):
+            value = arg.split("=", 1)[1]
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"неверное число потоков: '{value}'")
+            opts.workers = int(value)
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            # Ключи можно объединять: -rf, -riv
+            for flag in arg[1:]:
+                if flag not in FLAGS:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                setattr(opts, FLAGS[flag], True)
+                # Последний из -f и -i отменяет другой, как в GNU rm
+                if flag == "f":
+                    opts.interactive = opts.interactive_once = False
+                elif flag in ("i", "I"):
+                    opts.force = False
+    return opts
+
+
+class Counters:
+    def __init__(self):
+        self.files = 0
+        self.dirs = 0
+        self.bytes = 0
+        self.errors = 0
+        self.lines = []
+
+    def add(self, other):
+        self.files += other.files
+        self.dirs += other.dirs
+        self.bytes += other.bytes
+        self.errors += other.errors
+        self.lines.extend(other.lines)
+
+
+def _freed(st):
+    # Место освобождается только при удалении последней жесткой ссылки
+    if st.st_nlink > 1:
+        return 0
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def _describe(st):
+    if stat.S_ISDIR(st.st_mode):
+        return "директорию"
+    if stat.S_ISLNK(st.st_mode):
+        return "символическую ссылку"
+    if stat.S_ISREG(st.st_mode):
+        return "пустой обычный файл" if st.st_size == 0 else "обычный файл"
+    return "специальный файл"
+
+
+def _ask(question):
+    try:
+        answer = input(f"rm: {question}? ")
+    except EOFError:
+        return False
+    return answer.strip().lower().startswith(("y", "д"))
+
+
+class Remover:
+    # Удаляет дерево итеративно (глубина дерева не ограничена стеком Python).
+    # handle - дескриптор открытой директории или, где dir_fd не
+    # поддерживается, ее путь; path везде - путь для сообщений
+    def __init__(self, opts):
+        self.opts = opts
+        self.measure = opts.interactive or opts.verbose or opts.stats
+
+    @staticmethod
+    def open(name, parent):
+        if DIR_FD:
+            return os.open(name, DIR_FLAGS, dir_fd=parent)
+        return os.path.join(parent, name) if parent is not None else name
+
+    @staticmethod
+    def close(handle):
+        if DIR_FD:
+            os.close(handle)
+
+    @staticmethod
+    def listing(handle):
+        with os.scandir(handle) as it:
+            return list(it)
+
+    def error(self, counters, message):
+        counters.errors += 1
+        counters.lines.append(f"rm: {message}")
+
+    def remove_file(self, entry, parent, path, counters):
+        try:
+            # stat нужен только для вопроса и подсчета освобожденного места
+            st = entry.stat(follow_symlinks=False) if self.measure else None
+            if self.opts.interactive and not _ask(f"удалить {_describe(st)} '{path}'"):
+                return False
+            if DIR_FD:
+                os.unlink(entry.name, dir_fd=parent)
+            else:
+                os.unlink(os.path.join(parent, entry.name))
+        except OSError as e:
+            self.error(counters, f"невозможно удалить '{path}': {reason(e)}")
+            return False
+        counters.files += 1
+        if st is not None:
+            counters.bytes += _freed(st)
+        if self.opts.verbose:
+            counters.lines.append(f"удален '{path}'")
+        return True
+
+    def remove_dir(self, name, parent, path, counters):
+        if self.opts.interactive and not _ask(f"удалить директорию '{path}'"):
+            return False
+        try:
+            if DIR_FD:
+                os.rmdir(name, dir_fd=parent)
+            else:
+                os.rmdir(os.path.join(parent, name) if parent is not None else name)
+        except OSError as e:
+            self.error(counters, f"невозможно удалить '{path}': {reason(e)}")
+            return False
+        counters.dirs += 1
+        if self.opts.verbose:
+            counters.lines.append(f"удалена директория '{path}'")
+        return True
+
+    def remove_contents(self, handle, entries, path, counters):
+        # Удаляет содержимое открытой директории; True - если удалено все
+        complete = True
+        stack = [(handle, path, iter(entries), None, None)]
+        while stack:
+            current, current_path, it, name, parent = stack[-1]
+            entry = next(it, None)
+            if entry is None:
+                stack.pop()
+                if stack:
+                    self.close(current)
+                    complete = self.remove_dir(name, parent, current_path, counters) and complete
+                continue
+
+            child_path = os.path.join(current_path, entry.name)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                complete = self.remove_file(entry, current, child_path, counters) and complete
+                continue
+            if self.opts.interactive and not _ask(f"спуститься в директорию '{child_path}'"):
+                complete = False
+                continue
+            try:
+                child = self.open(entry.name, current)
+            except OSError as e:
+                self.error(counters, f"невозможно удалить '{child_path}': {reason(e)}")
+                complete = False
+                continue
+            try:
+                child_entries = self.listing(child)
+            except OSError as e:
+                self.close(child)
+                self.error(counters, f"невозможно прочитать директорию '{child_path}': {reason(e)}")
+                complete = False
+                continue
+            stack.append((child, child_path, iter(child_entries), entry.name, current))
+        return complete
+
+    def remove_tree(self, parent_path, name, path):
+        # Удаляет директорию name внутри parent_path со всем содержимым.
+        # Возвращает (счетчики, удалена ли директория)
+        counters = Counters()
+        removed = False
+        try:
+            parent = self.open(parent_path, None)
+        except OSError as e:
+            self.error(counters, f"невозможно удалить '{path}': {reason(e)}")
+            return counters, removed
+        try:
+            handle = self.open(name, parent)
+            try:
+                entries = self.listing(handle)
+                complete = self.remove_contents(handle, entries, path, counters)
+            finally:
+                self.close(handle)
+            if complete:
+                removed = self.remove_dir(name, parent, path, counters)
+        except OSError as e:
+            self.error(counters, f"невозможно удалить '{path}': {reason(e)}")
+        finally:
+            self.close(parent)
+        return counters, removed
+
+    def remove_parallel(self, full_path, path, pool, total):
+        # Файлы корня удаляются сразу, а поддиректории первого уровня -
+        # независимые поддеревья - уходят в пул потоков, каждая со своими
+        # дескрипторами. Результаты выводятся в порядке листинга
+        try:
+            handle = self.open(full_path, None)
+        except OSError as e:
+            self.error(total, f"невозможно удалить '{path}': {reason(e)}")
+            return
+        complete = True
+        jobs = deque()
+        try:
+            for entry in self.listing(handle):
+                child_path = os.path.join(path, entry.name)
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    jobs.append(pool.submit(self.remove_tree, full_path, entry.name, child_path))
+                else:
+                    local = Counters()
+                    complete = self.remove_file(entry, handle, child_path, local) and complete
+                    total.add(local)
+            _report(total)
+            while jobs:
+                counters, removed = jobs.popleft().result()
+                complete = complete and removed
+                total.add(counters)
+                _report(total)
+        except OSError as e:
+            self.error(total, f"невозможно прочитать директорию '{path}': {reason(e)}")
+            complete = False
+        finally:
+            for job in jobs:
+                job.cancel()
+            self.close(handle)
+        if not complete:
+            return
+        try:
+            parent = self.open(os.path.dirname(full_path), None)
+        except OSError as e:
+            self.error(total, f"невозможно удалить '{path}': {reason(e)}")
+            return
+        try:
+            self.remove_dir(os.path.basename(full_path), parent, path, total)
+        finally:
+            self.close(parent)
+
+
+def _report(counters):
+    for line in counters.lines:
+        print(line)
+    counters.lines = []
+
+
+def rm(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"rm: {e}")
+        return 1
+
+    if not opts.paths:
+        if not opts.force:
+            print("rm: требуется операнд")
+            return 1
+        return 0
+
+    if opts.interactive_once and (opts.recursive or len(opts.paths) > 3):
+        suffix = " рекурсивно" if opts.recursive else ""
+        if not _ask(f"удалить аргументов: {len(opts.paths)}{suffix}"):
+            return 0
+
+    remover = Remover(opts)
+    total = Counters()
+    # С -i вопросы должны идти по порядку обхода, поэтому без пула
+    pool = None
+    if opts.recursive and not opts.interactive and opts.workers > 1:
+        pool = ThreadPoolExecutor(max_workers=opts.workers)
+    try:
+        for path in opts.paths:
+            remove_path(emu, remover, path, pool, total)
+            _report(total)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if opts.verbose or opts.stats:
+        print(f"удалено файлов: {total.files}, директорий: {total.dirs}, освобождено {emu._human_size(total.bytes)}")
+    return 1 if total.errors else 0
+
+
+def remove_path(emu, remover, path, pool, total):
+    opts = remover.opts
+    if os.path.basename(path.rstrip(os.sep)) in (".", ".."):
+        remover.error(total, f"отказ удалять директорию '.' или '..': пропускается '{path}'")
+        return
+    full_path = os.path.normpath(os.path.join(emu.current_dir, path) if not os.path.isabs(path) else path)
+    if opts.recursive and os.path.dirname(full_path) == full_path:
+        remover.error(total, f"опасно рекурсивно обрабатывать '{path}'")
+        return
+    try:
+        st = os.lstat(full_path)
+    except FileNotFoundError:
+        if not opts.force:
+            remover.error(total, f"невозможно удалить '{path}': Нет такого файла или директории")
+        return
+    except OSError as e:
+        remover.error(total, f"невозможно удалить '{path}': {reason(e)}")
+        return
+
+    if not stat.S_ISDIR(st.st_mode):
+        if opts.interactive and not _ask(f"удалить {_describe(st)} '{path}'"):
+            return
+        try:
+            os.unlink(full_path)
+        except OSError as e:
+            remover.error(total, f"невозможно удалить '{path}': {reason(e)}")
+            return
+        total.files += 1
+        total.bytes += _freed(st)
+        if opts.verbose:
+            total.lines.append(f"удален '{path}'")
+    elif opts.recursive:
+        if opts.interactive and not _ask(f"спуститься в директорию '{path}'"):
+            return
+        if pool is not None:
+            remover.remove_parallel(full_path, path, pool, total)
+        else:
+            counters, _ = remover.remove_tree(os.path.dirname(full_path), os.path.basename(full_path), path)
+            total.add(counters)
+    elif opts.dirs:
+        try:
+            os.rmdir(full_path)
+        except OSError as e:
+            remover.error(total, f"невозможно удалить '{path}': {reason(e)}")
+            return
+        total.dirs += 1
+        if opts.verbose:
+            total.lines.append(f"удалена директория '{path}'")
+    else:
+        remover.error(total, f"невозможно удалить '{path}': Это директория")
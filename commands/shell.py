@@ -0,0 +1,216 @@
+import os
+import sys
+
+# Операторы командной строки; более длинные проверяются первыми
+OPERATORS = ("&&", "||", ";", "|")
+# Символы, которые можно не брать в кавычки при обратной сборке команды
+SAFE_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789@%+=:,./-_")
+
+
+# Оператор отличается от слова ";" или "|" в кавычках только типом
+class Operator(str):
+    pass
+
+
+# Разбор строки по правилам sh: кавычки '...' и "...", экранирование \,
+# комментарии с # в начале слова и операторы ; && || | вне кавычек.
+# Возвращает слова (str) и операторы (Operator) вместе с их позициями
+# в исходной строке, чтобы внешние команды получали текст без изменений.
+def tokenize(line):
+    tokens = []
+    word = []
+    in_word = False
+    start = 0
+    i = 0
+    n = len(line)
+    while i < n:
+        c = line[i]
+        if c in " \t\n":
+            if in_word:
+                tokens.append(("".join(word), start, i))
+                word = []
+                in_word = False
+            i += 1
+            continue
+        if not in_word:
+            if c == "#":
+                break
+            operator = next((op for op in OPERATORS if line.startswith(op, i)), None)
+            if operator is not None:
+                tokens.append((Operator(operator), i, i + len(operator)))
+                i += len(operator)
+                continue
+            in_word = True
+            start = i
+        elif any(line.startswith(op, i) for op in OPERATORS):
+            tokens.append(("".join(word), start, i))
+            word = []
+            in_word = False
+            continue
+        if c == "'":
+            end = line.find("'", i + 1)
+            if end < 0:
+                raise ValueError("незакрытая кавычка '")
+            word.append(line[i + 1:end])
+            i = end + 1
+        elif c == '"':
+            i += 1
+            while True:
+                if i >= n:
+                    raise ValueError('незакрытая кавычка "')
+                c = line[i]
+                if c == '"':
+                    i += 1
+                    break
+                if c == "\\" and i + 1 < n and line[i + 1] in '"\\$`':
+                    word.append(line[i + 1])
+                    i += 2
+                    continue
+                word.append(c)
+                i += 1
+        elif c == "\\":
+            if i + 1 < n:
+                word.append(line[i + 1])
+            i += 2
+        else:
+            word.append(c)
+            i += 1
+    if in_word:
+        tokens.append(("".join(word), start, n))
+    return tokens
+
+
+class Pipeline:
+    def __init__(self, text, stages, operator=None):
+        # text - исходный текст (для внешней оболочки), stages - списки слов
+        # стадий конвейера, operator - связка с предыдущей командой
+        self.text = text
+        self.stages = stages
+        self.operator = operator
+
+
+def parse_line(line):
+    # Строка -> список Pipeline; ValueError при синтаксической ошибке
+    pipelines = []
+    operator = None
+    stages = [[]]
+    start = end = None
+    for value, token_start, token_end in tokenize(line):
+        if isinstance(value, Operator):
+            if not stages[-1]:
+                # Оператор без команды перед ним: "| a", "a | | b", "&& a", ";;"
+                raise ValueError(f"синтаксическая ошибка рядом с неожиданным маркером '{value}'")
+            if value == "|":
+                stages.append([])
+                continue
+            pipelines.append(Pipeline(line[start:end], stages, operator))
+            stages = [[]]
+            start = end = None
+            operator = value
+            continue
+        if start is None:
+            start = token_start
+        end = token_end
+        stages[-1].append(value)
+    if stages[-1]:
+        pipelines.append(Pipeline(line[start:end], stages, operator))
+    elif len(stages) > 1 or operator in ("&&", "||"):
+        raise ValueError("синтаксическая ошибка: неожиданный конец строки")
+    return pipelines
+
+
+def split_words(text):
+    return [str(value) for value, _, _ in tokenize(text)]
+
+
+def quote(word):
+    if word and all(c in SAFE_CHARS for c in word):
+        return word
+    return "'" + word.replace("'", "'\"'\"'") + "'"
+
+
+def join(words):
+    return " ".join(quote(word) for word in words)
+
+
+def run_lines(emu, lines, errexit=False):
+    # Пакетный режим: каждая строка - как введенная в приглашении, код
+    # возврата - последней выполненной команды
+    status = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        status = emu.parse_command(line)
+        if errexit and status:
+            break
+    return status
+
+
+USAGE = "использование: main.py [-e] [--profile[=DIR]] [--metrics=FILE] [-c команды | скрипт | -]"
+
+
+class ShellOptions:
+    def __init__(self):
+        # source - ("command", текст), ("file", путь), ("stdin", None) или
+        # None для интерактивного режима
+        self.source = None
+        self.errexit = False
+        self.profile = None
+        self.metrics = None
+
+
+def parse_cli(argv):
+    opts = ShellOptions()
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg == "-c":
+            if not args:
+                raise ValueError("-c: требуется аргумент")
+            opts.source = ("command", args.pop(0))
+            break
+        if arg == "-e":
+            opts.errexit = True
+        elif arg == "--profile" or arg.startswith("--profile="):
+            opts.profile = os.path.abspath(arg.partition("=")[2] or "profiles")
+        elif arg == "--metrics" or arg.startswith("--metrics="):
+            path = arg.partition("=")[2]
+            if not path:
+                if not args:
+                    raise ValueError("--metrics: требуется файл")
+                path = args.pop(0)
+            opts.metrics = os.path.abspath(path)
+        elif arg == "-":
+            opts.source = ("stdin", None)
+            break
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        elif arg.startswith("-"):
+            raise ValueError(f"неверный ключ -- '{arg.lstrip('-')}'")
+        else:
+            opts.source = ("file", arg)
+            break
+    if opts.source is None and not sys.stdin.isatty():
+        opts.source = ("stdin", None)
+    return opts
+
+
+def run_batch(emu, source, errexit=False):
+    kind, value = source
+    emu.interactive = False
+    try:
+        if kind == "command":
+            return run_lines(emu, value.splitlines(), errexit)
+        if kind == "stdin":
+            return run_lines(emu, sys.stdin, errexit)
+        path = os.path.join(emu.current_dir, value) if not os.path.isabs(value) else value
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except OSError as e:
+            print(f"main.py: {value}: {e.strerror}", file=sys.stderr)
+            return 127
+        with f:
+            return run_lines(emu, f, errexit)
+    except KeyboardInterrupt:
+        return 130
@@ -0,0 +1,464 @@
+import functools
+import heapq
+import itertools
+import os
+import re
+import shutil
+import tempfile
+
+from commands import ExitStatus
+
+# Оценка накладных расходов на строку в памяти сверх ее длины
+LINE_OVERHEAD = 64
+# Сколько прогонов сливается за один проход; больше - сливаем в несколько этапов
+MERGE_FANIN = 64
+DEFAULT_BUFFER = 256 * 1024 * 1024
+SIZE_SUFFIXES = {"b": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+NUMBER = re.compile(r"[ \t]*(-?(?:\d+\.?\d*|\.\d+))")
+BLANK_FIELD = re.compile(r"[ \t]*[^ \t]+")
+
+
+class KeyField:
+    # Ключ -k F1[.C1][опции][,F2[.C2][опции]]; поля и символы нумеруются с 1
+    def __init__(self):
+        self.start_field = 1
+        self.start_char = 1
+        self.end_field = None
+        self.end_char = 0
+        self.numeric = False
+        self.reverse = False
+        self.fold = False
+        self.blank = False
+
+
+class SortOptions:
+    def __init__(self):
+        self.reverse = False
+        self.numeric = False
+        self.unique = False
+        self.fold = False
+        self.blank = False
+        self.stable = False
+        self.merge = False
+        self.separator = None
+        self.keys = []
+        self.buffer_size = DEFAULT_BUFFER
+        self.temp_dir = None
+        self.parallel = min(8, os.cpu_count() or 1)
+        self.files = []
+
+
+FLAGS = {"r": "reverse", "n": "numeric", "u": "unique", "f": "fold", "b": "blank", "s": "stable", "m": "merge"}
+LONG_FLAGS = {
+    "--reverse": "reverse",
+    "--numeric-sort": "numeric",
+    "--unique": "unique",
+    "--ignore-case": "fold",
+    "--ignore-leading-blanks": "blank",
+    "--stable": "stable",
+    "--merge": "merge",
+}
+VALUE_FLAGS = {"k": "--key", "t": "--field-separator", "S": "--buffer-size", "T": "--temporary-directory"}
+
+
+def parse_args(args):
+    opts = SortOptions()
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--":
+            opts.files.extend(args[i + 1:])
+            break
+        if arg in LONG_FLAGS:
+            setattr(opts, LONG_FLAGS[arg], True)
+        elif arg.startswith("--") and "=" in arg:
+            name, value = arg.split("=", 1)
+            if name == "--parallel":
+                if not value.isdigit() or int(value) < 1:
+                    raise ValueError(f"неверное число потоков: '{value}'")
+                opts.parallel = int(value)
+            elif name in VALUE_FLAGS.values():
+                _set_value(opts, name, value)
+            else:
+                raise ValueError(f"нераспознанный ключ '{arg}'")
+        elif arg in VALUE_FLAGS.values():
+            i += 1
+            if i >= len(args):
+                raise ValueError(f"ключ требует аргумент -- '{arg}'")
+            _set_value(opts, arg, args[i])
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                if flag in VALUE_FLAGS:
+                    value = arg[j + 1:]
+                    if not value:
+                        i += 1
+                        if i >= len(args):
+                            raise ValueError(f"ключ требует аргумент -- '{flag}'")
+                        value = args[i]
+                    _set_value(opts, VALUE_FLAGS[flag], value)
+                    break
+                if flag not in FLAGS:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                setattr(opts, FLAGS[flag], True)
+                j += 1
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            opts.files.append(arg)
+        i += 1
+
+    # Ключи без собственных опций наследуют глобальные
+    for key in opts.keys:
+        if not (key.numeric or key.reverse or key.fold or key.blank):
+            key.numeric = opts.numeric
+            key.reverse = opts.reverse
+            key.fold = opts.fold
+            key.blank = opts.blank
+    return opts
+
+
+def _set_value(opts, name, value):
+    if name == "--key":
+        opts.keys.append(_parse_key(value))
+    elif name == "--field-separator":
+        if len(value) != 1:
+            raise ValueError(f"разделитель должен быть одним символом: '{value}'")
+        opts.separator = value
+    elif name == "--buffer-size":
+        opts.buffer_size = _parse_size(value)
+    else:
+        opts.temp_dir = value
+
+
+def _parse_size(value):
+    match = re.fullmatch(r"(\d+)([bKMGT%]?)", value)
+    if not match:
+        raise ValueError(f"неверный размер буфера: '{value}'")
+    number, suffix = int(match.group(1)), match.group(2)
+    if suffix == "%":
+        try:
+            total = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, ValueError, OSError):
+            raise ValueError(f"неверный размер буфера: '{value}'")
+        return max(total * number // 100, 1)
+    # Как в GNU sort: число без суффикса - в килобайтах
+    return max(number * SIZE_SUFFIXES.get(suffix or "K"), 1)
+
+
+def _parse_position(text, spec, is_end):
+    match = re.fullmatch(r"(\d+)(?:\.(\d+))?([bnrf]*)", text)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"неверный ключ сортировки: '{spec}'")
+    char = int(match.group(2)) if match.group(2) is not None else (0 if is_end else 1)
+    if not is_end and char == 0:
+        raise ValueError(f"неверный ключ сортировки: '{spec}'")
+    return int(match.group(1)), char, match.group(3)
+
+
+def _parse_key(spec):
+    key = KeyField()
+    start, _, end = spec.partition(",")
+    key.start_field, key.start_char, flags = _parse_position(start, spec, False)
+    if end:
+        key.end_field, key.end_char, end_flags = _parse_position(end, spec, True)
+        flags += end_flags
+    key.numeric = "n" in flags
+    key.reverse = "r" in flags
+    key.fold = "f" in flags
+    key.blank = "b" in flags
+    return key
+
+
+def _field_spans(line, separator):
+    if separator is None:
+        # Без -t поле - это пробельные символы перед ним плюс непробельные
+        return [match.span() for match in BLANK_FIELD.finditer(line)]
+    spans = []
+    start = 0
+    while True:
+        end = line.find(separator, start)
+        if end < 0:
+            spans.append((start, len(line)))
+            return spans
+        spans.append((start, end))
+        start = end + 1
+
+
+def _skip_blanks(line, pos, limit):
+    while pos < limit and line[pos] in " \t":
+        pos += 1
+    return pos
+
+
+def _extract(line, key, separator):
+    spans = _field_spans(line, separator)
+    if key.start_field > len(spans):
+        return ""
+    field_start, field_end = spans[key.start_field - 1]
+    if key.blank:
+        field_start = _skip_blanks(line, field_start, field_end)
+    start = min(field_start + key.start_char - 1, field_end)
+
+    if key.end_field is None or key.end_field > len(spans):
+        end = len(line)
+    else:
+        field_start, field_end = spans[key.end_field - 1]
+        if key.end_char == 0:
+            end = field_end
+        else:
+            if key.blank:
+                field_start = _skip_blanks(line, field_start, field_end)
+            end = min(field_start + key.end_char, field_end)
+    return line[start:end] if end > start else ""
+
+
+def _numeric(text):
+    # Числовой префикс строки; строка без числа считается нулем, как в GNU sort
+    match = NUMBER.match(text)
+    return float(match.group(1)) if match else 0.0
+
+
+def _key_value(text, numeric, fold, blank):
+    if numeric:
+        return _numeric(text)
+    if blank:
+        text = text.lstrip(" \t")
+    return text.upper() if fold else text
+
+
+def make_key(opts, last_resort=True):
+    # Возвращает (функция ключа, reverse) для list.sort и heapq.merge.
+    # При равенстве ключей строки сравниваются целиком, если не задан -s или -u
+    last_resort = last_resort and not (opts.stable or opts.unique)
+
+    if not opts.keys:
+        if not (opts.numeric or opts.fold or opts.blank):
+            return (None if last_resort else (lambda line: line)), opts.reverse
+
+        def whole(line):
+            value = _key_value(line, opts.numeric, opts.fold, opts.blank)
+            return (value, line) if last_resort else value
+        return whole, opts.reverse
+
+    keys = opts.keys
+    separator = opts.separator
+
+    def values(line):
+        return [_key_value(_extract(line, key, separator), key.numeric, key.fold, False) for key in keys]
+
+    if all(key.reverse == opts.reverse for key in keys):
+        if last_resort:
+            return (lambda line: (*values(line), line)), opts.reverse
+        return (lambda line: tuple(values(line))), opts.reverse
+
+    # Направление отличается у разных ключей: сравниваем по ключам поочередно
+    def compare(a, b):
+        for key, x, y in zip(keys, a[0], b[0]):
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if key.reverse else result
+        if last_resort and a[1] != b[1]:
+            result = -1 if a[1] < b[1] else 1
+            return -result if opts.reverse else result
+        return 0
+
+    wrap = functools.cmp_to_key(compare)
+    return (lambda line: wrap((values(line), line))), False
+
+
+def _write_run(lines, directory):
+    fd, path = tempfile.mkstemp(prefix="run", suffix=".txt", dir=directory)
+    with open(fd, "w", encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
+    return path
+
+
+def sort_run(lines, opts, directory):
+    # Выполняется в рабочем процессе: сортирует порцию и сбрасывает ее во временный файл
+    key, reverse = make_key(opts)
+    lines.sort(key=key, reverse=reverse)
+    return _write_run(lines, directory)
+
+
+def _read_run(path):
+    with open(path, encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+        for line in f:
+            yield line[:-1] if line.endswith("\n") else line
+
+
+def _merge(sources, opts):
+    key, reverse = make_key(opts)
+    return heapq.merge(*sources, key=key, reverse=reverse)
+
+
+def _merge_runs(paths, opts, directory):
+    # Слишком много прогонов сразу не откроешь: сливаем их группами в новые прогоны
+    while len(paths) > MERGE_FANIN:
+        merged = []
+        for i in range(0, len(paths), MERGE_FANIN):
+            group = paths[i:i + MERGE_FANIN]
+            merged.append(_write_run(_merge([_read_run(path) for path in group], opts), directory))
+            for path in group:
+                os.remove(path)
+        paths = merged
+    return _merge([_read_run(path) for path in paths], opts)
+
+
+class RunWriter:
+    # Раскладывает отсортированные прогоны по временным файлам. Если доступно
+    # несколько процессов, порции сортируются параллельно, но в работе
+    # одновременно не больше parallel порций, чтобы не выйти за бюджет памяти
+    def __init__(self, opts, directory):
+        self.opts = opts
+        self.directory = directory
+        self.paths = []
+        self.pending = []
+        self.pool = None
+        if opts.parallel > 1:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+                self.pool = ProcessPoolExecutor(max_workers=opts.parallel)
+            except (ImportError, OSError, NotImplementedError):
+                self.pool = None
+
+    def add(self, lines):
+        if self.pool is None:
+            self.paths.append(sort_run(lines, self.opts, self.directory))
+            return
+        self.pending.append(self.pool.submit(sort_run, lines, self.opts, self.directory))
+        if len(self.pending) >= self.opts.parallel:
+            self.paths.append(self.pending.pop(0).result())
+
+    def finish(self):
+        try:
+            for future in self.pending:
+                self.paths.append(future.result())
+        finally:
+            self.close()
+        return self.paths
+
+    def close(self):
+        if self.pool is not None:
+            for future in self.pending:
+                future.cancel()
+            self.pool.shutdown()
+            self.pool = None
+        self.pending = []
+
+
+def sort_lines(lines, opts):
+    # Сортирует поток строк; пока данные помещаются в -S, все идет в памяти,
+    # иначе порции сбрасываются на диск и сливаются k-путевым слиянием
+    budget = opts.buffer_size
+    if opts.parallel > 1:
+        budget = max(budget // (opts.parallel + 1), 1024 * 1024)
+    chunk = []
+    size = 0
+    writer = None
+    directory = None
+    try:
+        for line in lines:
+            chunk.append(line)
+            size += len(line) + LINE_OVERHEAD
+            if size >= budget:
+                if writer is None:
+                    directory = tempfile.mkdtemp(prefix="sort-", dir=opts.temp_dir)
+                    writer = RunWriter(opts, directory)
+                writer.add(chunk)
+                chunk = []
+                size = 0
+
+        if writer is None:
+            key, reverse = make_key(opts)
+            chunk.sort(key=key, reverse=reverse)
+            yield from _unique(chunk, opts)
+            return
+
+        if chunk:
+            writer.add(chunk)
+            chunk = []
+        paths = writer.finish()
+        yield from _unique(_merge_runs(paths, opts, directory), opts)
+    finally:
+        if writer is not None:
+            writer.close()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _unique(lines, opts):
+    if not opts.unique:
+        return lines
+    key, _ = make_key(opts, last_resort=False)
+    return (next(group) for _, group in itertools.groupby(lines, key=key))
+
+
+def _read_file(path):
+    # Байты, не являющиеся UTF-8, проходят через сортировку без изменений:
+    # surrogateescape сохраняет их и при сбросе прогонов на диск, и при выводе
+    with open(path, encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+        for line in f:
+            yield line[:-1] if line.endswith("\n") else line
+
+
+def _sources(emu, opts, stdin, errors):
+    sources = []
+    for filename in opts.files:
+        if filename == "-" and stdin is not None:
+            sources.append(stdin)
+            continue
+        full_path = os.path.join(emu.current_dir, filename) if not os.path.isabs(filename) else filename
+        if os.path.isdir(full_path):
+            errors.append(f"sort: ошибка чтения: {filename}: Это директория")
+        elif not os.path.exists(full_path):
+            errors.append(f"sort: невозможно прочитать: {filename}: Нет такого файла или директории")
+        elif not os.access(full_path, os.R_OK):
+            errors.append(f"sort: невозможно прочитать: {filename}: Отказано в доступе")
+        else:
+            sources.append(_read_file(full_path))
+    return sources
+
+
+def sort_stream(emu, args, stdin=None, status=None):
+    # Как у GNU sort, любая ошибка - код 2
+    if status is None:
+        status = ExitStatus()
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"sort: {e}")
+        status.fail(2)
+        return
+
+    if opts.files:
+        errors = []
+        sources = _sources(emu, opts, stdin, errors)
+        for message in errors:
+            print(message)
+        if errors:
+            status.fail(2)
+            return
+    elif stdin is not None:
+        sources = [stdin]
+    else:
+        print("sort: требуется файл")
+        status.fail(2)
+        return
+
+    if opts.merge:
+        # -m: входы уже отсортированы, остается только слить их
+        yield from _unique(_merge(sources, opts), opts)
+        return
+    # Несколько файлов сортируются вместе, как один общий вход
+    yield from sort_lines(itertools.chain.from_iterable(sources), opts)
+
+
+def sort(emu, args):
+    status = ExitStatus()
+    emu.out.write_lines(sort_stream(emu, args, status=status))
+    return status.code()
@@ -0,0 +1,261 @@
+import os
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from stat import S_ISDIR
+
+# Маска событий inotify: любое изменение содержимого, атрибутов или состава директории
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    def __init__(self, max_watches):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.max_watches = max_watches
+        self.watches = {}
+        self.paths = {}
+
+    def watch(self, directory):
+        if directory in self.paths:
+            return True
+        if len(self.paths) >= self.max_watches:
+            return False
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return False
+        self.watches[wd] = directory
+        self.paths[directory] = wd
+        return True
+
+    def read(self):
+        # Возвращает измененные пути; None означает переполнение очереди
+        changed = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            if not data:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                directory = self.watches.get(wd)
+                if directory is None:
+                    continue
+                changed.append(directory)
+                if name:
+                    changed.append(os.path.join(directory, os.fsdecode(name)))
+                if mask & IN_IGNORED:
+                    del self.watches[wd]
+                    self.paths.pop(directory, None)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class StatCache:
+    # Кэш метаданных на время сессии: путь -> stat_result с вытеснением по LRU.
+    # На Linux записи сбрасываются по событиям inotify; где его нет, записи
+    # директории проверяются по mtime родителя (один stat на директорию за
+    # команду) и живут не дольше ttl секунд
+    def __init__(self, max_entries=50000, ttl=5.0, max_watches=4096, use_inotify=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_watches = max_watches
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._by_dir = {}
+        self._dir_mtimes = {}
+        self._generation = 0
+        self._inotify = None
+        self._lock = threading.RLock()
+        self._last_poll = 0.0
+
+    @property
+    def inotify(self):
+        if self._inotify is None and self.use_inotify:
+            try:
+                self._inotify = Inotify(self.max_watches)
+            except (OSError, AttributeError):
+                self.use_inotify = False
+        return self._inotify
+
+    def refresh(self):
+        # Вызывается перед каждой командой: забирает события inotify или
+        # начинает новое поколение проверок mtime
+        with self._lock:
+            self._generation += 1
+            self._poll()
+
+    def _poll(self):
+        self._last_poll = time.monotonic()
+        if self._inotify is None:
+            return
+        changed = self._inotify.read()
+        if changed is None:
+            self._clear()
+            return
+        for path in changed:
+            self._drop_path(path)
+
+    def stat(self, path, follow_symlinks=True):
+        path = os.path.abspath(path)
+        key = (path, follow_symlinks)
+        with self._lock:
+            st = self._lookup(key)
+            if st is not None:
+                return st
+        cacheable = self._watch_parent(path)
+        st = os.stat(path, follow_symlinks=follow_symlinks)
+        if cacheable:
+            self._store(key, st)
+        return st
+
+    def lstat(self, path):
+        return self.stat(path, follow_symlinks=False)
+
+    def entry_stat(self, entry, follow_symlinks=False):
+        # Для os.DirEntry: сначала кэш сессии, потом stat самой записи
+        key = (os.path.abspath(entry.path), follow_symlinks)
+        with self._lock:
+            st = self._lookup(key)
+            if st is not None:
+                return st
+        cacheable = self._watch_parent(key[0])
+        st = entry.stat(follow_symlinks=follow_symlinks)
+        if cacheable:
+            self._store(key, st)
+        return st
+
+    def _lookup(self, key):
+        if self._inotify is not None and time.monotonic() - self._last_poll > 1.0:
+            self._poll()
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        st, stored_at = item
+        if self._inotify is None and not self._still_valid(key[0], stored_at):
+            self._discard(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return st
+
+    def _still_valid(self, path, stored_at):
+        if time.monotonic() - stored_at > self.ttl:
+            return False
+        parent = os.path.dirname(path)
+        mtime, generation = self._dir_mtimes.get(parent, (None, None))
+        if generation != self._generation:
+            try:
+                current = os.stat(parent).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                self._drop_dir(parent)
+                return False
+            self._dir_mtimes[parent] = (mtime, self._generation)
+        return True
+
+    def _watch_parent(self, path):
+        # Наблюдение ставится до stat, чтобы не пропустить изменение между ними
+        parent = os.path.dirname(path)
+        with self._lock:
+            if self.inotify is not None:
+                return self._inotify.watch(parent)
+            if parent not in self._dir_mtimes:
+                try:
+                    self._dir_mtimes[parent] = (os.stat(parent).st_mtime_ns, self._generation)
+                except OSError:
+                    return False
+            return True
+
+    def _store(self, key, st):
+        path = key[0]
+        with self._lock:
+            # Директорию наблюдаем и саму: ее mtime меняется при изменении содержимого
+            if self._inotify is not None and S_ISDIR(st.st_mode) and not self._inotify.watch(path):
+                return
+            self._entries[key] = (st, time.monotonic())
+            self._entries.move_to_end(key)
+            self._by_dir.setdefault(os.path.dirname(path), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._unindex(old_key)
+
+    def _unindex(self, key):
+        parent = os.path.dirname(key[0])
+        keys = self._by_dir.get(parent)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_dir[parent]
+                self._dir_mtimes.pop(parent, None)
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is not None:
+            self._unindex(key)
+
+    def _drop_path(self, path):
+        self._discard((path, True))
+        self._discard((path, False))
+
+    def _drop_dir(self, directory):
+        for key in list(self._by_dir.get(directory, ())):
+            self._discard(key)
+        self._dir_mtimes.pop(directory, None)
+
+    def invalidate(self, path, recursive=False):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._drop_path(path)
+            # У родителя меняются mtime и число ссылок
+            self._drop_path(os.path.dirname(path))
+            self._drop_dir(path)
+            if recursive:
+                prefix = path.rstrip(os.sep) + os.sep
+                for key in [key for key in self._entries if key[0].startswith(prefix)]:
+                    self._discard(key)
+
+    def _clear(self):
+        self._entries.clear()
+        self._by_dir.clear()
+        self._dir_mtimes.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def __len__(self):
+        return len(self._entries)
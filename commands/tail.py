@@ -0,0 +1,408 @@
+import codecs
+import collections
+import itertools
+import os
+import stat
+import sys
+import time
+
+from commands import ExitStatus, UnterminatedLine
+from commands.common import reason
+
+# Файл читается с конца блоками такого размера
+BLOCK_SIZE = 64 * 1024
+
+
+class TailOptions:
+    def __init__(self):
+        self.count = 10
+        self.bytes = False
+        # Отсчет от начала файла: tail -n +N / -c +N
+        self.from_start = False
+        self.follow = None
+        self.retry = False
+        self.interval = 1.0
+        self.headers = None
+        self.files = []
+
+
+def _count(opts, value, unit):
+    opts.bytes = unit == "c"
+    opts.from_start = value.startswith("+")
+    number = value.lstrip("+-")
+    if not number.isdigit():
+        what = "байт" if opts.bytes else "строк"
+        raise ValueError(f"неверное количество {what}: '{value}'")
+    opts.count = int(number)
+
+
+def parse_args(args):
+    opts = TailOptions()
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("-n", "-c", "--lines", "--bytes", "-s", "--sleep-interval"):
+            i += 1
+            if i >= len(args):
+                raise ValueError(f"ключ требует аргумент -- '{arg}'")
+            if arg in ("-s", "--sleep-interval"):
+                opts.interval = _interval(args[i])
+            else:
+                _count(opts, args[i], "c" if arg in ("-c", "--bytes") else "n")
+        elif arg.startswith(("--lines=", "--bytes=")):
+            _count(opts, arg.split("=", 1)[1], "c" if arg.startswith("--bytes") else "n")
+        elif arg.startswith("--sleep-interval="):
+            opts.interval = _interval(arg.split("=", 1)[1])
+        elif arg in ("--follow", "--follow=descriptor"):
+            opts.follow = "descriptor"
+        elif arg == "--follow=name":
+            opts.follow = "name"
+        elif arg == "--retry":
+            opts.retry = True
+        elif arg in ("--quiet", "--silent"):
+            opts.headers = False
+        elif arg == "--verbose":
+            opts.headers = True
+        elif arg.startswith("-") and arg[1:].isdigit():
+            # Старая форма: tail -20 файл
+            _count(opts, arg[1:], "n")
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            j = 1
+            while j < len(arg):
+                flag = arg[j]
+                if flag in ("n", "c", "s"):
+                    value = arg[j + 1:]
+                    if not value:
+                        i += 1
+                        if i >= len(args):
+                            raise ValueError(f"ключ требует аргумент -- '{flag}'")
+                        value = args[i]
+                    if flag == "s":
+                        opts.interval = _interval(value)
+                    else:
+                        _count(opts, value, flag)
+                    break
+                if flag == "f":
+                    opts.follow = opts.follow or "descriptor"
+                elif flag == "F":
+                    opts.follow = "name"
+                    opts.retry = True
+                elif flag == "q":
+                    opts.headers = False
+                elif flag == "v":
+                    opts.headers = True
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                j += 1
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            opts.files.append(arg)
+        i += 1
+
+    if opts.headers is None:
+        opts.headers = len(opts.files) > 1
+    return opts
+
+
+def _interval(value):
+    try:
+        return max(float(value), 0.01)
+    except ValueError:
+        raise ValueError(f"неверное число секунд: '{value}'")
+
+
+def _line_offset(f, size, count):
+    # Ищет начало последних count строк, читая файл с конца блоками.
+    # Перевод строки в самом конце файла завершает последнюю строку, а не
+    # начинает новую, поэтому он не считается
+    if count <= 0:
+        return size
+    pos = size
+    found = 0
+    last_block = True
+    while pos > 0:
+        step = min(BLOCK_SIZE, pos)
+        pos -= step
+        f.seek(pos)
+        block = f.read(step)
+        end = len(block)
+        if last_block:
+            last_block = False
+            if block.endswith(b"\n"):
+                end -= 1
+        while True:
+            end = block.rfind(b"\n", 0, end)
+            if end < 0:
+                break
+            found += 1
+            if found == count:
+                return pos + end + 1
+    return 0
+
+
+def _seekable_size(f):
+    st = os.fstat(f.fileno())
+    return st.st_size if stat.S_ISREG(st.st_mode) else None
+
+
+def read_tail(f, opts):
+    # Отдает байты хвоста файла частями; после исчерпания f стоит на конце
+    size = _seekable_size(f)
+    if size is None:
+        # Канал или устройство: назад не перемотать, держим только хвост
+        if opts.from_start:
+            skip = max(opts.count - 1, 0)
+            if opts.bytes:
+                f.read(skip)
+            else:
+                for _ in itertools.islice(f, skip):
+                    pass
+            yield from iter(lambda: f.read(BLOCK_SIZE), b"")
+        elif opts.bytes:
+            buf = bytearray()
+            for chunk in iter(lambda: f.read(BLOCK_SIZE), b""):
+                buf += chunk
+                del buf[:max(len(buf) - opts.count, 0)]
+            yield bytes(buf)
+        else:
+            yield from collections.deque(f, maxlen=opts.count)
+        return
+
+    if opts.bytes:
+        offset = min(opts.count - 1, size) if opts.from_start else max(size - opts.count, 0)
+        f.seek(max(offset, 0))
+    elif opts.from_start:
+        f.seek(0)
+        for _ in itertools.islice(f, max(opts.count - 1, 0)):
+            pass
+    else:
+        f.seek(_line_offset(f, size, opts.count))
+    yield from iter(lambda: f.read(BLOCK_SIZE), b"")
+
+
+def _split_lines(chunks):
+    tail = b""
+    for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8", "replace")
+    if tail:
+        yield UnterminatedLine(tail.decode("utf-8", "replace"))
+
+
+def _full_path(emu, filename):
+    return os.path.join(emu.current_dir, filename) if not os.path.isabs(filename) else filename
+
+
+def _error(filename, e):
+    if isinstance(e, IsADirectoryError):
+        return f"tail: ошибка чтения '{filename}': {reason(e)}"
+    if isinstance(e, (FileNotFoundError, PermissionError)):
+        return f"tail: невозможно открыть '{filename}' для чтения: {reason(e)}"
+    return f"tail: {filename}: {reason(e)}"
+
+
+def _stdin_tail(stdin, opts):
+    if opts.from_start:
+        return itertools.islice(stdin, max(opts.count - 1, 0), None)
+    if opts.bytes:
+        text = "\n".join(stdin)
+        return text[-opts.count:].split("\n") if opts.count else []
+    return collections.deque(stdin, maxlen=opts.count)
+
+
+def tail_stream(emu, args, stdin=None, status=None):
+    if status is None:
+        status = ExitStatus()
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"tail: {e}")
+        status.fail()
+        return
+
+    if not opts.files:
+        if stdin is None:
+            print("tail: требуется файл(ы)")
+            status.fail()
+            return
+        yield from _stdin_tail(stdin, opts)
+        return
+
+    for i, filename in enumerate(opts.files):
+        try:
+            with open(_full_path(emu, filename), "rb") as f:
+                if opts.headers:
+                    if i:
+                        yield ""
+                    yield f"==> {filename} <=="
+                yield from _split_lines(read_tail(f, opts))
+        except OSError as e:
+            print(_error(filename, e))
+            status.fail()
+
+
+class Followed:
+    def __init__(self, filename, path):
+        self.filename = filename
+        self.path = os.path.normpath(path)
+        self.file = None
+        self.key = None
+        self.decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    def open(self, f=None):
+        self.file = f or open(self.path, "rb")
+        st = os.fstat(self.file.fileno())
+        self.key = (st.st_dev, st.st_ino)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Follower:
+    # tail -f/-F: ждет событий inotify от директорий отслеживаемых файлов и
+    # дочитывает только изменившиеся; без inotify опрашивает файлы раз в interval
+    # секунд. В режиме name (-F) файл отслеживается по имени: после ротации
+    # (переименование, удаление, создание заново, усечение) tail переоткрывает
+    # его и продолжает с начала нового файла
+    def __init__(self, opts):
+        self.opts = opts
+        self.by_name = opts.follow == "name"
+        self.files = []
+        self.current = None
+        self.inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                from commands.statcache import Inotify
+                self.inotify = Inotify(max_watches=1024)
+            except (OSError, AttributeError):
+                self.inotify = None
+
+    def add(self, followed):
+        self.files.append(followed)
+        if self.inotify is not None:
+            self.inotify.watch(os.path.dirname(followed.path))
+
+    def write(self, followed, data, final=False):
+        text = followed.decoder.decode(data, final)
+        if not text:
+            return
+        if self.opts.headers and self.current is not followed:
+            sys.stdout.write(f"\n==> {followed.filename} <==\n")
+        self.current = followed
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def reopen(self, followed):
+        try:
+            st = os.stat(followed.path)
+        except OSError:
+            if followed.file is not None:
+                print(f"tail: '{followed.filename}' стал недоступен: Нет такого файла или директории")
+                self.drain(followed)
+                followed.close()
+            return
+        if followed.file is not None and (st.st_dev, st.st_ino) == followed.key:
+            return
+        try:
+            f = open(followed.path, "rb")
+        except OSError:
+            return
+        if followed.file is not None:
+            # Старый файл мог дописаться перед ротацией
+            self.drain(followed)
+            followed.close()
+            print(f"tail: '{followed.filename}' был заменен; следуем за концом нового файла")
+        else:
+            print(f"tail: '{followed.filename}' появился; следуем за концом нового файла")
+        followed.open(f)
+
+    def drain(self, followed):
+        f = followed.file
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if size < f.tell():
+                print(f"tail: {followed.filename}: файл усечен")
+                f.seek(0)
+            for chunk in iter(lambda: f.read(BLOCK_SIZE), b""):
+                self.write(followed, chunk)
+        except OSError:
+            pass
+
+    def check(self, followed):
+        if self.by_name:
+            self.reopen(followed)
+        if followed.file is not None:
+            self.drain(followed)
+
+    def wait(self):
+        # Возвращает множество изменившихся путей или None, если проверять все
+        if self.inotify is None:
+            time.sleep(self.opts.interval)
+            return None
+        import select
+        ready, _, _ = select.select([self.inotify.fd], [], [], self.opts.interval)
+        if not ready:
+            # Тайм-аут: страховочная проверка файлов, за которыми inotify
+            # не уследит (перенесены в другую директорию, ждут появления)
+            return None
+        changed = self.inotify.read()
+        return None if changed is None else set(changed)
+
+    def run(self):
+        try:
+            while any(followed.file is not None for followed in self.files) or self.opts.retry:
+                changed = self.wait()
+                for followed in self.files:
+                    if changed is None or followed.path in changed:
+                        self.check(followed)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for followed in self.files:
+                followed.close()
+            if self.inotify is not None:
+                self.inotify.close()
+
+
+def tail(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"tail: {e}")
+        return 1
+
+    if opts.follow is None or not opts.files:
+        status = ExitStatus()
+        emu.out.write_lines(tail_stream(emu, args, status=status))
+        return status.code()
+
+    # В режиме слежения файлы остаются открытыми после вывода хвоста, чтобы
+    # не потерять строки, дописанные между выводом и началом слежения
+    exit_code = 0
+    follower = Follower(opts)
+    for i, filename in enumerate(opts.files):
+        followed = Followed(filename, _full_path(emu, filename))
+        try:
+            followed.open()
+        except OSError as e:
+            print(_error(filename, e))
+            exit_code = 1
+            if opts.retry:
+                follower.add(followed)
+            continue
+        if opts.headers:
+            if i:
+                print()
+            print(f"==> {filename} <==")
+        emu.out.write_lines(_split_lines(read_tail(followed.file, opts)))
+        follower.current = followed
+        follower.add(followed)
+
+    if follower.files:
+        follower.run()
+    return exit_code
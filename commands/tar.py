@@ -0,0 +1,539 @@
+import fnmatch
+import os
+import stat
+import sys
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from commands.common import default_workers, reason
+from commands.walk import walk
+
+# Размер блока, который сжимается независимо: каждый блок становится
+# отдельным gzip-членом / потоком xz / кадром zstd, а их склейка остается
+# корректным сжатым файлом (как у pigz). Блок bzip2 равен его максимальному
+# блоку, поэтому степень сжатия не страдает.
+BLOCK_SIZES = {
+    "gz": 1024 * 1024,
+    "bz2": 900 * 1000,
+    "xz": 4 * 1024 * 1024,
+    "zst": 4 * 1024 * 1024,
+}
+# Уровни по умолчанию как у gzip, bzip2, xz и zstd
+LEVELS = {"gz": 6, "bz2": 9, "xz": 6, "zst": 3}
+MAGIC = (
+    (b"\x1f\x8b", "gz"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zst"),
+)
+# Сжатие по расширению архива для -a
+SUFFIXES = {
+    ".tgz": "gz", ".gz": "gz", ".taz": "gz",
+    ".tbz": "bz2", ".tbz2": "bz2", ".bz2": "bz2",
+    ".txz": "xz", ".xz": "xz",
+    ".tzst": "zst", ".zst": "zst",
+}
+GLOB_CHARS = "*?["
+
+
+class TarOptions:
+    def __init__(self):
+        self.mode = None
+        self.archive = None
+        self.compression = None
+        self.auto_compress = False
+        self.verbose = False
+        self.excludes = []
+        self.workers = default_workers()
+        # Для -c: пары (директория -C или None, имя); для -x/-t: имена членов
+        self.sources = []
+        self.directory = None
+
+
+MODES = {"c": "create", "x": "extract", "t": "list"}
+COMPRESSION_FLAGS = {"z": "gz", "j": "bz2", "J": "xz"}
+LONG_FLAGS = {
+    "--create": ("mode", "create"),
+    "--extract": ("mode", "extract"),
+    "--get": ("mode", "extract"),
+    "--list": ("mode", "list"),
+    "--gzip": ("compression", "gz"),
+    "--gunzip": ("compression", "gz"),
+    "--bzip2": ("compression", "bz2"),
+    "--xz": ("compression", "xz"),
+    "--zstd": ("compression", "zst"),
+    "--verbose": ("verbose", True),
+    "--auto-compress": ("auto_compress", True),
+}
+# Длинные ключи с аргументом: --file=a.tar или --file a.tar
+VALUE_FLAGS = {"--file": "f", "--directory": "C", "--exclude": "exclude", "--jobs": "jobs"}
+
+
+def _set_mode(opts, mode):
+    if opts.mode is not None and opts.mode != mode:
+        raise ValueError("нельзя указывать более одного ключа из '-ctx'")
+    opts.mode = mode
+
+
+def _apply_value(opts, flag, value):
+    if flag == "f":
+        opts.archive = value
+    elif flag == "C":
+        opts.directory = value
+    elif flag == "exclude":
+        opts.excludes.append(value)
+    elif flag == "jobs":
+        if not value.isdigit() or int(value) < 1:
+            raise ValueError(f"неверное число потоков: '{value}'")
+        opts.workers = int(value)
+
+
+def _apply_flag(opts, flag):
+    if flag in MODES:
+        _set_mode(opts, MODES[flag])
+    elif flag in COMPRESSION_FLAGS:
+        opts.compression = COMPRESSION_FLAGS[flag]
+    elif flag == "v":
+        opts.verbose = True
+    elif flag == "a":
+        opts.auto_compress = True
+    else:
+        raise ValueError(f"неверный ключ -- '{flag}'")
+
+
+def parse_args(args):
+    opts = TarOptions()
+    args = list(args)
+    # Старый стиль: первый аргумент без '-' - это набор ключей (tar czf ...),
+    # а значения ключей f и C берутся из следующих аргументов по порядку
+    if args and not args[0].startswith("-"):
+        bundle = args.pop(0)
+        values = []
+        for flag in bundle:
+            if flag in ("f", "C"):
+                values.append(flag)
+            else:
+                _apply_flag(opts, flag)
+        for flag in values:
+            if not args:
+                raise ValueError(f"ключ требует аргумент -- '{flag}'")
+            _apply_value(opts, flag, args.pop(0))
+
+    only_names = False
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if only_names or not arg.startswith("-") or arg == "-":
+            opts.sources.append((opts.directory, arg))
+        elif arg == "--":
+            only_names = True
+        elif arg in LONG_FLAGS:
+            name, value = LONG_FLAGS[arg]
+            if name == "mode":
+                _set_mode(opts, value)
+            else:
+                setattr(opts, name, value)
+        elif arg.startswith("--"):
+            name, eq, value = arg.partition("=")
+            if name not in VALUE_FLAGS:
+                raise ValueError(f"нераспознанный ключ '{arg}'")
+            if not eq:
+                if i >= len(args):
+                    raise ValueError(f"ключ '{name}' требует аргумент")
+                value = args[i]
+                i += 1
+            _apply_value(opts, VALUE_FLAGS[name], value)
+        else:
+            bundle = arg[1:]
+            for pos, flag in enumerate(bundle):
+                if flag in ("f", "C"):
+                    # -fa.tar или -f a.tar
+                    value = bundle[pos + 1:]
+                    if not value:
+                        if i >= len(args):
+                            raise ValueError(f"ключ требует аргумент -- '{flag}'")
+                        value = args[i]
+                        i += 1
+                    _apply_value(opts, flag, value)
+                    break
+                _apply_flag(opts, flag)
+
+    if opts.mode is None:
+        raise ValueError("требуется один из ключей '-ctx'")
+    if opts.compression == "zst":
+        _load_zstd()
+    if opts.archive is None:
+        # Как GNU tar без TAPE: архив читается из stdin и пишется в stdout
+        opts.archive = "-"
+    if opts.mode == "create":
+        if not opts.sources:
+            raise ValueError("отказ создавать пустой архив")
+        if opts.compression is None and opts.auto_compress:
+            opts.compression = SUFFIXES.get(os.path.splitext(opts.archive)[1])
+    return opts
+
+
+def _load_zstd():
+    # zstd есть в стандартной библиотеке с Python 3.14, раньше - пакет zstandard
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ValueError("сжатие zstd недоступно: требуется модуль zstandard")
+
+
+def block_compressor(compression, level=None):
+    level = LEVELS[compression] if level is None else level
+    if compression == "gz":
+        import zlib
+
+        def compress(data):
+            # wbits=31: отдельный gzip-член с заголовком и CRC
+            c = zlib.compressobj(level, zlib.DEFLATED, 31)
+            return c.compress(data) + c.flush()
+        return compress
+    if compression == "bz2":
+        import bz2
+        return lambda data: bz2.compress(data, level)
+    if compression == "xz":
+        import lzma
+        return lambda data: lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+    zstd = _load_zstd()
+    if zstd.__name__ == "zstandard":
+        # zstandard: компрессор не потокобезопасен, поэтому свой на каждый блок
+        return lambda data: zstd.ZstdCompressor(level=level).compress(data)
+    return lambda data: zstd.compress(data, level=level)
+
+
+# Файлоподобный объект для tarfile: буферизует запись, режет ее на блоки
+# и сжимает их в пуле потоков (zlib, bz2, lzma и zstd отпускают GIL),
+# а в выходной файл пишет строго по порядку блоков.
+class ParallelWriter:
+    def __init__(self, raw, compression, workers):
+        self.raw = raw
+        self.compress = block_compressor(compression)
+        self.block_size = BLOCK_SIZES[compression]
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.buffer = bytearray()
+        self.window = deque()
+        self.blocks = 0
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[:self.block_size])
+            del self.buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block):
+        self.blocks += 1
+        if self.pool is None:
+            self.raw.write(self.compress(block))
+            return
+        self.window.append(self.pool.submit(self.compress, block))
+        while len(self.window) > self.workers * 2:
+            self.raw.write(self.window.popleft().result())
+
+    def close(self):
+        if self.buffer or not self.blocks:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.window:
+            self.raw.write(self.window.popleft().result())
+        if self.pool is not None:
+            self.pool.shutdown()
+        self.raw.flush()
+
+    def abort(self):
+        for future in self.window:
+            future.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def detect_compression(raw):
+    head = raw.peek(8)[:8] if hasattr(raw, "peek") else b""
+    for magic, compression in MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_reader(raw, compression):
+    if compression is None:
+        compression = detect_compression(raw)
+    if compression == "gz":
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if compression == "bz2":
+        import bz2
+        return bz2.BZ2File(raw)
+    if compression == "xz":
+        import lzma
+        return lzma.LZMAFile(raw)
+    if compression == "zst":
+        zstd = _load_zstd()
+        if zstd.__name__ == "zstandard":
+            return zstd.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        return zstd.ZstdFile(raw)
+    return raw
+
+
+def excluded(name, patterns):
+    # Как в GNU tar: шаблон сравнивается с полным именем и с каждым хвостом пути
+    name = name.rstrip("/")
+    parts = name.split("/")
+    for pattern in patterns:
+        for i in range(len(parts)):
+            if fnmatch.fnmatchcase("/".join(parts[i:]), pattern.rstrip("/")):
+                return True
+    return False
+
+
+# Отбор членов архива по именам из командной строки: имя директории выбирает
+# и все ее содержимое, шаблоны с *?[ сравниваются через fnmatch
+class MemberFilter:
+    def __init__(self, names):
+        self.names = [name.rstrip("/") or name for name in names]
+        self.matched = set()
+
+    def __call__(self, member_name):
+        if not self.names:
+            return True
+        for name in self.names:
+            if any(c in name for c in GLOB_CHARS):
+                hit = fnmatch.fnmatchcase(member_name, name)
+            else:
+                hit = member_name == name or member_name.startswith(name + "/")
+            if hit:
+                self.matched.add(name)
+                return True
+        return False
+
+    def missing(self):
+        return [name for name in self.names if name not in self.matched]
+
+
+def _display_name(member):
+    return member.name + "/" if member.isdir() else member.name
+
+
+def format_member(member):
+    kind = "h" if member.islnk() else ""
+    mode = stat.filemode(member.mode | _type_bits(member))
+    if kind:
+        mode = kind + mode[1:]
+    owner = f"{member.uname or member.uid}/{member.gname or member.gid}"
+    size = str(member.size)
+    # Поле "владелец размер" выравнивается до 19 символов, как в GNU tar
+    size = size.rjust(max(len(size), 19 - len(owner) - 1))
+    mtime = time.strftime("%Y-%m-%d %H:%M", time.localtime(member.mtime))
+    line = f"{mode} {owner} {size} {mtime} {_display_name(member)}"
+    if member.issym():
+        line += f" -> {member.linkname}"
+    elif member.islnk():
+        line += f" ссылка на {member.linkname}"
+    return line
+
+
+def _type_bits(member):
+    if member.isdir():
+        return stat.S_IFDIR
+    if member.issym():
+        return stat.S_IFLNK
+    if member.ischr():
+        return stat.S_IFCHR
+    if member.isblk():
+        return stat.S_IFBLK
+    if member.isfifo():
+        return stat.S_IFIFO
+    return stat.S_IFREG
+
+
+class TarJob:
+    def __init__(self, emu, opts):
+        self.emu = emu
+        self.opts = opts
+        self.errors = 0
+        # При записи архива в stdout подробный вывод и ошибки уходят в stderr,
+        # чтобы не испортить архив
+        self.log = sys.stderr if opts.mode == "create" and opts.archive == "-" else sys.stdout
+
+    def error(self, message):
+        print(f"tar: {message}", file=self.log)
+        self.errors += 1
+
+    def resolve(self, path):
+        return os.path.join(self.emu.current_dir, path) if not os.path.isabs(path) else path
+
+    def create(self):
+        opts = self.opts
+        if opts.archive == "-":
+            sys.stdout.flush()
+            # Вывод стадии конвейера, которая не читает поток, собирается в
+            # памяти как текст; двоичному архиву там места нет
+            raw = getattr(sys.stdout, "buffer", None)
+            if raw is None:
+                self.error("архив нельзя вывести в конвейер встроенной команды; укажите файл в -f")
+                return
+        else:
+            raw = open(self.resolve(opts.archive), "wb")
+        writer = ParallelWriter(raw, opts.compression, opts.workers) if opts.compression else raw
+        archive_path = None if opts.archive == "-" else os.path.realpath(self.resolve(opts.archive))
+        stripped = False
+        try:
+            with tarfile.open(fileobj=writer, mode="w|", format=tarfile.GNU_FORMAT) as tarf:
+                for directory, name in opts.sources:
+                    base = self.resolve(directory) if directory else self.emu.current_dir
+                    full_path = os.path.join(base, name)
+                    arcname = os.path.normpath(name)
+                    if arcname.startswith("/"):
+                        if not stripped:
+                            print("tar: Удаляется начальный '/' из имен членов", file=sys.stderr)
+                            stripped = True
+                        arcname = arcname.lstrip("/") or "."
+                    self.add_tree(tarf, full_path, arcname, archive_path)
+            if writer is not raw:
+                writer.close()
+        except BaseException:
+            if writer is not raw:
+                writer.abort()
+            raise
+        finally:
+            if opts.archive == "-":
+                raw.flush()
+            else:
+                raw.close()
+
+    def add_tree(self, tarf, full_path, arcname, archive_path):
+        opts = self.opts
+        prefix_len = len(full_path.rstrip("/")) + 1
+
+        def prune(entry, depth):
+            return depth > 0 and excluded(self.member_name(entry, arcname, prefix_len), opts.excludes)
+
+        def onerror(e):
+            self.error(f"{e.filename}: Невозможно открыть: {reason(e)}")
+
+        try:
+            for entry, depth in walk(full_path, follow_top=False, prune=prune, onerror=onerror, sort=True,
+                                     workers=opts.workers):
+                name = self.member_name(entry, arcname, prefix_len) if depth else arcname
+                if opts.excludes and excluded(name, opts.excludes):
+                    continue
+                if archive_path is not None and os.path.realpath(entry.path) == archive_path:
+                    print(f"tar: {name}: файл является архивом; не сохраняется", file=sys.stderr)
+                    continue
+                self.add_entry(tarf, entry.path, name)
+        except OSError as e:
+            self.error(f"{arcname}: Невозможно выполнить stat: {reason(e)}")
+
+    @staticmethod
+    def member_name(entry, arcname, prefix_len):
+        rest = entry.path[prefix_len:]
+        return f"{arcname}/{rest}" if arcname != "." else rest
+
+    def add_entry(self, tarf, path, name):
+        try:
+            info = tarf.gettarinfo(path, arcname=name)
+        except OSError as e:
+            self.error(f"{name}: Невозможно выполнить stat: {reason(e)}")
+            return
+        if info is None:
+            # Сокеты и прочие файлы, которые нельзя сохранить
+            print(f"tar: {name}: сокет пропущен", file=sys.stderr)
+            return
+        if self.opts.verbose:
+            print(_display_name(info), file=self.log)
+        if info.isreg():
+            try:
+                with open(path, "rb") as f:
+                    tarf.addfile(info, f)
+            except OSError as e:
+                self.error(f"{name}: Невозможно открыть: {reason(e)}")
+        else:
+            tarf.addfile(info)
+
+    def open_archive(self):
+        opts = self.opts
+        if opts.archive == "-":
+            raw = sys.stdin.buffer
+        else:
+            raw = open(self.resolve(opts.archive), "rb")
+        return raw, open_reader(raw, opts.compression)
+
+    def members(self, tarf, member_filter):
+        for member in tarf:
+            if self.opts.excludes and excluded(member.name, self.opts.excludes):
+                continue
+            if member_filter(member.name):
+                yield member
+
+    def read(self):
+        opts = self.opts
+        member_filter = MemberFilter([name for _, name in opts.sources])
+        raw, reader = self.open_archive()
+        try:
+            # Потоковый режим r|: архив читается один раз от начала до конца,
+            # без перемотки, поэтому подходит и для stdin, и для сжатых данных
+            with tarfile.open(fileobj=reader, mode="r|") as tarf:
+                if opts.mode == "list":
+                    for member in self.members(tarf, member_filter):
+                        print(format_member(member) if opts.verbose else _display_name(member))
+                else:
+                    destination = self.resolve(opts.directory) if opts.directory else self.emu.current_dir
+                    self.extract(tarf, self.members(tarf, member_filter), destination)
+        finally:
+            if reader is not raw:
+                reader.close()
+            if raw is not sys.stdin.buffer:
+                raw.close()
+        for name in member_filter.missing():
+            self.error(f"{name}: Не найден в архиве")
+
+    def extract(self, tarf, members, destination):
+        def logged():
+            for member in members:
+                if self.opts.verbose:
+                    print(_display_name(member))
+                yield member
+
+        kwargs = {}
+        if hasattr(tarfile, "tar_filter"):
+            # Фильтр "tar" отбрасывает начальный '/' и не дает писать за пределы destination
+            kwargs["filter"] = "tar"
+        tarf.extractall(destination, members=logged(), **kwargs)
+
+
+def tar(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"tar: {e}")
+        return 2
+
+    job = TarJob(emu, opts)
+    try:
+        if opts.mode == "create":
+            job.create()
+        else:
+            job.read()
+    except OSError as e:
+        job.error(f"{e.filename or opts.archive}: {reason(e)}")
+    except (tarfile.TarError, EOFError, ValueError) as e:
+        job.error(f"ошибка: {e}")
+
+    if job.errors:
+        print("tar: Выход с состоянием неисправности из-за предыдущих ошибок", file=job.log)
+        return 2
+    return 0
@@ -0,0 +1,342 @@
+import fnmatch
+import os
+import shutil
+import stat
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from commands.common import default_workers
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UnzipOptions:
+    def __init__(self):
+        self.list = False
+        self.test = False
+        self.overwrite = None
+        self.quiet = False
+        self.workers = default_workers()
+        self.archive = None
+        self.directory = None
+        self.patterns = []
+        self.excludes = []
+
+
+def parse_args(args):
+    opts = UnzipOptions()
+    excluding = False
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == "-d":
+            if i >= len(args):
+                raise ValueError("требуется путь после -d")
+            opts.directory = args[i]
+            i += 1
+        elif arg == "-x":
+            # Все имена после -x - исключения
+            excluding = True
+        elif arg.startswith("--jobs="):
+            value = arg.split("=", 1)[1]
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"неверное число потоков: '{value}'")
+            opts.workers = int(value)
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        elif arg.startswith("-") and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag == "l":
+                    opts.list = True
+                elif flag == "t":
+                    opts.test = True
+                elif flag == "o":
+                    opts.overwrite = True
+                elif flag == "n":
+                    opts.overwrite = False
+                elif flag == "q":
+                    opts.quiet = True
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+        elif opts.archive is None:
+            opts.archive = arg
+        elif excluding:
+            opts.excludes.append(arg)
+        else:
+            opts.patterns.append(arg)
+    if opts.archive is None:
+        raise ValueError("требуется архив")
+    return opts
+
+
+def safe_name(name):
+    # Как Info-ZIP: начальный '/' и компоненты '..' отбрасываются, чтобы
+    # член архива не мог записаться за пределы директории распаковки
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "/".join(parts)
+
+
+def _unix_mode(info):
+    return info.external_attr >> 16 if info.create_system == 3 else 0
+
+
+def _date(info):
+    year, month, day, hour, minute, _ = info.date_time
+    return f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}"
+
+
+def _mtime(info):
+    return time.mktime(info.date_time + (0, 0, -1))
+
+
+def _ask(prompt):
+    try:
+        answer = input(f"{prompt} [y]да, [n]нет, [A]все, [N]ни одного: ")
+    except EOFError:
+        return "N"
+    answer = answer.strip()
+    if answer in ("A", "N"):
+        return answer
+    return "y" if answer.lower() in ("y", "yes", "д", "да") else "n"
+
+
+def extract_member(zf, info, target):
+    # Выполняется в пуле: родительские директории уже созданы, поэтому
+    # потокам остается только распаковать данные и восстановить атрибуты
+    with zf.open(info) as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    mode = _unix_mode(info) & 0o777
+    if mode:
+        os.chmod(target, mode)
+    mtime = _mtime(info)
+    os.utime(target, (mtime, mtime))
+
+
+def test_member(zf, info):
+    # Чтение до конца: ZipExtFile сам сверяет CRC-32 в конце данных
+    try:
+        with zf.open(info) as src:
+            while src.read(CHUNK_SIZE):
+                pass
+    except (zipfile.BadZipFile, EOFError, OSError, NotImplementedError, RuntimeError) as e:
+        return str(e)
+    return None
+
+
+class UnzipJob:
+    def __init__(self, emu, opts):
+        self.emu = emu
+        self.opts = opts
+        self.errors = 0
+        self.warnings = 0
+        self.matched = set()
+        self.overwrite = opts.overwrite
+
+    def resolve(self, path):
+        return os.path.join(self.emu.current_dir, path) if not os.path.isabs(path) else path
+
+    def say(self, line):
+        if not self.opts.quiet:
+            print(line)
+
+    def selected(self, infos):
+        opts = self.opts
+        for info in infos:
+            if opts.excludes and any(fnmatch.fnmatchcase(info.filename, p) for p in opts.excludes):
+                continue
+            if opts.patterns:
+                hits = [p for p in opts.patterns if fnmatch.fnmatchcase(info.filename, p)]
+                if not hits:
+                    continue
+                self.matched.update(hits)
+            yield info
+
+    def unmatched(self):
+        missing = [p for p in self.opts.patterns if p not in self.matched]
+        for pattern in missing:
+            print(f"caution: имя не найдено:  {pattern}")
+        return bool(missing)
+
+    def ordered(self, pool, func, items):
+        # Работа идет в пуле, а результаты отдаются в порядке архива
+        window = deque()
+        for item in items:
+            window.append((item, pool.submit(func, *item) if pool is not None else None))
+            while len(window) > self.opts.workers * 4:
+                item, future = window.popleft()
+                yield item, future.result() if future is not None else func(*item)
+        while window:
+            item, future = window.popleft()
+            yield item, future.result() if future is not None else func(*item)
+
+    def pool(self):
+        return ThreadPoolExecutor(max_workers=self.opts.workers) if self.opts.workers > 1 else None
+
+    def list(self, zf):
+        # Только центральный каталог: данные членов не читаются
+        print("  Length      Date    Time    Name")
+        print("---------  ---------- -----   ----")
+        total = count = 0
+        for info in self.selected(zf.infolist()):
+            print(f"{info.file_size:>9}  {_date(info)}   {info.filename}")
+            total += info.file_size
+            count += 1
+        print("---------                     -------")
+        print(f"{total:>9}                     {count} file{'s' if count != 1 else ''}")
+
+    def test(self, zf):
+        pool = self.pool()
+        try:
+            for (_, info), message in self.ordered(pool, test_member, ((zf, info) for info in self.selected(zf.infolist()))):
+                if message is None:
+                    self.say(f"    testing: {info.filename:<22}   OK")
+                else:
+                    print(f"    testing: {info.filename:<22}   ошибка: {message}")
+                    self.errors += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if self.errors:
+            print(f"В {self.opts.archive} обнаружено ошибок: {self.errors}.")
+        else:
+            print(f"Ошибок в сжатых данных {self.opts.archive} не обнаружено.")
+
+    def plan(self, zf, destination):
+        # Последовательная часть: безопасные пути, вопросы о перезаписи и
+        # создание директорий; возвращает списки директорий, файлов и ссылок
+        dirs, files, links = [], [], []
+        parents = set()
+        for info in self.selected(zf.infolist()):
+            name = safe_name(info.filename)
+            if name != info.filename.rstrip("/") and name != info.filename:
+                print(f"warning:  пропущены небезопасные компоненты пути в {info.filename}")
+                self.warnings += 1
+            if not name:
+                continue
+            target = os.path.join(destination, name)
+            # В сообщениях путь показывается так, как его задал пользователь
+            shown = os.path.join(self.opts.directory, name) if self.opts.directory else name
+            if info.is_dir():
+                dirs.append((info, target, shown, os.path.isdir(target)))
+                parents.add(target)
+                continue
+            if os.path.lexists(target) and not self.replace(shown):
+                continue
+            parents.add(os.path.dirname(target))
+            if stat.S_ISLNK(_unix_mode(info)):
+                links.append((info, target, shown))
+            else:
+                files.append((info, target, shown))
+
+        for path in sorted(parents):
+            try:
+                os.makedirs(path, exist_ok=True)
+            except OSError as e:
+                print(f"checkdir error: невозможно создать {path}: {e.strerror}")
+                self.errors += 1
+        return dirs, files, links
+
+    def replace(self, target):
+        if self.overwrite is not None:
+            return self.overwrite
+        answer = _ask(f"заменить {target}?")
+        if answer in ("A", "N"):
+            self.overwrite = answer == "A"
+            return self.overwrite
+        return answer == "y"
+
+    def extract(self, zf, destination):
+        dirs, files, links = self.plan(zf, destination)
+        for info, target, shown, existed in dirs:
+            if not existed:
+                self.say(f"   creating: {shown}/")
+
+        def run(info, target, shown):
+            try:
+                if os.path.lexists(target) and not os.path.isdir(target):
+                    os.unlink(target)
+                extract_member(zf, info, target)
+            except (OSError, zipfile.BadZipFile, EOFError, NotImplementedError, RuntimeError) as e:
+                return e
+            return None
+
+        pool = self.pool()
+        try:
+            for (info, target, shown), error in self.ordered(pool, run, files):
+                if error is not None:
+                    print(f"error:  {shown}: {getattr(error, 'strerror', None) or error}")
+                    self.errors += 1
+                else:
+                    verb = "  inflating" if info.compress_type != zipfile.ZIP_STORED else " extracting"
+                    self.say(f"{verb}: {shown}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # Ссылки создаются после всех файлов: иначе ссылка из архива могла бы
+        # перенаправить запись следующего члена за пределы destination
+        for info, target, shown in links:
+            try:
+                if os.path.lexists(target):
+                    os.unlink(target)
+                os.symlink(zf.read(info).decode("utf-8", "surrogateescape"), target)
+            except OSError as e:
+                print(f"error:  {shown}: {e.strerror}")
+                self.errors += 1
+                continue
+            self.say(f"    linking: {shown}")
+
+        # Время директорий восстанавливается в конце: запись файлов его меняет
+        for info, target, _, _ in reversed(dirs):
+            mode = _unix_mode(info) & 0o777
+            try:
+                if mode:
+                    os.chmod(target, mode)
+                mtime = _mtime(info)
+                os.utime(target, (mtime, mtime))
+            except OSError:
+                pass
+
+    def run(self):
+        opts = self.opts
+        with zipfile.ZipFile(self.resolve(opts.archive)) as zf:
+            if opts.list:
+                print(f"Archive:  {opts.archive}")
+                self.list(zf)
+            elif opts.test:
+                self.say(f"Archive:  {opts.archive}")
+                self.test(zf)
+            else:
+                self.say(f"Archive:  {opts.archive}")
+                destination = self.resolve(opts.directory) if opts.directory else self.emu.current_dir
+                self.extract(zf, destination)
+
+
+def unzip(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"unzip: {e}")
+        return 10
+
+    job = UnzipJob(emu, opts)
+    try:
+        job.run()
+    except FileNotFoundError:
+        print(f"unzip:  не удается найти или открыть {opts.archive}")
+        return 9
+    except zipfile.BadZipFile as e:
+        print(f"unzip: {opts.archive}: архив поврежден: {e}")
+        return 3
+    except OSError as e:
+        print(f"unzip: {opts.archive}: {e.strerror or e}")
+        return 9
+
+    if job.unmatched():
+        return 11
+    if job.errors:
+        return 2
+    return 1 if job.warnings else 0
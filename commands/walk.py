@@ -0,0 +1,166 @@
+import os
+import stat
+
+# Сколько листингов директорий можно запросить у пула заранее
+PREFETCH_PER_WORKER = 8
+
+
+# Аналог os.DirEntry для корня обхода: os.scandir отдает DirEntry только
+# для содержимого директории, а корень тоже должен выглядеть как запись
+class PathEntry:
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path)) or path
+        self._stat = None
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = os.lstat(self.path)
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def inode(self):
+        return self.stat(follow_symlinks=False).st_ino
+
+    def is_symlink(self):
+        try:
+            return stat.S_ISLNK(self.stat(follow_symlinks=False).st_mode)
+        except OSError:
+            return False
+
+    def is_dir(self, follow_symlinks=True):
+        try:
+            return stat.S_ISDIR(self.stat(follow_symlinks=follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_file(self, follow_symlinks=True):
+        try:
+            return stat.S_ISREG(self.stat(follow_symlinks=follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return f"<PathEntry {self.path!r}>"
+
+
+def scan(path, sort=False):
+    with os.scandir(path) as it:
+        entries = list(it)
+    if sort:
+        entries.sort(key=lambda entry: entry.name)
+    return entries
+
+
+# Обход дерева в прямом порядке (директория раньше своего содержимого).
+# Возвращает пары (запись, глубина); корень имеет глубину 0 и отдается как
+# PathEntry, остальные записи - os.DirEntry с кэшированным типом и stat.
+# prune(запись, глубина) -> True запрещает спуск в директорию. При workers > 1
+# листинги поддиректорий запрашиваются у пула потоков заранее, а порядок
+# выдачи остается таким же, как при последовательном обходе.
+def walk(top, max_depth=None, min_depth=0, follow_symlinks=False, follow_top=True,
+         prune=None, onerror=None, sort=False, workers=0):
+    root = PathEntry(top)
+    # Ошибка доступа к самому корню - это ошибка команды, а не обхода
+    root.stat(follow_symlinks=follow_top)
+
+    if min_depth <= 0:
+        yield root, 0
+    if (max_depth is not None and max_depth <= 0) or not root.is_dir(follow_symlinks=follow_top):
+        return
+    if prune is not None and prune(root, 0):
+        return
+
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    visited = set()
+    if follow_symlinks:
+        st = root.stat()
+        visited.add((st.st_dev, st.st_ino))
+
+    def descend(entry, depth):
+        if max_depth is not None and depth >= max_depth:
+            return False
+        try:
+            if not entry.is_dir(follow_symlinks=follow_symlinks):
+                return False
+        except OSError:
+            return False
+        if follow_symlinks and entry.is_symlink():
+            # Защита от циклов из символических ссылок
+            st = entry.stat()
+            key = (st.st_dev, st.st_ino)
+            if key in visited:
+                return False
+            visited.add(key)
+        return True
+
+    def prefetch(entries, depth):
+        if pool is None:
+            return
+        for entry in entries:
+            if len(pending) >= workers * PREFETCH_PER_WORKER:
+                return
+            if entry.path not in pending and (max_depth is None or depth < max_depth):
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        pending[entry.path] = pool.submit(scan, entry.path, sort)
+                except OSError:
+                    pass
+
+    def listing(path, depth):
+        future = pending.pop(path, None)
+        entries = future.result() if future is not None else scan(path, sort)
+        prefetch(entries, depth)
+        return entries
+
+    try:
+        try:
+            stack = [(iter(listing(root.path, 1)), 1)]
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            return
+
+        while stack:
+            entries, depth = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+
+            if depth >= min_depth:
+                yield entry, depth
+            if not descend(entry, depth):
+                continue
+            if prune is not None and prune(entry, depth):
+                continue
+            try:
+                stack.append((iter(listing(entry.path, depth + 1)), depth + 1))
+            except OSError as e:
+                if onerror is not None:
+                    onerror(e)
+    finally:
+        if pool is not None:
+            for future in pending.values():
+                future.cancel()
+            pool.shutdown(wait=False)
+
+
+def iter_files(top, **kwargs):
+    for entry, depth in walk(top, **kwargs):
+        try:
+            if entry.is_file(follow_symlinks=False):
+                yield entry
+        except OSError:
+            pass
@@ -0,0 +1,193 @@
+import codecs
+import os
+import stat
+
+from commands import ExitStatus, UnterminatedLine
+from commands.common import ordered_map, reason
+
+CHUNK_SIZE = 1024 * 1024
+
+# Для подсчета слов байты сводятся к двум классам: пробельные -> b" ",
+# остальные -> b"x"; начало слова - это пара b" x"
+WHITESPACE = b" \t\n\r\v\f"
+WORD_CLASSES = bytes(0x20 if b in WHITESPACE else 0x78 for b in range(256))
+# Байты продолжения UTF-8 (10xxxxxx) не начинают новый символ
+CONTINUATION = bytes(range(0x80, 0xC0))
+
+FLAGS = {"l": "lines", "w": "words", "m": "chars", "c": "bytes", "L": "max_line_length"}
+LONG_FLAGS = {
+    "--lines": "lines",
+    "--words": "words",
+    "--chars": "chars",
+    "--bytes": "bytes",
+    "--max-line-length": "max_line_length",
+}
+# Порядок колонок как в GNU wc
+COLUMNS = ("lines", "words", "chars", "bytes", "max_line_length")
+
+
+class Counts:
+    def __init__(self):
+        self.lines = 0
+        self.words = 0
+        self.chars = 0
+        self.bytes = 0
+        self.max_line_length = 0
+
+    def add(self, other):
+        self.lines += other.lines
+        self.words += other.words
+        self.chars += other.chars
+        self.bytes += other.bytes
+        self.max_line_length = max(self.max_line_length, other.max_line_length)
+
+
+def parse_args(args):
+    selected = set()
+    files = []
+    for arg in args:
+        if arg in LONG_FLAGS:
+            selected.add(LONG_FLAGS[arg])
+        elif arg.startswith("-") and len(arg) > 1 and not arg.startswith("--"):
+            for flag in arg[1:]:
+                if flag not in FLAGS:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+                selected.add(FLAGS[flag])
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            files.append(arg)
+    if not selected:
+        selected = {"lines", "words", "bytes"}
+    return [column for column in COLUMNS if column in selected], files
+
+
+def _line_width(line):
+    return len(line.expandtabs(8)) if "\t" in line else len(line)
+
+
+def count_file(path, columns):
+    counts = Counts()
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if stat.S_ISDIR(st.st_mode):
+            raise IsADirectoryError(path)
+        if columns == ["bytes"] and stat.S_ISREG(st.st_mode):
+            # Для обычного файла размер известен без чтения
+            counts.bytes = st.st_size
+            return counts
+
+        need_words = "words" in columns
+        need_chars = "chars" in columns
+        need_width = "max_line_length" in columns
+        decoder = codecs.getincrementaldecoder("utf-8")("replace") if need_width else None
+        in_space = True
+        width = 0
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            counts.bytes += len(chunk)
+            counts.lines += chunk.count(b"\n")
+            if need_words:
+                classes = chunk.translate(WORD_CLASSES)
+                counts.words += classes.count(b" x") + (in_space and classes[0] == 0x78)
+                in_space = classes[-1] == 0x20
+            if need_chars:
+                counts.chars += len(chunk.translate(None, CONTINUATION))
+            if need_width:
+                parts = decoder.decode(chunk).split("\n")
+                for part in parts[:-1]:
+                    counts.max_line_length = max(counts.max_line_length, width + _line_width(part))
+                    width = 0
+                width += _line_width(parts[-1])
+        if need_width:
+            counts.max_line_length = max(counts.max_line_length, width + _line_width(decoder.decode(b"", True)))
+    return counts
+
+
+def count_lines(lines):
+    counts = Counts()
+    line = None
+    for line in lines:
+        counts.lines += 1
+        counts.words += len(line.split())
+        counts.chars += len(line) + 1
+        counts.bytes += len(line.encode("utf-8", "surrogateescape")) + 1
+        counts.max_line_length = max(counts.max_line_length, _line_width(line))
+    if isinstance(line, UnterminatedLine):
+        # Строки в конвейере приходят без '\n'; у последней строки файла его
+        # могло и не быть, а wc считает именно переводы строки
+        counts.lines -= 1
+        counts.chars -= 1
+        counts.bytes -= 1
+    return counts
+
+
+def _collect(path, filename, columns):
+    try:
+        return filename, count_file(path, columns), None
+    except OSError as e:
+        return filename, None, f"wc: {filename}: {reason(e)}"
+
+
+def _number_width(paths):
+    # Как в GNU wc: ширина колонки по суммарному размеру обычных файлов,
+    # не меньше 7, если среди входов есть канал или устройство
+    minimum = 1
+    total = 0
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            total += st.st_size
+        else:
+            minimum = 7
+    return max(minimum, len(str(total)))
+
+
+def _format(counts, columns, width, name):
+    line = " ".join(f"{getattr(counts, column):>{width}}" for column in columns)
+    return f"{line} {name}" if name else line
+
+
+def wc_stream(emu, args, stdin=None, status=None):
+    if status is None:
+        status = ExitStatus()
+    try:
+        columns, files = parse_args(args)
+    except ValueError as e:
+        print(f"wc: {e}")
+        status.fail()
+        return
+
+    if not files:
+        if stdin is None:
+            print("wc: требуется файл(ы)")
+            status.fail()
+            return
+        width = 1 if len(columns) == 1 else 7
+        yield _format(count_lines(stdin), columns, width, "")
+        return
+
+    paths = [os.path.join(emu.current_dir, f) if not os.path.isabs(f) else f for f in files]
+    width = 1 if len(columns) == 1 and len(files) == 1 else _number_width(paths)
+    total = Counts()
+
+    # Файлы считаются параллельно, а выводятся в порядке аргументов
+    collect = lambda item: _collect(*item, columns)
+    for filename, counts, message in ordered_map(collect, zip(paths, files)):
+        if message:
+            print(message)
+            status.fail()
+            continue
+        total.add(counts)
+        yield _format(counts, columns, width, filename)
+
+    if len(files) > 1:
+        yield _format(total, columns, width, "итого")
+
+
+def wc(emu, args):
+    status = ExitStatus()
+    emu.out.write_lines(wc_stream(emu, args, status=status))
+    return status.code()
@@ -0,0 +1,369 @@
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from commands.common import default_workers
+from commands.walk import walk
+
+CHUNK_SIZE = 1024 * 1024
+# Сжатые данные копятся в памяти до этого размера, дальше - во временном файле
+SPOOL_SIZE = 8 * 1024 * 1024
+# По началу файла решаем, стоит ли его сжимать: если deflate уровня 1
+# не выигрывает хотя бы 5% на образце, файл сохраняется без сжатия
+SAMPLE_SIZE = 64 * 1024
+INCOMPRESSIBLE = 0.95
+# Уже сжатые форматы хранятся как есть (ZIP_STORED)
+STORED_SUFFIXES = {
+    ".zip", ".jar", ".apk", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub", ".whl",
+    ".gz", ".tgz", ".bz2", ".tbz", ".xz", ".txz", ".zst", ".lz4", ".7z", ".rar", ".z",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".ogg", ".opus", ".flac", ".aac", ".m4a",
+    ".mp4", ".mkv", ".avi", ".mov", ".webm",
+}
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+class ZipOptions:
+    def __init__(self):
+        self.level = 6
+        self.update = False
+        self.recursive = False
+        self.quiet = False
+        self.workers = default_workers()
+        self.archive = None
+        self.paths = []
+
+
+FLAGS = {"u": "update", "r": "recursive", "q": "quiet"}
+
+
+def parse_args(args):
+    opts = ZipOptions()
+    only_paths = False
+    for arg in args:
+        if only_paths or not arg.startswith("-") or arg == "-":
+            if opts.archive is None:
+                opts.archive = arg
+            else:
+                opts.paths.append(arg)
+        elif arg == "--":
+            only_paths = True
+        elif arg.startswith("--jobs="):
+            value = arg.split("=", 1)[1]
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"неверное число потоков: '{value}'")
+            opts.workers = int(value)
+        elif arg.startswith("--"):
+            raise ValueError(f"нераспознанный ключ '{arg}'")
+        else:
+            for flag in arg[1:]:
+                if flag.isdigit():
+                    opts.level = int(flag)
+                elif flag in FLAGS:
+                    setattr(opts, FLAGS[flag], True)
+                else:
+                    raise ValueError(f"неверный ключ -- '{flag}'")
+    if opts.archive is None:
+        raise ValueError("требуется архив и файлы")
+    if not os.path.splitext(opts.archive)[1]:
+        # Как Info-ZIP: без расширения к имени архива добавляется .zip
+        opts.archive += ".zip"
+    return opts
+
+
+def _copy_file(path, out):
+    with open(path, "rb") as f:
+        shutil.copyfileobj(f, out, CHUNK_SIZE)
+
+
+def _file_crc(path):
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+# Результат подготовки одного члена архива в пуле потоков
+class Encoded:
+    def __init__(self, info, data=None, source=None, action="adding"):
+        self.info = info
+        # data - сжатые байты (SpooledTemporaryFile); source - путь к файлу,
+        # который пишется как есть (ZIP_STORED)
+        self.data = data
+        self.source = source
+        self.action = action
+
+
+def encode(path, info, level, old=None):
+    # Выполняется в пуле: zlib отпускает GIL и на crc32, и на сжатии
+    if old is not None and old.file_size == info.file_size and old.CRC == _file_crc(path):
+        # Содержимое не изменилось, поменялось только время: данные берутся
+        # из старого архива без повторного сжатия
+        return Encoded(info, action="reuse")
+
+    store = level == 0 or info.file_size == 0 or os.path.splitext(info.filename)[1].lower() in STORED_SUFFIXES
+    crc = 0
+    size = 0
+    with open(path, "rb") as f:
+        head = f.read(SAMPLE_SIZE)
+        if not store and len(zlib.compress(head, 1)) > len(head) * INCOMPRESSIBLE:
+            store = True
+        if store:
+            crc = zlib.crc32(head)
+            size = len(head)
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+            data = None
+        else:
+            data = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            chunk = head
+            while chunk:
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                data.write(compressor.compress(chunk))
+                chunk = f.read(CHUNK_SIZE)
+            data.write(compressor.flush())
+
+    info.CRC = crc
+    info.file_size = size
+    if data is not None and data.tell() >= size:
+        # Сжатие не помогло: как Info-ZIP, сохраняем файл без сжатия
+        data.close()
+        data = None
+    if data is None:
+        info.compress_type = zipfile.ZIP_STORED
+        info.compress_size = size
+        return Encoded(info, source=path)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.compress_size = data.tell()
+    data.seek(0)
+    return Encoded(info, data=data)
+
+
+def _raw_member(fp, info, out):
+    # Копирует сжатые данные члена старого архива, не распаковывая их
+    fp.seek(info.header_offset)
+    header = LOCAL_HEADER.unpack(fp.read(LOCAL_HEADER.size))
+    fp.seek(header[9] + header[10], os.SEEK_CUR)
+    remaining = info.compress_size
+    while remaining:
+        chunk = fp.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"обрезанные данные члена {info.filename}")
+        out.write(chunk)
+        remaining -= len(chunk)
+
+
+def _fresh_info(info):
+    # Копия заголовка старого члена без extra-полей (zip64 пересчитывается)
+    fresh = zipfile.ZipInfo(info.filename, info.date_time)
+    for name in ("compress_type", "flag_bits", "CRC", "compress_size", "file_size", "external_attr", "create_system"):
+        setattr(fresh, name, getattr(info, name))
+    return fresh
+
+
+def write_member(zf, info, copy):
+    # Запись заранее сжатых данных: ZipFile умеет писать только сам, поэтому
+    # локальный заголовок строится через ZipInfo.FileHeader, а центральный
+    # каталог ZipFile допишет при закрытии
+    info.flag_bits &= ~0x08
+    info.header_offset = zf.fp.tell()
+    zf.fp.write(info.FileHeader(None))
+    copy(zf.fp)
+    zf.start_dir = zf.fp.tell()
+    zf.filelist.append(info)
+    zf.NameToInfo[info.filename] = info
+    zf._didModify = True
+
+
+def _dos_time(date_time):
+    # В zip время хранится с точностью до 2 секунд
+    return tuple(date_time[:5]) + (date_time[5] // 2 * 2,)
+
+
+def _percent(info):
+    if not info.file_size:
+        return 0
+    return max(0, round(100 - info.compress_size * 100 / info.file_size))
+
+
+class ZipJob:
+    def __init__(self, emu, opts):
+        self.emu = emu
+        self.opts = opts
+        self.archive_path = self.resolve(opts.archive)
+        self.old = None
+        self.old_members = {}
+        self.changed = 0
+
+    def resolve(self, path):
+        return os.path.join(self.emu.current_dir, path) if not os.path.isabs(path) else path
+
+    def collect(self):
+        # Пары (путь, имя в архиве) в порядке аргументов; директории
+        # добавляются рекурсивно, имена - от родителя директории. Как у
+        # Info-ZIP, символические ссылки разыменовываются, а каждая директория
+        # получает свой член "имя/", чтобы пустые директории пережили
+        # распаковку
+        real_archive = os.path.realpath(self.archive_path)
+        for name in self.opts.paths:
+            full_path = self.resolve(name)
+            if os.path.isdir(full_path):
+                parent = os.path.dirname(os.path.normpath(full_path))
+                for entry, depth in walk(full_path, follow_symlinks=True, sort=True):
+                    arcname = os.path.relpath(entry.path, start=parent).replace(os.sep, "/")
+                    if entry.is_dir():
+                        yield entry.path, arcname + "/"
+                    elif entry.is_file():
+                        # Сам архив не должен попасть внутрь себя
+                        if os.path.realpath(entry.path) != real_archive:
+                            yield entry.path, arcname
+                    else:
+                        print(f"zip warning: имя не найдено: {arcname}")
+            elif os.path.isfile(full_path):
+                if os.path.realpath(full_path) != real_archive:
+                    yield full_path, os.path.basename(full_path)
+            else:
+                print(f"zip warning: имя не найдено: {name}")
+
+    def plan(self, path, arcname):
+        # Возвращает (заголовок, старый член для повторного использования
+        # как есть, старый член для сравнения по CRC)
+        old = self.old_members.get(arcname)
+        info = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        if info.is_dir():
+            info.CRC = 0
+            # Директория уже есть в архиве - член остается как есть
+            return info, old if old is not None and old.is_dir() else None, None
+        if old is None or old.is_dir():
+            return info, None, None
+        mtime = _dos_time(info.date_time)
+        if self.opts.update and _dos_time(old.date_time) >= mtime:
+            # -u: член архива не старее файла - остается как есть
+            return info, old, None
+        if _dos_time(old.date_time) == mtime and old.file_size == info.file_size:
+            return info, old, None
+        return info, None, old
+
+    def run(self):
+        opts = self.opts
+        targets = {}
+        for path, arcname in self.collect():
+            targets.setdefault(arcname, path)
+        if not targets:
+            raise ValueError(f"нечего делать! ({opts.archive})")
+
+        if os.path.exists(self.archive_path):
+            self.old = zipfile.ZipFile(self.archive_path)
+            self.old_members = {info.filename: info for info in self.old.infolist()}
+        # Члены старого архива сохраняют свое место (в том числе
+        # переписанные), новые файлы дописываются после них
+        queue = [(targets.get(name), name) for name in self.old_members]
+        queue += [(path, name) for name, path in targets.items() if name not in self.old_members]
+
+        fd, temp_path = tempfile.mkstemp(prefix=".zip-", dir=os.path.dirname(self.archive_path))
+        pool = ThreadPoolExecutor(max_workers=opts.workers) if opts.workers > 1 else None
+        window = deque()
+        try:
+            with os.fdopen(fd, "wb") as out, zipfile.ZipFile(out, "w") as zf:
+                for path, arcname in queue:
+                    if path is None:
+                        result = Encoded(self.old_members[arcname], action="keep")
+                    else:
+                        info, reuse, candidate = self.plan(path, arcname)
+                        if reuse is not None:
+                            result = Encoded(reuse, action="keep")
+                        elif info.is_dir():
+                            result = Encoded(info)
+                        elif pool is not None:
+                            result = pool.submit(encode, path, info, opts.level, candidate)
+                        else:
+                            result = encode(path, info, opts.level, candidate)
+                    # Сжатие идет параллельно, а запись - в порядке очереди
+                    window.append((arcname, result))
+                    while len(window) > opts.workers * 2:
+                        self.emit(zf, *window.popleft())
+                while window:
+                    self.emit(zf, *window.popleft())
+        except BaseException:
+            for _, result in window:
+                if isinstance(result, Future):
+                    result.cancel()
+            os.unlink(temp_path)
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if self.old is not None:
+                self.old.close()
+
+        if self.old is not None and not self.changed:
+            # Ничего не изменилось: старый архив остается нетронутым
+            os.unlink(temp_path)
+            return
+        mode = os.stat(self.archive_path).st_mode if self.old is not None else 0o666 & ~_umask()
+        os.chmod(temp_path, mode & 0o7777)
+        os.replace(temp_path, self.archive_path)
+
+    def emit(self, zf, arcname, result):
+        encoded = result.result() if isinstance(result, Future) else result
+        info = encoded.info
+        if encoded.action in ("keep", "reuse"):
+            old = self.old_members[arcname]
+            fresh = _fresh_info(old)
+            if encoded.action == "reuse":
+                fresh.date_time = info.date_time
+                fresh.external_attr = info.external_attr
+            write_member(zf, fresh, lambda out: _raw_member(self.old.fp, old, out))
+            if encoded.action == "reuse":
+                self.changed += 1
+            return
+
+        if info.is_dir():
+            write_member(zf, info, lambda out: None)
+        elif encoded.data is not None:
+            with encoded.data:
+                write_member(zf, info, lambda out: shutil.copyfileobj(encoded.data, out, CHUNK_SIZE))
+        else:
+            write_member(zf, info, lambda out: _copy_file(encoded.source, out))
+        self.changed += 1
+        if not self.opts.quiet:
+            action = "updating" if arcname in self.old_members else "  adding"
+            method = "deflated" if info.compress_type == zipfile.ZIP_DEFLATED else "stored"
+            print(f"{action}: {arcname} ({method} {_percent(info)}%)")
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def zip(emu, args):
+    try:
+        opts = parse_args(args)
+    except ValueError as e:
+        print(f"zip: {e}")
+        return 16
+
+    job = ZipJob(emu, opts)
+    try:
+        job.run()
+    except ValueError as e:
+        print(f"zip error: {e}")
+        return 12
+    except zipfile.BadZipFile as e:
+        print(f"zip error: архив поврежден: {e}")
+        return 3
+    except OSError as e:
+        print(f"zip error: {e.filename or opts.archive}: {e.strerror or e}")
+        return 18
+    return 0
@@ -1,24 +1,21 @@
 import os
 import sys
-import subprocess
-import shutil
-from datetime import datetime
-import platform
-import getpass
-import glob
 import stat
-import time
-import zipfile
-import tarfile
-import hashlib
-import psutil  
-from pystyle import *
+import itertools
+from commands import CommandRegistry, ExitStatus, UnterminatedLine
+from commands.output import OutputSink
+from commands.shell import join, parse_line, split_words
+
+# Остальные модули (subprocess, shutil, datetime, platform, psutil, ...)
+# импортируются внутри команд, которым они нужны: запуск эмулятора
+# не должен платить за команды, которые в этой сессии не вызовут.
 
 class LinuxEmulator:
-    def __init__(self):
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else default_registry
         self.current_dir = os.getcwd()
-        self.user = getpass.getuser()
-        self.hostname = platform.node()
+        self.user = self._get_user()
+        self.hostname = self._get_hostname()
         self.home_dir = os.path.expanduser("~")
         self.env_vars = {
             "PATH": os.environ.get("PATH", ""),
@@ -31,69 +28,71 @@ class LinuxEmulator:
             "la": "ls -a",
             "l": "ls -la"
         }
-        self.history = []
         self.history_file = os.path.join(self.home_dir, ".python_wsl_history")
-        self.load_history()
+        self._history = None
+        self._stat_cache = None
+        # Весь вывод команд идет через общий буфер (см. commands/output.py)
+        self.out = OutputSink()
+        # Код возврата последней команды; в пакетном режиме (main.py -c,
+        # скрипт, stdin) нет приглашения, истории и подстановок !
+        self.status = 0
+        self.interactive = True
+        # Инструментирование (main.py --metrics / --profile), см. commands/metrics.py
+        self.metrics = None
+        self.profiler = None
 
-    def neofetch(self, args):
-        try:
-            
-            neofetch_file = os.path.join(os.path.dirname(__file__), "neofetch.txt")
-            
-            if os.path.exists(neofetch_file):
-                
-                with open(neofetch_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                    
-                    content = content.replace("{host}", platform.node())
-                    content = content.replace("{kernel}", platform.release())
-                    content = content.replace("{shell_version}", f"{sys.version_info.major}.{sys.version_info.minor}")
-                    content = content.replace("{cpu}", platform.processor())
-                    content = content.replace("{memory}", str(psutil.virtual_memory().total // (1024**3)))
-                    
-                    from pystyle import Colorate, Colors
-                    print(Colorate.Horizontal(Colors.red_to_white, content))
-            else:
-                
-                self._default_neofetch()
-        except Exception as e:
-            print(f"neofetch error: {str(e)}")
-            self._default_neofetch()
-    
-    def _default_neofetch(self):
-        
-        from pyfiglet import Figlet
-        from pystyle import Colors, Colorate
-        
-        f = Figlet(font='slant')
-        ascii_art = f.renderText('Python WSL')
-        
-        info = f"""
-    {Colorate.Horizontal(Colors.red_to_white, ascii_art)}
-    {Colorate.Horizontal(Colors.red_to_white, "══════════════════════════════════════════════════")}
-    
-    {Colorate.Horizontal(Colors.red_to_white, f"OS: Python WSL Emulator")}
-    {Colorate.Horizontal(Colors.red_to_white, f"Host: {platform.node()}")}
-    {Colorate.Horizontal(Colors.red_to_white, f"Kernel: {platform.release()}")}
-    {Colorate.Horizontal(Colors.red_to_white, f"Shell: Python WSL {sys.version_info.major}.{sys.version_info.minor}")}
-    {Colorate.Horizontal(Colors.red_to_white, f"CPU: {platform.processor()}")}
-    {Colorate.Horizontal(Colors.red_to_white, f"Memory: {psutil.virtual_memory().total // (1024**3)}GB")}
-    """
-        print(info)  
-        
-    def load_history(self):
+    @staticmethod
+    def _get_user():
+        for name in ("LOGNAME", "USER", "LNAME", "USERNAME"):
+            user = os.environ.get(name)
+            if user:
+                return user
+        import getpass
+        return getpass.getuser()
+
+    @staticmethod
+    def _get_hostname():
+        if hasattr(os, "uname"):
+            return os.uname().nodename
+        import platform
+        return platform.node()
+
+    @property
+    def history(self):
+        # Команды дописываются в файл сразу, а сам файл читается только
+        # когда история нужна (history, !prefix, Ctrl-R)
+        if self._history is None:
+            from commands.history import History
+            self._history = History(self.history_file)
+        return self._history
+
+    @property
+    def stat_cache(self):
+        # Общий для всех команд кэш stat; создается при первом обращении
+        if self._stat_cache is None:
+            from commands.statcache import StatCache
+            self._stat_cache = StatCache()
+        return self._stat_cache
+
+    def _is_dir(self, path):
         try:
-            with open(self.history_file, "r") as f:
-                self.history = [line.strip() for line in f.readlines()]
-        except FileNotFoundError:
-            pass
-            
-    def save_history(self):
-        with open(self.history_file, "w") as f:
-            for cmd in self.history[-1000:]:  
-                f.write(cmd + "\n")
-    
+            return stat.S_ISDIR(self.stat_cache.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def _invalidate(self, mutates, args):
+        if self._stat_cache is None:
+            return
+        if callable(mutates):
+            mutates = mutates(args)
+        if mutates == "all":
+            self._stat_cache.clear()
+        elif mutates:
+            for arg in args:
+                if not arg.startswith("-"):
+                    full_path = os.path.join(self.current_dir, arg) if not os.path.isabs(arg) else arg
+                    self._stat_cache.invalidate(full_path, recursive=True)
+
     def get_prompt(self):
         from pystyle import Colors, Colorate
         path = self.current_dir.replace(self.home_dir, "~") if self.current_dir.startswith(self.home_dir) else self.current_dir
@@ -101,127 +100,145 @@ class LinuxEmulator:
         return Colorate.Horizontal(Colors.red_to_white, prompt_text)
     
     def parse_command(self, cmd):
+        # Строка целиком: конвейеры, связанные через ; && ||. Возвращает код
+        # возврата последней выполненной команды
         if not cmd.strip():
-            return
-        
-        
-        for alias, expansion in self.aliases.items():
-            if cmd.split()[0] == alias:
-                cmd = expansion + cmd[len(alias):]
-        
-        
-        parts = cmd.split()
-        command = parts[0]
-        args = parts[1:]
-        
-        
-        self.history.append(cmd)
-        
-        
+            return self.status
+
+        if self.interactive and cmd.startswith("!"):
+            try:
+                expanded = self.history.expand(cmd)
+            except ValueError as e:
+                print(f"-bash: {e}")
+                self.status = 1
+                return self.status
+            if expanded != cmd:
+                print(expanded)
+                cmd = expanded
+
+        if self.interactive:
+            self.history.append(cmd)
+
         try:
-            if command == "cd":
-                self.cd(args)
-            elif command == "ls":
-                self.ls(args)
-            elif command == "pwd":
-                self.pwd()
-            elif command == "echo":
-                self.echo(args)
-            elif command == "cat":
-                self.cat(args)
-            elif command == "mkdir":
-                self.mkdir(args)
-            elif command == "rm":
-                self.rm(args)
-            elif command == "cp":
-                self.cp(args)
-            elif command == "mv":
-                self.mv(args)
-            elif command == "touch":
-                self.touch(args)
-            elif command == "grep":
-                self.grep(args)
-            elif command == "find":
-                self.find(args)
-            elif command == "chmod":
-                self.chmod(args)
-            elif command == "chown":
-                print("chown: изменение владельца не поддерживается в эмуляторе")
-            elif command == "ps":
-                self.ps()
-            elif command == "kill":
-                self.kill(args)
-            elif command == "df":
-                self.df()
-            elif command == "du":
-                self.du(args)
-            elif command == "uname":
-                self.uname(args)
-            elif command == "whoami":
-                self.whoami()
-            elif command == "date":
-                self.date()
-            elif command == "history":
-                self.show_history()
-            elif command == "clear":
-                self.clear()
-            elif command == "exit":
-                self.save_history()
-                print("Выход из Python WSL эмулятора")
-                sys.exit(0)
-            elif command == "help":
-                self.help()
-            elif command == "alias":
-                self.handle_alias(args)
-            elif command == "env":
-                self.show_env()
-            elif command == "export":
-                self.export_var(args)
-            elif command == "zip":
-                self.zip(args)
-            elif command == "unzip":
-                self.unzip(args)
-            elif command == "tar":
-                self.tar(args)
-            elif command == "md5sum":
-                self.md5sum(args)
-            elif command == "sha1sum":
-                self.sha1sum(args)
-            elif command == "head":
-                self.head(args)
-            elif command == "tail":
-                self.tail(args)
-            elif command == "diff":
-                self.diff(args)
-            elif command == "sort":
-                self.sort(args)
-            elif command == "wc":
-                self.wc(args)
-            elif command == "ssh":
-                print("ssh: подключение к удаленному серверу не поддерживается в эмуляторе")
-            elif command == "scp":
-                print("scp: копирование файлов между серверами не поддерживается в эмуляторе")
-            elif command == "wget":
-                print("wget: загрузка файлов из интернета не поддерживается в эмуляторе")
-            elif command == "curl":
-                print("curl: отправка HTTP запросов не поддерживается в эмуляторе")
-            elif command == "ping":
-                print("ping: проверка соединения с сервером не поддерживается в эмуляторе")
-            elif command == "ifconfig":
-                print("ifconfig: информация о сетевых интерфейсах не поддерживается в эмуляторе")
-            elif command == "sudo":
-                print("sudo: выполнение команд с правами root не поддерживается в эмуляторе")
-            elif command == "neofetch":
-                self.neofetch(args)    
-            else:
-                
-                try:
-                    subprocess.run(cmd, shell=True, cwd=self.current_dir)
-                except FileNotFoundError:
-                    print(f"{command}: команда не найдена")
+            pipelines = parse_line(cmd)
+        except ValueError as e:
+            print(f"-bash: {e}")
+            self.status = 2
+            return self.status
+
+        with self.out.active():
+            for pipeline in pipelines:
+                if pipeline.operator == "&&" and self.status != 0:
+                    continue
+                if pipeline.operator == "||" and self.status == 0:
+                    continue
+                if self.metrics is None and self.profiler is None:
+                    self.status = self._execute(pipeline)
+                else:
+                    from commands.metrics import instrumented
+                    self.status = instrumented(self, pipeline)
+        return self.status
+
+    def _expand_alias(self, words):
+        if words[0] in self.aliases:
+            return split_words(self.aliases[words[0]]) + words[1:]
+        return words
+
+    def _execute(self, pipeline):
+        if pipeline.stages[0][0] == "time":
+            from commands.metrics import time_pipeline
+            return time_pipeline(self, pipeline)
+
+        stages = [self._expand_alias(words) for words in pipeline.stages]
+        # Внешней оболочке уходит исходный текст, если алиасы его не изменили
+        text = pipeline.text if stages == pipeline.stages else " | ".join(join(words) for words in stages)
+
+        if self._stat_cache is not None:
+            self._stat_cache.refresh()
+
+        if len(stages) > 1:
+            try:
+                return self.run_pipeline(stages, text)
+            except Exception as e:
+                print(f"Ошибка: {str(e)}")
+                return 1
+
+        command, *args = stages[0]
+        spec = self.registry.get(command)
+        try:
+            if spec is None:
+                return self._run_external(text, command)
+            try:
+                status = spec.run(self, args)
+            finally:
+                self._invalidate(spec.mutates, args)
+            return 0 if status is None else int(status)
         except Exception as e:
             print(f"Ошибка: {str(e)}")
-    
+            return 1
+
+    def _run_external(self, cmd, command=None):
+        import subprocess
+        # Внешняя программа пишет прямо в дескриптор: накопленное должно
+        # выйти раньше ее вывода
+        self.out.flush()
+        try:
+            return subprocess.run(cmd, shell=True, cwd=self.current_dir).returncode
+        except FileNotFoundError:
+            print(f"{command}: команда не найдена")
+            return 127
+        finally:
+            self._invalidate_external()
+
+    def _invalidate_external(self):
+        # Внешняя программа могла изменить что угодно; с inotify кэш узнает об
+        # этом из событий, без него - сбрасывается
+        if self._stat_cache is not None and not self._stat_cache.use_inotify:
+            self._stat_cache.clear()
+
+    def run_pipeline(self, stages, cmd):
+        # Конвейер строится из генераторов: каждая стадия лениво читает
+        # строки предыдущей, поэтому `cat big.log | head` не читает весь файл.
+        # Внешние команды в конвейере отдаются системной оболочке целиком.
+        # Код возврата конвейера - код последней стадии, как в bash
+        specs = [self.registry.get(command) for command, *_ in stages]
+        for i, spec in enumerate(specs):
+            if spec is None or (i > 0 and not spec.streaming):
+                return self._run_external(cmd)
+
+        stream = None
+        for spec, (command, *args) in zip(specs, stages):
+            status = ExitStatus()
+            if spec.streaming:
+                stream = spec.run_stream(self, args, stream, status)
+            else:
+                stream = self._captured_stream(spec, args, status)
+
+        self.out.write_lines(stream)
+        return status.code()
+
+    def _captured_stream(self, spec, args, status):
+        with self.out.capture() as buffer:
+            code = spec.run(self, args)
+        if code:
+            status.fail(int(code))
+        buffer.seek(0)
+        for line in buffer:
+            yield line[:-1] if line.endswith("\n") else UnterminatedLine(line)
+
+    def _read_lines(self, command, filename, status=None):
+        full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
+        try:
+            with open(full_path, 'r') as f:
+                for line in f:
+                    yield line[:-1] if line.endswith("\n") else UnterminatedLine(line)
+            return
+        except OSError as e:
+            from commands.common import reason
+            print(f"{command}: {filename}: {reason(e)}")
+        if status is not None:
+            status.fail()
+
     def cd(self, args):
         if not args:
             new_dir = self.home_dir
@@ -232,7 +249,7 @@ class LinuxEmulator:
                     new_dir = self.prev_dir
                 else:
                     print("cd: предыдущая директория не задана")
-                    return
+                    return 1
             elif new_dir.startswith("~"):
                 new_dir = os.path.join(self.home_dir, new_dir[2:])
         
@@ -243,22 +260,29 @@ class LinuxEmulator:
             self.current_dir = new_dir
         except FileNotFoundError:
             print(f"cd: {new_dir}: Нет такой директории")
+            return 1
         except NotADirectoryError:
             print(f"cd: {new_dir}: Не директория")
+            return 1
         except PermissionError:
             print(f"cd: {new_dir}: Отказано в доступе")
+            return 1
     
     def ls(self, args):
+        import shutil
         show_all = False
         long_format = False
         human_readable = False
         reverse_sort = False
         sort_by_time = False
+        recursive = False
         
         # Парсинг аргументов
         paths = []
         for arg in args:
             if arg.startswith("-"):
+                if "R" in arg:
+                    recursive = True
                 if "a" in arg:
                     show_all = True
                 if "l" in arg:
@@ -275,11 +299,23 @@ class LinuxEmulator:
         if not paths:
             paths = ["."]
         
+        listings = []
         for path in paths:
-            if len(paths) > 1:
-                print(f"{path}:")
-            
             full_path = os.path.join(self.current_dir, path) if not os.path.isabs(path) else path
+            listings.append((path, full_path))
+            if recursive and self._is_dir(full_path):
+                from commands.walk import walk
+                skip_hidden = lambda entry, depth: depth > 0 and not show_all and entry.name.startswith(".")
+                try:
+                    for entry, depth in walk(full_path, min_depth=1, sort=True, prune=skip_hidden):
+                        if entry.is_dir(follow_symlinks=False) and not skip_hidden(entry, depth):
+                            listings.append((os.path.join(path, os.path.relpath(entry.path, full_path)), entry.path))
+                except OSError:
+                    pass
+        
+        for path, full_path in listings:
+            if len(listings) > 1:
+                print(f"{path}:")
             
             try:
                 items = os.listdir(full_path)
@@ -290,12 +326,22 @@ class LinuxEmulator:
                 
                 
                 if sort_by_time:
-                    items.sort(key=lambda x: os.path.getmtime(os.path.join(full_path, x)), reverse=not reverse_sort)
+                    mtimes = {}
+                    for item in items:
+                        try:
+                            mtimes[item] = self.stat_cache.stat(os.path.join(full_path, item)).st_mtime
+                        except OSError:
+                            mtimes[item] = 0
+                    items.sort(key=mtimes.__getitem__, reverse=not reverse_sort)
                 else:
                     items.sort(reverse=reverse_sort)
                 
                 if long_format:
                     self._print_long_format(items, full_path, human_readable)
+                elif not sys.stdout.isatty():
+                    # Как и GNU ls: в конвейер по одному имени на строку
+                    for item in items:
+                        print(item)
                 else:
                     
                     cols = 3
@@ -316,17 +362,18 @@ class LinuxEmulator:
             except PermissionError:
                 print(f"ls: невозможно получить доступ к '{path}': Отказано в доступе")
             
-            if len(paths) > 1 and path != paths[-1]:
+            if len(listings) > 1 and path != listings[-1][0]:
                 print()
     
     def _print_long_format(self, items, path, human_readable):
+        from datetime import datetime
         total = 0
         items_with_stats = []
         
         for item in items:
             full_path = os.path.join(path, item)
             try:
-                stat_info = os.stat(full_path)
+                stat_info = self.stat_cache.stat(full_path)
                 items_with_stats.append((item, stat_info))
                 total += stat_info.st_blocks // 2  
             except Exception:
@@ -385,7 +432,7 @@ class LinuxEmulator:
             
             print(f"{perm_str} {nlinks:>2} {owner} {group} {size_str:>8} {mtime} {item}")
     
-    def pwd(self):
+    def pwd(self, args):
         print(self.current_dir)
     
     def echo(self, args):
@@ -402,18 +449,20 @@ class LinuxEmulator:
     def cat(self, args):
         if not args:
             print("cat: требуется указать файл(ы)")
-            return
+            return 1
         
-        for filename in args:
-            try:
-                with open(os.path.join(self.current_dir, filename), 'r') as f:
-                    print(f.read(), end='')
-            except FileNotFoundError:
-                print(f"cat: {filename}: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"cat: {filename}: Это директория")
-            except PermissionError:
-                print(f"cat: {filename}: Отказано в доступе")
+        status = ExitStatus()
+        self.out.write_lines(self._cat_stream(args, status=status))
+        return status.code()
+
+    def _cat_stream(self, args, stdin=None, status=None):
+        if not args and stdin is not None:
+            yield from stdin
+            return
+
+        yield from _concat_lines(stdin if filename == "-" and stdin is not None
+                                 else self._read_lines("cat", filename, status)
+                                 for filename in args)
     
     def mkdir(self, args):
         if not args:
@@ -443,78 +492,8 @@ class LinuxEmulator:
             except PermissionError:
                 print(f"mkdir: невозможно создать директорию '{path}': Отказано в доступе")
     
-    def rm(self, args):
-        if not args:
-            print("rm: требуется операнд")
-            return
-        
-        recursive = False
-        force = False
-        paths = []
-        
-        for arg in args:
-            if arg == "-r" or arg == "-R":
-                recursive = True
-            elif arg == "-f":
-                force = True
-            else:
-                paths.append(arg)
-        
-        for path in paths:
-            full_path = os.path.join(self.current_dir, path) if not os.path.isabs(path) else path
-            try:
-                if os.path.isdir(full_path) and not recursive:
-                    print(f"rm: невозможно удалить '{path}': Это директория")
-                    continue
-                
-                if recursive:
-                    shutil.rmtree(full_path)
-                else:
-                    os.remove(full_path)
-            except FileNotFoundError:
-                if not force:
-                    print(f"rm: невозможно удалить '{path}': Нет такого файла или директории")
-            except PermissionError:
-                print(f"rm: невозможно удалить '{path}': Отказано в доступе")
-    
-    def cp(self, args):
-        if len(args) < 2:
-            print("cp: требуется как минимум два операнда")
-            return
-        
-        recursive = False
-        sources = args[:-1]
-        dest = args[-1]
-        
-        if "-r" in sources or "-R" in sources:
-            recursive = True
-            sources = [s for s in sources if s not in ("-r", "-R")]
-        
-        for src in sources:
-            src_path = os.path.join(self.current_dir, src) if not os.path.isabs(src) else src
-            dest_path = os.path.join(self.current_dir, dest) if not os.path.isabs(dest) else dest
-            
-            
-            if os.path.isdir(dest_path):
-                dest_path = os.path.join(dest_path, os.path.basename(src_path))
-            
-            try:
-                if os.path.isdir(src_path) and not recursive:
-                    print(f"cp: -r не указан; пропущена директория '{src}'")
-                    continue
-                
-                if os.path.isdir(src_path):
-                    shutil.copytree(src_path, dest_path)
-                else:
-                    shutil.copy2(src_path, dest_path)
-            except FileNotFoundError:
-                print(f"cp: невозможно открыть '{src}': Нет такого файла или директории")
-            except PermissionError:
-                print(f"cp: невозможно создать '{dest}': Отказано в доступе")
-            except shutil.SameFileError:
-                print(f"cp: '{src}' и '{dest}' это один и тот же файл")
-    
     def mv(self, args):
+        import shutil
         if len(args) < 2:
             print("mv: требуется как минимум два операнда")
             return
@@ -527,7 +506,7 @@ class LinuxEmulator:
             dest_path = os.path.join(self.current_dir, dest) if not os.path.isabs(dest) else dest
             
             
-            if os.path.isdir(dest_path):
+            if self._is_dir(dest_path):
                 dest_path = os.path.join(dest_path, os.path.basename(src_path))
             
             try:
@@ -554,122 +533,10 @@ class LinuxEmulator:
             except PermissionError:
                 print(f"touch: {filename}: Отказано в доступе")
     
-    def grep(self, args):
-        if len(args) < 1:
-            print("grep: требуется шаблон")
-            return
-        
-        pattern = args[0]
-        files = args[1:] if len(args) > 1 else []
-        ignore_case = False
-        count_only = False
-        line_numbers = False
-        invert_match = False
-        
-        
-        if pattern.startswith("-"):
-            if "-i" in pattern:
-                ignore_case = True
-                pattern = args[1]
-                files = args[2:] if len(args) > 2 else []
-            elif "-c" in pattern:
-                count_only = True
-                pattern = args[1]
-                files = args[2:] if len(args) > 2 else []
-            elif "-n" in pattern:
-                line_numbers = True
-                pattern = args[1]
-                files = args[2:] if len(args) > 2 else []
-            elif "-v" in pattern:
-                invert_match = True
-                pattern = args[1]
-                files = args[2:] if len(args) > 2 else []
-        
-        if ignore_case:
-            pattern = pattern.lower()
-        
-        if not files:
-            
-            print("grep: чтение из stdin не реализовано в эмуляторе")
-            return
-        
-        for filename in files:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'r') as f:
-                    lines = f.readlines()
-                
-                match_count = 0
-                for i, line in enumerate(lines, 1):
-                    line_to_check = line.lower() if ignore_case else line
-                    match = pattern in line_to_check
-                    
-                    if (match and not invert_match) or (not match and invert_match):
-                        match_count += 1
-                        if not count_only:
-                            prefix = f"{filename}:" if len(files) > 1 else ""
-                            if line_numbers:
-                                prefix += f"{i}:"
-                            print(f"{prefix}{line.rstrip()}")
-                
-                if count_only:
-                    prefix = f"{filename}:" if len(files) > 1 else ""
-                    print(f"{prefix}{match_count}")
-            
-            except FileNotFoundError:
-                print(f"grep: {filename}: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"grep: {filename}: Это директория")
-            except PermissionError:
-                print(f"grep: {filename}: Отказано в доступе")
-    
-    def find(self, args):
-        if not args:
-            print("find: требуется путь")
-            return
-        
-        path = args[0]
-        name = None
-        file_type = None
-        
-        
-        i = 1
-        while i < len(args):
-            if args[i] == "-name" and i + 1 < len(args):
-                name = args[i+1]
-                i += 2
-            elif args[i] == "-type" and i + 1 < len(args):
-                file_type = args[i+1]
-                i += 2
-            else:
-                i += 1
-        
-        full_path = os.path.join(self.current_dir, path) if not os.path.isabs(path) else path
-        
-        try:
-            for root, dirs, files in os.walk(full_path):
-                for item in dirs + files:
-                    item_path = os.path.join(root, item)
-                    
-                    # Проверка имени
-                    if name is not None:
-                        if not fnmatch.fnmatch(item, name):
-                            continue
-                    
-                    # Проверка типа
-                    if file_type is not None:
-                        if file_type == "f" and not os.path.isfile(item_path):
-                            continue
-                        if file_type == "d" and not os.path.isdir(item_path):
-                            continue
-                    
-                    print(item_path)
-        except FileNotFoundError:
-            print(f"find: '{path}': Нет такого файла или директории")
-        except PermissionError:
-            print(f"find: '{path}': Отказано в доступе")
-    
     def chmod(self, args):
+        recursive = "-R" in args or "--recursive" in args
+        args = [arg for arg in args if arg not in ("-R", "--recursive")]
+        
         if len(args) < 2:
             print("chmod: требуется режим и файл")
             return
@@ -677,100 +544,52 @@ class LinuxEmulator:
         mode = args[0]
         files = args[1:]
         
-        try:
-            
-            if mode.startswith("+"):
-                
-                for filename in files:
-                    full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-                    current_mode = os.stat(full_path).st_mode
-                    if "x" in mode:
-                        os.chmod(full_path, current_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
-            else:
-                
+        if not mode.startswith("+"):
+            try:
                 octal_mode = int(mode, 8)
-                for filename in files:
-                    full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-                    os.chmod(full_path, octal_mode)
-        except FileNotFoundError:
-            print(f"chmod: невозможно получить доступ к '{filename}': Нет такого файла или директории")
-        except PermissionError:
-            print(f"chmod: изменить права доступа для '{filename}': Отказано в доступе")
-        except ValueError:
-            print(f"chmod: неверный режим: '{mode}'")
-    
-    def ps(self):
-        try:
-            
-            print("  PID TTY          TIME CMD")
-            print(f"{os.getpid():>5} ?        00:00:00 python_wsl")
-        except Exception as e:
-            print(f"ps: ошибка: {str(e)}")
-    
-    def kill(self, args):
-        if not args:
-            print("kill: требуется аргумент")
-            return
+            except ValueError:
+                print(f"chmod: неверный режим: '{mode}'")
+                return
         
-        for pid_str in args:
+        for filename in files:
+            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
             try:
-                pid = int(pid_str)
-                if pid == os.getpid():
-                    print("kill: невозможно убить процесс эмулятора")
+                if recursive:
+                    from commands.walk import walk
+                    # Символические ссылки внутри дерева не трогаем, как и GNU chmod -R
+                    targets = [(entry.path, entry.stat(follow_symlinks=False).st_mode)
+                               for entry, depth in walk(full_path)
+                               if depth == 0 or not entry.is_symlink()]
                 else:
-                    print(f"kill: ({pid}) - Нет такого процесса")
-            except ValueError:
-                print(f"kill: неверный аргумент: {pid_str}")
+                    targets = [(full_path, None)]
+                
+                for target, current_mode in targets:
+                    if mode.startswith("+"):
+                        if "x" in mode:
+                            if current_mode is None or stat.S_ISLNK(current_mode):
+                                current_mode = os.stat(target).st_mode
+                            os.chmod(target, current_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+                    else:
+                        os.chmod(target, octal_mode)
+            except FileNotFoundError:
+                print(f"chmod: невозможно получить доступ к '{filename}': Нет такого файла или директории")
+            except PermissionError:
+                print(f"chmod: изменить права доступа для '{filename}': Отказано в доступе")
     
-    def df(self):
+    def df(self, args):
         try:
+            import psutil
             print("Файл.система    Размер Использовано  Доступно Использовано% Cмонтировано в")
             for part in psutil.disk_partitions(all=False):
                 usage = psutil.disk_usage(part.mountpoint)
                 print(f"{part.device:<15} {usage.total // (1024*1024):>6}G "
                       f"{usage.used // (1024*1024):>10}G {usage.free // (1024*1024):>8}G "
                       f"{usage.percent:>11}% {part.mountpoint}")
-        except NameError:
+        except ImportError:
             print("df: для работы этой команды требуется установить модуль psutil")
         except Exception as e:
             print(f"df: ошибка: {str(e)}")
     
-    def du(self, args):
-        if not args:
-            args = ["."]
-        
-        human_readable = False
-        paths = []
-        
-        for arg in args:
-            if arg == "-h":
-                human_readable = True
-            else:
-                paths.append(arg)
-        
-        for path in paths:
-            full_path = os.path.join(self.current_dir, path) if not os.path.isabs(path) else path
-            try:
-                total_size = 0
-                for dirpath, dirnames, filenames in os.walk(full_path):
-                    for f in filenames:
-                        fp = os.path.join(dirpath, f)
-                        try:
-                            total_size += os.path.getsize(fp)
-                        except OSError:
-                            pass
-                
-                if human_readable:
-                    size_str = self._human_size(total_size)
-                else:
-                    size_str = str(total_size // 1024)  
-                
-                print(f"{size_str}\t{path}")
-            except FileNotFoundError:
-                print(f"du: невозможно получить доступ к '{path}': Нет такого файла или директории")
-            except PermissionError:
-                print(f"du: невозможно прочитать директорию '{path}': Отказано в доступе")
-    
     def _human_size(self, size):
         for unit in ['', 'K', 'M', 'G', 'T', 'P']:
             if size < 1024:
@@ -779,6 +598,7 @@ class LinuxEmulator:
         return f"{size:.1f}P"
     
     def uname(self, args):
+        import platform
         a = False
         s = False
         n = False
@@ -817,50 +637,47 @@ class LinuxEmulator:
         
         print(' '.join(info))
     
-    def whoami(self):
+    def whoami(self, args):
         print(self.user)
     
-    def date(self):
+    def date(self, args):
+        from datetime import datetime
         print(datetime.now().strftime("%a %b %d %H:%M:%S %Z %Y"))
     
-    def show_history(self):
-        for i, cmd in enumerate(self.history[-20:], 1):  
-            print(f"{i:>5}  {cmd}")
-    
-    def clear(self):
+    def clear(self, args):
         if os.name == 'nt':
             os.system('cls')
         else:
             os.system('clear')
     
-    def help(self):
+    def help(self, args):
+        if args:
+            for name in args:
+                spec = self.registry.get(name)
+                if spec is None:
+                    print(f"help: нет справки по '{name}'")
+                else:
+                    print(f"{spec.usage} - {spec.help}" if spec.help else spec.usage)
+            return
+        
         print("Доступные команды:")
-        print("  cd [директория] - сменить директорию")
-        print("  ls [опции] [файлы] - список файлов")
-        print("  pwd - показать текущую директорию")
-        print("  echo [текст] - вывести текст")
-        print("  cat [файлы] - вывести содержимое файлов")
-        print("  mkdir [опции] директории - создать директории")
-        print("  rm [опции] файлы - удалить файлы")
-        print("  cp [опции] источник назначение - копировать файлы")
-        print("  mv [опции] источник назначение - переместить/переименовать файлы")
-        print("  touch файлы - создать файлы или обновить время модификации")
-        print("  grep [опции] шаблон [файлы] - поиск текста в файлах")
-        print("  find [путь] [опции] - поиск файлов")
-        print("  chmod [режим] файлы - изменить права доступа")
-        print("  ps - список процессов")
-        print("  kill [PID] - завершить процесс")
-        print("  df - информация о файловых системах")
-        print("  du [опции] [файлы] - использование диска")
-        print("  uname [опции] - информация о системе")
-        print("  whoami - текущий пользователь")
-        print("  date - текущая дата и время")
-        print("  history - история команд")
-        print("  clear - очистить экран")
-        print("  exit - выйти из эмулятора")
-        print("  help - эта справка")
+        for spec in self.registry:
+            if spec.help:
+                print(f"  {spec.usage} - {spec.help}")
         print("\nЭто упрощенный эмулятор Linux команд. Не все опции и команды поддерживаются.")
     
+    def exit_emulator(self, args):
+        code = self.status
+        if args:
+            if not args[0].lstrip("-").isdigit():
+                print(f"-bash: exit: {args[0]}: требуется числовой аргумент")
+                code = 2
+            else:
+                code = int(args[0]) & 0xFF
+        if self.interactive:
+            print("Выход из Python WSL эмулятора")
+        sys.exit(code)
+    
     def handle_alias(self, args):
         if not args:
             # Показать все алиасы
@@ -884,13 +701,13 @@ class LinuxEmulator:
                 else:
                     print(f"-bash: alias: {arg}: не найден")
     
-    def show_env(self):
+    def show_env(self, args):
         for var, value in self.env_vars.items():
             print(f"{var}={value}")
     
     def export_var(self, args):
         if not args:
-            self.show_env()
+            self.show_env(args)
             return
         
         for arg in args:
@@ -898,151 +715,14 @@ class LinuxEmulator:
                 var, value = arg.split("=", 1)
                 self.env_vars[var] = value
     
-    def zip(self, args):
-        if len(args) < 2:
-            print("zip: требуется архив и файлы")
-            return
-        
-        zip_name = args[0]
-        files = args[1:]
-        
-        try:
-            with zipfile.ZipFile(os.path.join(self.current_dir, zip_name), 'w') as zipf:
-                for file in files:
-                    full_path = os.path.join(self.current_dir, file) if not os.path.isabs(file) else file
-                    if os.path.isdir(full_path):
-                        for root, dirs, files_in_dir in os.walk(full_path):
-                            for f in files_in_dir:
-                                file_path = os.path.join(root, f)
-                                arcname = os.path.relpath(file_path, start=os.path.dirname(full_path))
-                                zipf.write(file_path, arcname=os.path.join(os.path.basename(full_path), arcname))
-                    else:
-                        zipf.write(full_path, arcname=os.path.basename(full_path))
-        except Exception as e:
-            print(f"zip: ошибка: {str(e)}")
-    
-    def unzip(self, args):
-        if not args:
-            print("unzip: требуется архив")
-            return
-        
-        zip_name = args[0]
-        extract_to = None
-        if len(args) > 1 and args[1] == "-d":
-            if len(args) > 2:
-                extract_to = args[2]
-            else:
-                print("unzip: требуется путь после -d")
-                return
-        
-        try:
-            with zipfile.ZipFile(os.path.join(self.current_dir, zip_name), 'r') as zipf:
-                if extract_to:
-                    extract_path = os.path.join(self.current_dir, extract_to) if not os.path.isabs(extract_to) else extract_to
-                    zipf.extractall(extract_path)
-                else:
-                    zipf.extractall(self.current_dir)
-        except Exception as e:
-            print(f"unzip: ошибка: {str(e)}")
-    
-    def tar(self, args):
-        if len(args) < 2:
-            print("tar: требуется опции и файлы")
-            return
-        
-        mode = None
-        archive_name = None
-        files = []
-        
-        
-        if args[0].startswith("-"):
-            opts = args[0][1:]
-            if "c" in opts:
-                mode = "create"
-            elif "x" in opts:
-                mode = "extract"
-            elif "t" in opts:
-                mode = "list"
-            
-            if "z" in opts:
-                compression = "gz"
-            elif "j" in opts:
-                compression = "bz2"
-            else:
-                compression = None
-            
-            if "f" in opts and len(args) > 1:
-                archive_name = args[1]
-                files = args[2:]
-            else:
-                print("tar: требуется имя архива после -f")
-                return
-        else:
-            print("tar: неверные опции")
-            return
-        
-        if not mode:
-            print("tar: требуется режим (c/x/t)")
-            return
-        
-        try:
-            full_archive_path = os.path.join(self.current_dir, archive_name) if not os.path.isabs(archive_name) else archive_name
-            
-            if mode == "create":
-                with tarfile.open(full_archive_path, f"w:{compression}" if compression else "w") as tarf:
-                    for file in files:
-                        full_path = os.path.join(self.current_dir, file) if not os.path.isabs(file) else file
-                        tarf.add(full_path, arcname=os.path.basename(full_path))
-            elif mode == "extract":
-                with tarfile.open(full_archive_path, f"r:{compression}" if compression else "r") as tarf:
-                    tarf.extractall(self.current_dir)
-            elif mode == "list":
-                with tarfile.open(full_archive_path, f"r:{compression}" if compression else "r") as tarf:
-                    tarf.list()
-        except Exception as e:
-            print(f"tar: ошибка: {str(e)}")
-    
-    def md5sum(self, args):
-        if not args:
-            print("md5sum: требуется файл(ы)")
-            return
-        
-        for filename in args:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'rb') as f:
-                    md5_hash = hashlib.md5()
-                    for chunk in iter(lambda: f.read(4096), b""):
-                        md5_hash.update(chunk)
-                    print(f"{md5_hash.hexdigest()}  {filename}")
-            except FileNotFoundError:
-                print(f"md5sum: {filename}: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"md5sum: {filename}: Это директория")
-            except PermissionError:
-                print(f"md5sum: {filename}: Отказано в доступе")
-    
-    def sha1sum(self, args):
-        if not args:
-            print("sha1sum: требуется файл(ы)")
-            return
-        
-        for filename in args:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'rb') as f:
-                    sha1_hash = hashlib.sha1()
-                    for chunk in iter(lambda: f.read(4096), b""):
-                        sha1_hash.update(chunk)
-                    print(f"{sha1_hash.hexdigest()}  {filename}")
-            except FileNotFoundError:
-                print(f"sha1sum: {filename}: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"sha1sum: {filename}: Это директория")
-            except PermissionError:
-                print(f"sha1sum: {filename}: Отказано в доступе")
-    
     def head(self, args):
+        status = ExitStatus()
+        self.out.write_lines(self._head_stream(args, status=status))
+        return status.code()
+
+    def _head_stream(self, args, stdin=None, status=None):
+        if status is None:
+            status = ExitStatus()
         lines = 10
         files = []
         
@@ -1055,265 +735,180 @@ class LinuxEmulator:
                     i += 2
                 except ValueError:
                     print(f"head: неверное количество строк: {args[i+1]}")
+                    status.fail()
                     return
             else:
                 files.append(args[i])
                 i += 1
         
         if not files:
-            print("head: требуется файл(ы)")
-            return
-        
-        for filename in files:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'r') as f:
-                    if len(files) > 1:
-                        print(f"==> {filename} <==")
-                    
-                    for i, line in enumerate(f):
-                        if i >= lines:
-                            break
-                        print(line.rstrip())
-                    
-                    if len(files) > 1 and filename != files[-1]:
-                        print()
-            except FileNotFoundError:
-                print(f"head: невозможно открыть '{filename}' для чтения: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"head: ошибка чтения '{filename}': Это директория")
-            except PermissionError:
-                print(f"head: невозможно открыть '{filename}' для чтения: Отказано в доступе")
-    
-    def tail(self, args):
-        lines = 10
-        files = []
-        follow = False
-        
-        
-        i = 0
-        while i < len(args):
-            if args[i] == "-n" and i + 1 < len(args):
-                try:
-                    lines = int(args[i+1])
-                    i += 2
-                except ValueError:
-                    print(f"tail: неверное количество строк: {args[i+1]}")
-                    return
-            elif args[i] == "-f":
-                follow = True
-                i += 1
-            else:
-                files.append(args[i])
-                i += 1
-        
-        if not files:
-            print("tail: требуется файл(ы)")
-            return
-        
-        for filename in files:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'r') as f:
-                    if len(files) > 1:
-                        print(f"==> {filename} <==")
-                    
-                    # Читаем последние N строк
-                    all_lines = f.readlines()
-                    start = max(0, len(all_lines) - lines)
-                    for line in all_lines[start:]:
-                        print(line.rstrip())
-                    
-                    if follow:
-                        print("\nРежим слежения (-f) не полностью поддерживается в эмуляторе. Нажмите Ctrl+C для выхода.")
-                        try:
-                            while True:
-                                new_lines = f.readlines()
-                                for line in new_lines:
-                                    print(line.rstrip())
-                                time.sleep(1)
-                        except KeyboardInterrupt:
-                            pass
-                    
-                    if len(files) > 1 and filename != files[-1]:
-                        print()
-            except FileNotFoundError:
-                print(f"tail: невозможно открыть '{filename}' для чтения: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"tail: ошибка чтения '{filename}': Это директория")
-            except PermissionError:
-                print(f"tail: невозможно открыть '{filename}' для чтения: Отказано в доступе")
-    
-    def diff(self, args):
-        if len(args) != 2:
-            print("diff: требуется два файла для сравнения")
-            return
-        
-        file1, file2 = args
-        full_path1 = os.path.join(self.current_dir, file1) if not os.path.isabs(file1) else file1
-        full_path2 = os.path.join(self.current_dir, file2) if not os.path.isabs(file2) else file2
-        
-        try:
-            with open(full_path1, 'r') as f1, open(full_path2, 'r') as f2:
-                lines1 = f1.readlines()
-                lines2 = f2.readlines()
-                
-                for i, (line1, line2) in enumerate(zip(lines1, lines2)):
-                    if line1 != line2:
-                        print(f"{i+1}c{i+1}")
-                        print(f"< {line1.rstrip()}")
-                        print(f"> {line2.rstrip()}")
-                
-                if len(lines1) > len(lines2):
-                    for i in range(len(lines2), len(lines1)):
-                        print(f"{i+1}d{i}")
-                        print(f"< {lines1[i].rstrip()}")
-                elif len(lines2) > len(lines1):
-                    for i in range(len(lines1), len(lines2)):
-                        print(f"{i}a{i+1}")
-                        print(f"> {lines2[i].rstrip()}")
-        except FileNotFoundError as e:
-            print(f"diff: {e.filename}: Нет такого файла или директории")
-        except IsADirectoryError:
-            print(f"diff: один из аргументов является директорией")
-        except PermissionError:
-            print(f"diff: невозможно открыть файл для чтения: Отказано в доступе")
-    
-    def sort(self, args):
-        if not args:
-            print("sort: требуется файл")
-            return
-        
-        reverse = False
-        numeric = False
-        unique = False
-        files = []
-        
-        
-        for arg in args:
-            if arg == "-r":
-                reverse = True
-            elif arg == "-n":
-                numeric = True
-            elif arg == "-u":
-                unique = True
-            else:
-                files.append(arg)
-        
-        for filename in files:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'r') as f:
-                    lines = [line.rstrip() for line in f.readlines()]
-                    
-                    if numeric:
-                        
-                        try:
-                            lines.sort(key=lambda x: float(x) if x else 0, reverse=reverse)
-                        except ValueError:
-                            lines.sort(key=lambda x: float(x.split()[0]) if x else 0, reverse=reverse)
-                    else:
-                        # Обычная сортировка
-                        lines.sort(reverse=reverse)
-                    
-                    if unique:
-                        seen = set()
-                        lines = [line for line in lines if not (line in seen or seen.add(line))]
-                    
-                    for line in lines:
-                        print(line)
-            except FileNotFoundError:
-                print(f"sort: невозможно открыть '{filename}' для чтения: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"sort: ошибка чтения '{filename}': Это директория")
-            except PermissionError:
-                print(f"sort: невозможно открыть '{filename}' для чтения: Отказано в доступе")
-    
-    def wc(self, args):
-        if not args:
-            print("wc: требуется файл(ы)")
+            if stdin is None:
+                print("head: требуется файл(ы)")
+                status.fail()
+                return
+            # islice прекращает чтение предыдущей стадии после N строк
+            yield from itertools.islice(stdin, lines)
             return
         
-        lines = False
-        words = False
-        chars = False
-        files = []
-        
-        
-        for arg in args:
-            if arg == "-l":
-                lines = True
-            elif arg == "-w":
-                words = True
-            elif arg == "-c":
-                chars = True
-            else:
-                files.append(arg)
-        
-        
-        if not any([lines, words, chars]):
-            lines = words = chars = True
-        
-        total_lines = 0
-        total_words = 0
-        total_chars = 0
-        
         for filename in files:
-            full_path = os.path.join(self.current_dir, filename) if not os.path.isabs(filename) else filename
-            try:
-                with open(full_path, 'r') as f:
-                    content = f.read()
-                    file_lines = content.count('\n')
-                    file_words = len(content.split())
-                    file_chars = len(content)
-                    
-                    output = []
-                    if lines:
-                        output.append(f"{file_lines:>8}")
-                    if words:
-                        output.append(f"{file_words:>8}")
-                    if chars:
-                        output.append(f"{file_chars:>8}")
-                    
-                    print(' '.join(output) + f" {filename}")
-                    
-                    total_lines += file_lines
-                    total_words += file_words
-                    total_chars += file_chars
-            except FileNotFoundError:
-                print(f"wc: невозможно открыть '{filename}' для чтения: Нет такого файла или директории")
-            except IsADirectoryError:
-                print(f"wc: ошибка чтения '{filename}': Это директория")
-            except PermissionError:
-                print(f"wc: невозможно открыть '{filename}' для чтения: Отказано в доступе")
-        
-        
-        if len(files) > 1:
-            output = []
-            if lines:
-                output.append(f"{total_lines:>8}")
-            if words:
-                output.append(f"{total_words:>8}")
-            if chars:
-                output.append(f"{total_chars:>8}")
-            print(' '.join(output) + " итого")
+            if len(files) > 1:
+                yield f"==> {filename} <=="
+            
+            yield from itertools.islice(self._read_lines("head", filename, status), lines)
+            
+            if len(files) > 1 and filename != files[-1]:
+                yield ""
+
+
+def _concat_lines(sources):
+    # Как у cat: строка без '\n' в конце одного входа продолжается первой
+    # строкой следующего
+    carry = None
+    for source in sources:
+        for line in source:
+            if carry is not None:
+                line = type(line)(carry + line)
+                carry = None
+            if isinstance(line, UnterminatedLine):
+                carry = line
+                continue
+            yield line
+    if carry is not None:
+        yield carry
+
+
+def _unsupported(message):
+    def handler(emulator, args):
+        print(message)
+    return handler
+
+
+default_registry = CommandRegistry()
+register = default_registry.register
+
+register("cd", LinuxEmulator.cd, usage="cd [директория]", help="сменить директорию")
+register("ls", LinuxEmulator.ls, usage="ls [-alhrtR] [файлы]", help="список файлов")
+register("pwd", LinuxEmulator.pwd, help="показать текущую директорию")
+register("echo", LinuxEmulator.echo, usage="echo [текст]", help="вывести текст")
+register("cat", LinuxEmulator.cat, stream=LinuxEmulator._cat_stream,
+         usage="cat [файлы]", help="вывести содержимое файлов")
+register("mkdir", LinuxEmulator.mkdir, usage="mkdir [опции] директории", help="создать директории", mutates=True)
+register("rm", "commands.rm:rm", usage="rm [-rfiIdv] [--stats] [--jobs=N] файлы", help="удалить файлы",
+         mutates=True)
+register("cp", "commands.cp:cp", usage="cp [-rapunfv] [--stats] [--jobs=N] источник... назначение",
+         help="копировать файлы", mutates=True)
+register("mv", LinuxEmulator.mv, usage="mv [опции] источник назначение", help="переместить/переименовать файлы",
+         mutates=True)
+register("touch", LinuxEmulator.touch, usage="touch файлы", help="создать файлы или обновить время модификации",
+         mutates=True)
+register("grep", "commands.grep:grep", stream="commands.grep:grep_stream",
+         usage="grep [-invclrwxFH] [-m N] [-e] шаблон [файлы]", help="поиск текста в файлах")
+register("find", "commands.find:find", usage="find [пути] [выражение]", help="поиск файлов",
+         mutates=lambda args: "all" if {"-exec", "-execdir", "-ok", "-okdir"} & set(args) else False)
+register("chmod", LinuxEmulator.chmod, usage="chmod [-R] [режим] файлы", help="изменить права доступа", mutates=True)
+register("chown", _unsupported("chown: изменение владельца не поддерживается в эмуляторе"))
+register("ps", "commands.ps:ps", usage="ps [aux|-ef] [-o колонки] [--sort ключи] [-p PID] [-u пользователь]",
+         help="список процессов")
+register("top", "commands.ps:top", usage="top [-b] [-d сек] [-n N] [-o поле] [-p PID] [-u пользователь]",
+         help="процессы в реальном времени")
+register("htop", "commands.ps:top", usage="htop [ключи top]", help="то же, что top")
+register("kill", "commands.kill:kill", usage="kill [-s сигнал | -сигнал] PID... | kill -l [сигнал]",
+         help="послать сигнал процессу")
+register("pgrep", "commands.kill:pgrep", usage="pgrep [-flacvxinod] [-u пользователь] [-P PPID] шаблон",
+         help="найти процессы по имени или командной строке")
+register("pkill", "commands.kill:pkill", usage="pkill [-сигнал] [-fvxinoecw] [-s сигнал] [-u пользователь] [-P PPID] [--timeout=сек] шаблон",
+         help="послать сигнал процессам по шаблону")
+register("killall", "commands.kill:killall", usage="killall [-сигнал] [-Ivqwr] [-s сигнал] [-u пользователь] [--timeout=сек] имя...",
+         help="завершить процессы по имени")
+register("df", LinuxEmulator.df, help="информация о файловых системах")
+register("du", "commands.du:du", usage="du [-sahcbkml] [-d N] [--apparent-size] [файлы]", help="использование диска")
+register("uname", LinuxEmulator.uname, usage="uname [опции]", help="информация о системе")
+register("whoami", LinuxEmulator.whoami, help="текущий пользователь")
+register("date", LinuxEmulator.date, help="текущая дата и время")
+register("history", "commands.history:history", stream="commands.history:history_stream",
+         usage="history [-c] [N]", help="история команд")
+register("clear", LinuxEmulator.clear, help="очистить экран")
+register("exit", LinuxEmulator.exit_emulator, help="выйти из эмулятора")
+register("time", "commands.metrics:time_command", usage="time команда [аргументы]",
+         help="время, CPU, память и ввод-вывод команды или конвейера")
+register("help", LinuxEmulator.help, usage="help [команда]", help="эта справка")
+register("alias", LinuxEmulator.handle_alias, usage="alias [имя=команда]", help="показать или задать алиасы")
+register("env", LinuxEmulator.show_env, help="переменные окружения")
+register("export", LinuxEmulator.export_var, usage="export ИМЯ=значение", help="задать переменную окружения")
+register("head", LinuxEmulator.head, stream=LinuxEmulator._head_stream,
+         usage="head [-n N] [файлы]", help="первые строки файлов")
+register("tail", "commands.tail:tail", stream="commands.tail:tail_stream",
+         usage="tail [-n [+]N] [-c [+]N] [-f|-F] [-q] [-s сек] [файлы]", help="последние строки файлов")
+register("diff", "commands.diff:diff", usage="diff [-u|-U N] [-q] [-r] [-N] [-iwb] файл1 файл2",
+         help="сравнить файлы или директории")
+register("sort", "commands.sort:sort", stream="commands.sort:sort_stream",
+         usage="sort [-rnufbsm] [-k ключ] [-t разд] [-S размер] [файлы]", help="сортировать строки")
+register("wc", "commands.wc:wc", stream="commands.wc:wc_stream",
+         usage="wc [-lwmcL] [файлы]", help="подсчет строк, слов, символов и байтов")
+
+# Тяжелые команды загружаются из пакета commands при первом вызове
+register("zip", "commands.zip:zip", usage="zip [-0..-9] [-urq] [--jobs=N] архив файлы",
+         help="создать или обновить zip-архив", mutates=True)
+register("unzip", "commands.unzip:unzip", usage="unzip [-l|-t] [-o|-n] [-q] архив [шаблоны] [-x шаблоны] [-d путь]",
+         help="распаковать, проверить или показать zip-архив",
+         mutates=lambda args: False if any(a[:1] == "-" and a[1:2] != "-" and ("l" in a or "t" in a)
+                                          for a in args) else "all")
+register("tar", "commands.tar:tar", usage="tar -c|-x|-t [-zjJav] [--zstd] [-f архив] [-C дир] [--exclude=шаблон] [файлы]",
+         help="работа с tar-архивами (параллельное сжатие)",
+         mutates="all")
+register("md5sum", "commands.hashing:md5sum", usage="md5sum [-r] [--no-cache] файлы", help="контрольная сумма MD5")
+register("sha1sum", "commands.hashing:sha1sum", usage="sha1sum [-r] [--no-cache] файлы", help="контрольная сумма SHA1")
+register("sha256sum", "commands.hashing:sha256sum", usage="sha256sum [-r] [--no-cache] файлы", help="контрольная сумма SHA256")
+register("b2sum", "commands.hashing:b2sum", usage="b2sum [-r] [--no-cache] файлы", help="контрольная сумма BLAKE2b")
+register("neofetch", "commands.neofetch:neofetch", help="информация о системе с логотипом")
+
+register("ssh", _unsupported("ssh: подключение к удаленному серверу не поддерживается в эмуляторе"))
+register("scp", _unsupported("scp: копирование файлов между серверами не поддерживается в эмуляторе"))
+register("wget", _unsupported("wget: загрузка файлов из интернета не поддерживается в эмуляторе"))
+register("curl", _unsupported("curl: отправка HTTP запросов не поддерживается в эмуляторе"))
+register("ping", _unsupported("ping: проверка соединения с сервером не поддерживается в эмуляторе"))
+register("ifconfig", _unsupported("ifconfig: информация о сетевых интерфейсах не поддерживается в эмуляторе"))
+register("sudo", _unsupported("sudo: выполнение команд с правами root не поддерживается в эмуляторе"))
+
+
+def main(argv=None):
+    from commands.shell import USAGE, parse_cli, run_batch
+    try:
+        opts = parse_cli(sys.argv[1:] if argv is None else argv)
+    except ValueError as e:
+        print(f"main.py: {e}", file=sys.stderr)
+        print(USAGE, file=sys.stderr)
+        sys.exit(2)
+
+    emulator = LinuxEmulator()
+    if opts.metrics is not None or opts.profile is not None:
+        from commands.metrics import Metrics, Profiler
+        if opts.profile is not None:
+            emulator.profiler = Profiler(opts.profile)
+        if opts.metrics is not None:
+            import atexit
+            emulator.metrics = Metrics(opts.metrics)
+            atexit.register(emulator.metrics.write)
+    if opts.source is not None:
+        # Пакетный режим: без приветствия и приглашения, код возврата -
+        # последней выполненной команды
+        sys.exit(run_batch(emulator, opts.source, opts.errexit))
 
-def main():
     print("Добро пожаловать в Python WSL эмулятор!")
     print("Введите 'help' для списка команд, 'exit' для выхода\n")
-    
-    emulator = LinuxEmulator()
-    
+
+    emulator.history.attach_readline()
+
     try:
         while True:
             try:
+                emulator.out.flush()
                 cmd = input(emulator.get_prompt()).strip()
                 emulator.parse_command(cmd)
             except KeyboardInterrupt:
                 print("^C")
             except EOFError:
                 print()
-                emulator.save_history()
                 print("Выход из Python WSL эмулятора")
                 break
     except Exception as e: